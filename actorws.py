@@ -1,6 +1,8 @@
 import requests
 import json
 import logging
+import os
+from .http_transport import transport
 
 
 
@@ -31,6 +33,7 @@ class CCTE_EPA:
 		}
 
 		self.default_timeout = 2
+		self.batch_timeout = float(os.environ.get('CTS_CCTE_BATCH_TIMEOUT', 30))  # multi-chemical batch searches take longer
 
 		########################################
 		# BATCH REQUEST EXAMPLES
@@ -93,9 +96,9 @@ class CCTE_EPA:
 			"data": {},
 		}
 
-	def _make_request(self, url, data):
+	def _make_request(self, url, data, timeout=None):
 		try:
-			_response = requests.post(url, json=data, headers={'Content-Type': 'application/json'}, timeout=self.default_timeout)
+			_response = transport.post(url, json=data, headers={'Content-Type': 'application/json'}, timeout=timeout or self.default_timeout)
 		except requests.exceptions.Timeout as e:
 			logging.warning("Request to {} timed out.. No data from actorws..".format(url))
 			return None
@@ -153,6 +156,32 @@ class CCTE_EPA:
 
 		return _results
 
+	def get_batch_results(self, chemicals, identifier_type="CHEMICAL_NAME"):
+		"""
+		Searches the CCTE batch endpoint for a list of chemicals (e.g.,
+		names, with identifier_type CHEMICAL_NAME, CASRN or DTXSID).
+		Returns {chemical: keys_of_interest data} for chemicals that were
+		found, or None if the request failed.
+		"""
+		post_data = dict(self.batch_request)
+		post_data["identifierTypes"] = [identifier_type]
+		post_data["searchItems"] = "\n".join(chemicals)
+		try:
+			results = self._make_request(self.batch_url, post_data, timeout=self.batch_timeout)
+		except Exception as e:
+			logging.warning("Error getting CCTE batch data: {}".format(e))
+			return None
+		if not isinstance(results, list):
+			return None
+		chemicals_map = {chemical.strip().lower(): chemical for chemical in chemicals}  # results' inputs may differ in case
+		batch_results = {}
+		for result in results:
+			chemical = chemicals_map.get(str(result.get('input', "")).strip().lower())
+			if chemical is None or chemical in batch_results or not result.get('dtxsid'):
+				continue
+			batch_results[chemical] = {key: val for key, val in result.items() if key in self.keys_of_interest}
+		return batch_results
+
 
 
 class ACTORWS(object):
@@ -191,7 +220,7 @@ class ACTORWS(object):
 
 	def make_request(self, url, payload):
 		try:
-			_response = requests.get(url, params=payload, timeout=self.default_timeout)
+			_response = transport.get(url, params=payload, timeout=self.default_timeout)
 		except requests.exceptions.Timeout as e:
 			logging.warning("Request to {} timed out.. No data from actorws..".format(url))
 			return None
@@ -0,0 +1,244 @@
+"""
+Non-blocking HTTP transport for the calculators' async handlers,
+plus the background event loop the sync handlers run them on.
+"""
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+import asyncio
+import logging
+import json
+import time
+import os
+
+from .http_transport import transport, create_legacy_ssl_context
+from .circuit_breaker import breakers
+from .metrics import metrics, get_request_size
+from .deadline import get_deadline, DeadlineExceeded
+
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None  # async requests fall back to the pooled sync transport in worker threads
+
+
+
+class AsyncResponse:
+	"""
+	Response from AsyncHTTPTransport. Has the parts of requests.Response
+	the calcs use (status_code, content, text, json()), so validate_response
+	and the response parsing work for both transports.
+	"""
+
+	def __init__(self, url, status_code, content, headers=None, encoding=None):
+		self.url = url
+		self.status_code = status_code
+		self.content = content
+		self.headers = headers or {}
+		self.encoding = encoding or "utf-8"
+
+	@property
+	def text(self):
+		return self.content.decode(self.encoding, errors="replace")
+
+	def json(self):
+		return json.loads(self.content)
+
+	def __repr__(self):
+		return "<AsyncResponse [{}]>".format(self.status_code)
+
+
+
+class AsyncHTTPTransport:
+	"""
+	aiohttp version of HTTPTransport. Keeps a ClientSession per event loop
+	(aiohttp sessions can't be shared across loops), with connections per
+	host capped at the sync transport's pool_maxsize. Errors are raised as
+	requests exceptions, so retry_policy and the calcs' except clauses
+	handle both transports the same way.
+	"""
+
+	def __init__(self):
+		self.sessions = {}  # event loop -> aiohttp.ClientSession
+		self.lock = threading.Lock()
+
+	def get_session(self):
+		"""
+		Returns the running loop's session, creating it if needed.
+		"""
+		loop = asyncio.get_running_loop()
+		with self.lock:
+			for closed_loop in [l for l in self.sessions if l.is_closed()]:
+				del self.sessions[closed_loop]
+			session = self.sessions.get(loop)
+			if not session or session.closed:
+				connector = aiohttp.TCPConnector(
+					limit=0,  # no overall cap, only per host
+					limit_per_host=transport.pool_maxsize,
+					force_close=not transport.keep_alive
+				)
+				session = aiohttp.ClientSession(connector=connector)
+				self.sessions[loop] = session
+			return session
+
+	def get_ssl(self, host, verify=True):
+		"""
+		Returns the aiohttp ssl arg for a host (e.g., legacy ssl for TESTWS).
+		"""
+		if not verify:
+			return False
+		if transport.host_settings.get(host, {}).get('legacy_ssl'):
+			return create_legacy_ssl_context()
+		return None  # aiohttp's default ssl checks
+
+	async def request(self, method, url, **kwargs):
+		"""
+		Makes a non-blocking request. Accepts the requests.request keyword
+		args the calcs use: params, data, json, headers, timeout, verify.
+		"""
+		if aiohttp is None:
+			return await asyncio.to_thread(transport.request, method, url, **kwargs)
+
+		host = transport.get_host(url)
+		bytes_sent = get_request_size(kwargs.get('data'), kwargs.get('json'))
+		deadline, clamped = get_deadline(), False
+		try:
+			if deadline:
+				kwargs['timeout'], clamped = deadline.clamp_timeout(kwargs.get('timeout'))
+			breaker = breakers.before_request(host, url)
+		except Exception as e:
+			metrics.record_request(host, method, url, error=e)
+			raise
+		timeout = kwargs.get('timeout')
+		start_time = time.monotonic()
+
+		def record(response=None, error=None):
+			breakers.record(breaker, response=response, error=error)
+			metrics.record_request(host, method, url, time.monotonic() - start_time, response, error, bytes_sent)
+
+		try:
+			response = await self.send(method, url, host, **kwargs)
+		except asyncio.TimeoutError as e:
+			if clamped:
+				deadline.exceeded = True
+				error = DeadlineExceeded("Deadline exceeded requesting {}".format(url))
+			else:
+				error = requests.exceptions.Timeout("Request to {} timed out after {}s".format(url, timeout))
+			record(error=error)
+			raise error from e
+		except aiohttp.ClientConnectionError as e:
+			error = requests.exceptions.ConnectionError("Cannot connect to {}: {}".format(url, e))
+			record(error=error)
+			raise error from e
+		except aiohttp.ClientError as e:
+			error = requests.exceptions.RequestException("Error requesting {}: {}".format(url, e))
+			record(error=error)
+			raise error from e
+		except BaseException as e:
+			record(error=e)  # e.g., cancelled, so a half-open trial slot isn't held forever
+			raise
+		record(response=response)
+		return response
+
+	async def send(self, method, url, host, params=None, data=None, json=None, headers=None, timeout=None, verify=True):
+		session = self.get_session()
+		async with session.request(method, url,
+				params=params,
+				data=data,
+				json=json,
+				headers=headers,
+				timeout=aiohttp.ClientTimeout(total=timeout),
+				ssl=self.get_ssl(host, verify)) as response:
+			content = await response.read()
+			return AsyncResponse(str(response.url), response.status, content,
+				dict(response.headers), response.charset)
+
+	async def get(self, url, **kwargs):
+		return await self.request("GET", url, **kwargs)
+
+	async def post(self, url, **kwargs):
+		return await self.request("POST", url, **kwargs)
+
+	async def close(self):
+		"""
+		Closes the running loop's session.
+		"""
+		with self.lock:
+			session = self.sessions.pop(asyncio.get_running_loop(), None)
+		if session:
+			await session.close()
+
+	def reset_after_fork(self):
+		self.lock = threading.Lock()
+		self.sessions = {}
+
+
+
+class EventLoopThread:
+	"""
+	Event loop running in a daemon thread. The sync data_request_handlers
+	run their async variants here, so the loop's aiohttp session (and its
+	keep-alive connections) is reused across calls.
+	"""
+
+	def __init__(self):
+		self.loop = None
+		self.thread = None
+		self.lock = threading.Lock()
+
+	def get_loop(self):
+		with self.lock:
+			if not self.loop:
+				self.loop = asyncio.new_event_loop()
+				self.thread = threading.Thread(target=self.loop.run_forever, name="cts-event-loop", daemon=True)
+				self.thread.start()
+			return self.loop
+
+	def run(self, coro):
+		"""
+		Runs a coroutine to completion and returns its result.
+		"""
+		try:
+			asyncio.get_running_loop()
+		except RuntimeError:
+			return asyncio.run_coroutine_threadsafe(coro, self.get_loop()).result()
+		# Sync call from inside an event loop: waiting on the loop thread
+		# could deadlock, so the coroutine gets its own loop and thread.
+		logging.warning("Sync handler called from a running event loop, use the async_* variant instead.")
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			context = contextvars.copy_context()  # keeps the caller's deadline and trace
+			return executor.submit(context.run, asyncio.run, close_after(coro)).result()
+
+	def reset_after_fork(self):
+		self.lock = threading.Lock()
+		self.loop = None
+		self.thread = None
+
+
+
+async def close_after(coro):
+	"""
+	Awaits coro, then closes the loop's session (for one-off loops).
+	"""
+	try:
+		return await coro
+	finally:
+		await async_transport.close()
+
+
+def run_async(coro):
+	"""
+	Runs an async handler from sync code.
+	"""
+	return event_loop.run(coro)
+
+
+
+async_transport = AsyncHTTPTransport()  # shared by every calculator in the process
+event_loop = EventLoopThread()
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=async_transport.reset_after_fork)
+	os.register_at_fork(after_in_child=event_loop.reset_after_fork)
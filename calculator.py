@@ -9,6 +9,21 @@ import os
 # import redis
 import datetime
 import pytz
+import asyncio
+import base64
+from urllib.parse import urlencode
+
+from .http_transport import transport
+from .async_transport import async_transport, run_async, AsyncResponse
+from .retry_policy import RetryPolicy
+from .circuit_breaker import fast_fail_response
+from .single_flight import single_flight, request_key
+from .memory_cache import jchem_cache
+from .response_store import response_store
+from .deadline import request_deadline, mark_deadline_exceeded, deadline_expired
+from .image_backends import get_image_backend
+from .image_cache import image_cache
+from . import local_chem
 
 
 class Calculator(object):
@@ -24,8 +39,15 @@ class Calculator(object):
 		self.headers = {'Content-Type': 'application/json'}
 		self.request_timeout = 15  # default, set unique ones in calc sub classes
 		self.max_retries = 3
+		self.retry_policy = RetryPolicy()  # backoff/retry rules used by request_with_retries
 
 		self.image_scale = 50
+		self.image_batch_size = int(os.environ.get('CTS_IMAGE_BATCH_SIZE', 50))  # structures per batch image request
+		self.image_backend = get_image_backend()  # None for jchem ws (see CTS_IMAGE_BACKEND)
+		self.local_struct_info = os.environ.get('CTS_LOCAL_STRUCT_INFO', 'false').lower() == 'true' and local_chem.is_available()  # getStructInfo with rdkit
+		self.local_mass = os.environ.get('CTS_LOCAL_MASS', 'true').lower() == 'true' and local_chem.is_available()  # get_mass with rdkit
+		self.detail_batch_size = int(os.environ.get('CTS_DETAIL_BATCH_SIZE', 100))  # structures per batch detail request
+		self.image_reference_url = os.environ.get('CTS_IMAGE_REFERENCE_URL')  # e.g., /cts/rest/image, nodes link to images instead of inlining them
 
 		self.default_ph = 7.0
 
@@ -152,6 +174,13 @@ class Calculator(object):
 		TEST if not available in Measured, and finally EPI.
 		Returns MP as float or None
 		"""
+		return run_async(self.async_get_melting_point(structure, sessionid, calc_obj))
+
+
+	async def async_get_melting_point(self, structure, sessionid, calc_obj):
+		"""
+		Async version of get_melting_point.
+		"""
 		melting_point_request = {
 			'calc': "",
 			'prop': 'melting_point',
@@ -173,30 +202,18 @@ class Calculator(object):
 
 		for calc in mp_request_calcs:
 
+			if deadline_expired():
+				logging.warning("Deadline exceeded requesting melting point, skipping {}.".format(calc))
+				break
+
 			melting_point_request['calc'] = calc
 
 			logging.info("Requesting melting point from {}..".format(calc))
 
 			# Calls calculator's data_request_handler which makes request to calc server:
-			response_obj = calc_obj.data_request_handler(melting_point_request)
-
-			if calc == 'test':
-				melting_point = response_obj['data']
-			elif not response_obj.get('valid'):
-				# epi or measured mp request not valid, sets mp to None
-				melting_point = None
-			else:
-				# Finds mp data from list of data objects for epi or measured:
-				for data_obj in response_obj['data']:
-					if data_obj['prop'] == "melting_point":
-						melting_point = data_obj['data']
+			response_obj = await calc_obj.async_data_request_handler(melting_point_request)
 
-			try:
-				# results_object = json.loads(mp_response.content)
-				melting_point = float(melting_point)
-			except Exception as e:
-				logging.warning("Unable to get melting point from {}\n Exception: {}".format(calc, e))
-				logging.warning("Data returned from Measured that triggered exception: {}".format(response_obj.get('data')))
+			melting_point = self.parse_melting_point(calc, response_obj)
 			if isinstance(melting_point, float):
 				logging.info("Melting point value found from {} calc, MP = {}".format(calc, melting_point))
 				return melting_point
@@ -205,6 +222,32 @@ class Calculator(object):
 		return None
 
 
+	def parse_melting_point(self, calc, response_obj):
+		"""
+		Gets MP as float from a calc's melting point response, or None.
+		"""
+		melting_point = None
+
+		if calc == 'test':
+			melting_point = response_obj['data']
+		elif not response_obj.get('valid'):
+			# epi or measured mp request not valid, sets mp to None
+			melting_point = None
+		else:
+			# Finds mp data from list of data objects for epi or measured:
+			for data_obj in response_obj['data']:
+				if data_obj['prop'] == "melting_point":
+					melting_point = data_obj['data']
+
+		try:
+			# results_object = json.loads(mp_response.content)
+			return float(melting_point)
+		except Exception as e:
+			logging.warning("Unable to get melting point from {}\n Exception: {}".format(calc, e))
+			logging.warning("Data returned from Measured that triggered exception: {}".format(response_obj.get('data')))
+			return None
+
+
 
 
 	################ JCHEM REST STUFF (WHERE SHOULD IT GO??? CTS_REST???) ###################
@@ -245,7 +288,7 @@ class Calculator(object):
 		}
 
 		url = self.jchem_server_url + self.detail_endpoint
-		return self.web_call(url, chemDeatsDict)
+		return self.cached_web_call(url, chemDeatsDict)
 
 
 	def smilesToImage(self, request_obj):
@@ -253,7 +296,88 @@ class Calculator(object):
 		smilesToImage
 
 		Returns image (.png) url for a 
-		given SMILES
+		given SMILES. Images are drawn by the calc's
+		image_backend if it has one, or else by jchem ws,
+		and kept in image_cache.
+		"""
+		backend = self.get_image_backend_name()
+		imgData = image_cache.get(request_obj, backend)
+		if imgData is not None:
+			return imgData
+		imgData = self.render_image(request_obj)
+		image_cache.set(request_obj, imgData, backend)
+		return imgData  # return dict of image data
+
+
+	def render_image(self, request_obj):
+		"""
+		Draws an image for a smilesToImage request_obj (uncached).
+		"""
+		if self.image_backend:
+			return self.image_backend.render(request_obj)
+		url = self.jchem_server_url + self.detail_endpoint
+		return self.web_call(url, self.get_image_request(request_obj))  # get response from jchem ws
+
+
+	def get_image_backend_name(self):
+		return self.image_backend.name if self.image_backend else "jchem"
+
+
+	def smilesToImages(self, request_objs):
+		"""
+		Batch version of smilesToImage. Returns a list of smilesToImage
+		results for a list of its request_objs. Images are deduplicated,
+		cached ones are reused, and the rest are requested in chunks of
+		image_batch_size structures (one jchem request per chunk and set
+		of image params). A chunk that fails is requested one at a time.
+		"""
+		if self.image_backend:
+			return [self.smilesToImage(request_obj) for request_obj in request_objs]
+		url = self.jchem_server_url + self.detail_endpoint
+		results = {}  # image key -> smilesToImage result
+		pending = {}  # display params -> {image key: (request_obj, request)}
+		image_keys = []
+		for request_obj in request_objs:
+			image_key = image_cache.get_key(request_obj)
+			image_keys.append(image_key)
+			if image_key in results:
+				continue
+			cached = image_cache.get(request_obj, key=image_key)
+			if cached is not None:
+				results[image_key] = cached
+				continue
+			results[image_key] = None
+			request = self.get_image_request(request_obj)
+			pending.setdefault(json.dumps(request['display'], sort_keys=True), {})[image_key] = (request_obj, request)
+
+		for requests_by_key in pending.values():
+			items = list(requests_by_key.items())
+			for i in range(0, len(items), self.image_batch_size):
+				chunk = items[i:i + self.image_batch_size]
+				batch_request = {
+					"structures": [request['structures'][0] for image_key, (request_obj, request) in chunk],
+					"display": chunk[0][1][1]['display']
+				}
+				try:
+					batch_results = self.web_call(url, batch_request)
+				except requests.exceptions.RequestException as e:
+					batch_results = {'valid': False, 'error': str(e)}
+				data = batch_results.get('data') if batch_results.get('valid') else None
+				if not isinstance(data, list) or len(data) != len(chunk):
+					logging.warning("Batch image request failed ({}), requesting images one at a time.".format(batch_results.get('error')))
+					for image_key, (request_obj, request) in chunk:
+						results[image_key] = self.smilesToImage(request_obj)
+					continue
+				for (image_key, (request_obj, request)), image_data in zip(chunk, data):
+					results[image_key] = {'data': [image_data], 'valid': True}
+					image_cache.set(request_obj, results[image_key], key=image_key)
+
+		return [results[image_key] for image_key in image_keys]
+
+
+	def get_image_request(self, request_obj):
+		"""
+		Returns the jchem detail request for a smilesToImage request_obj.
 		"""
 		smiles = request_obj.get('smiles')
 		imgScale = request_obj.get('scale', 100)
@@ -293,9 +417,7 @@ class Calculator(object):
 		else:
 			request['display']['parameters']['image'].update({'scale': imgScale})
 
-		url = self.jchem_server_url + self.detail_endpoint
-		imgData = self.web_call(url, request)  # get response from jchem ws
-		return imgData  # return dict of image data
+		return request
 
 
 	def convertToSMILES(self, request_obj):
@@ -311,7 +433,7 @@ class Calculator(object):
 			"parameters": "smiles"
 		}
 		url = self.jchem_server_url + self.export_endpoint
-		return self.web_call(url, data)  # get responset))
+		return self.cached_web_call(url, data)  # get responset))
 
 
 	def getStructInfo(self, structure):
@@ -321,6 +443,72 @@ class Calculator(object):
 		Output: dict with structure's info (i.e., formula, iupac, mass, smiles),
 		or dict with aforementioned keys but None values
 		"""
+		if self.local_struct_info:
+			return self.getStructInfos([structure])[0]
+		return self.getJchemStructInfo(structure)
+
+
+	def getStructInfos(self, structures):
+		"""
+		getStructInfo for a list of structures (e.g., a pKa result's
+		microspecies). With local_struct_info, formula, mass, exactMass
+		and smiles come from RDKit and only the iupac names are requested
+		from jchem ws, in batches. Structures RDKit can't parse
+		get jchem's getStructInfo.
+		"""
+		if not self.local_struct_info:
+			return [self.getJchemStructInfo(structure) for structure in structures]
+		infos = [local_chem.get_struct_info(structure) for structure in structures]
+		names = self.getIupacNames([info['smiles'] for info in infos if info])  # by canonical smiles, so each molecule is named once
+		for i, structure in enumerate(structures):
+			if infos[i] is None:
+				infos[i] = self.getJchemStructInfo(structure)
+			else:
+				infos[i]['iupac'] = names.get(infos[i]['smiles'])
+		return infos
+
+
+	def getIupacNames(self, structures):
+		"""
+		Returns {structure: iupac name} for a list of structures, with
+		detail_batch_size structures per jchem ws request. Names that
+		can't be requested are left out.
+		"""
+		names = {}
+		structures = list(dict.fromkeys(structures))  # unique, in order
+		url = self.jchem_server_url + self.detail_endpoint
+		for i in range(0, len(structures), self.detail_batch_size):
+			chunk = structures[i:i + self.detail_batch_size]
+			post = {
+				"structures": [{"structure": structure} for structure in chunk],
+				"display": {
+					"include": ["structureData"],
+					"additionalFields": {
+						"iupac": "chemicalTerms(name)"
+					},
+					"parameters": {
+						"structureData": "smiles"
+					}
+				}
+			}
+			try:
+				results = self.cached_web_call(url, post)
+			except requests.exceptions.RequestException as e:
+				logging.warning("getIupacNames exception: {}".format(e))
+				continue
+			data = results.get('data') if results.get('valid') else None
+			if not isinstance(data, list) or len(data) != len(chunk):
+				logging.warning("getIupacNames error: {}".format(results.get('error')))
+				continue
+			for structure, struct_data in zip(chunk, data):
+				names[structure] = struct_data.get('iupac')
+		return names
+
+
+	def getJchemStructInfo(self, structure):
+		"""
+		getStructInfo from a jchem ws detail request.
+		"""
 		structDict = self.getChemDetails({"chemical": structure, "addH": True})
 		infoDictKeys = ['formula', 'iupac', 'mass', 'smiles','exactMass']
 		infoDict = {key: None for key in infoDictKeys}  # init dict with infoDictKeys and None vals
@@ -360,7 +548,29 @@ class Calculator(object):
 			}
 		}
 		url = self.jchem_server_url + self.detail_endpoint
-		return self.web_call(url, post_data)
+		return self.cached_web_call(url, post_data)
+
+
+	def get_mass(self, chemical):
+		"""
+		Returns a chemical's average mass, computed locally (see
+		local_chem.mass_provider) if RDKit can parse it, otherwise
+		from jchem ws (getMass).
+		"""
+		if self.local_mass:
+			mass = local_chem.mass_provider.get_mass(chemical)
+			if mass is not None:
+				return mass
+		json_obj = self.getMass({'chemical': chemical})  # get mass from jchem ws
+		return json_obj['data'][0]['mass']
+
+
+	def get_masses(self, chemicals):
+		"""
+		get_mass for a list of chemicals.
+		"""
+		masses = local_chem.mass_provider.get_masses(chemicals) if self.local_mass else [None] * len(chemicals)
+		return [mass if mass is not None else self.get_mass(chemical) for chemical, mass in zip(chemicals, masses)]
 
 
 	def get_chemical_type(self, chemical):
@@ -368,10 +578,14 @@ class Calculator(object):
 		Returns type of chemical (e.g., smiles, name, cas, etc.)
 		"""
 		url = self.jchem_server_url + self.type_endpoint
+		cache_key = request_key("POST", url, chemical)
+		cached_type = jchem_cache.get(cache_key)
+		if cached_type:
+			return cached_type
 		request_header = {'Content-Type': "*/*"}
 		response, results = None, None
 		try:
-			response = requests.post(url, data=chemical.encode('utf-8'), headers=request_header, timeout=self.request_timeout)
+			response = transport.post(url, data=chemical.encode('utf-8'), headers=request_header, timeout=self.request_timeout)
 			results = json.loads(response.content)
 		except Exception as e:
 			logging.warning("Exception at get_chemical_type: {}".format(e))
@@ -388,6 +602,8 @@ class Calculator(object):
 			_type_response['type'] = results['properties'].get('type')
 		if not _type_response['type'] and results.get('type'):
 			_type_response['type'] = results['type']
+		if _type_response['type']:
+			jchem_cache.set(cache_key, _type_response)
 		return _type_response
 
 	def get_smiles_from_name(self, chemical):
@@ -408,7 +624,7 @@ class Calculator(object):
 			'format': "smiles"
 		}
 
-		_results = self.web_call(_url, _post)
+		_results = self.cached_web_call(_url, _post)
 		_check_results = self.check_response_for_errors(_results)
 
 		if not _check_results.get('valid'):
@@ -469,7 +685,8 @@ class Calculator(object):
 	def web_call(self, url, data, headers=None):
 		"""
 		Makes the request to a specified URL
-		and POST data. Returns resonse data as dict
+		and POST data. Returns resonse data as dict.
+		Identical concurrent calls share one request.
 		"""
 		# TODO: Deal with errors more granularly... 403, 500, etc.
 
@@ -477,58 +694,233 @@ class Calculator(object):
 			headers = self.headers
 		try:
 			if data == None:
-				response = requests.get(url, timeout=self.request_timeout)
+				send_request = lambda: transport.get(url, timeout=self.request_timeout)
+				response = single_flight.do(request_key("GET", url), send_request)
 			else:
-				response = requests.post(url, data=json.dumps(data), headers=headers, timeout=self.request_timeout)
-
-			results = json.loads(response.content)
-
-			valid_object = self.check_response_for_errors(results)
+				send_request = lambda: transport.post(url, data=json.dumps(data), headers=headers, timeout=self.request_timeout)
+				response = single_flight.do(request_key("POST", url, data), send_request)
+			return self.parse_web_response(response)
+		except requests.exceptions.RequestException as e:
+			logging.warning("error at web call: {} /error".format(e))
+			raise e
 
-			if valid_object.get('valid'):
-				results['valid'] = True
-				return results
 
+	async def async_web_call(self, url, data, headers=None):
+		"""
+		Async version of web_call.
+		"""
+		if not headers:
+			headers = self.headers
+		try:
+			if data == None:
+				send_request = lambda: async_transport.get(url, timeout=self.request_timeout)
+				response = await single_flight.async_do(request_key("GET", url), send_request)
 			else:
-				error_response = {
-					'error': valid_object.get('error'),
-					'data': results,
-					'valid': False
-				}
-				return error_response
-
-			# return json.loads(response.content)
+				send_request = lambda: async_transport.post(url, data=json.dumps(data), headers=headers, timeout=self.request_timeout)
+				response = await single_flight.async_do(request_key("POST", url, data), send_request)
+			return self.parse_web_response(response)
 		except requests.exceptions.RequestException as e:
 			logging.warning("error at web call: {} /error".format(e))
 			raise e
 
 
+	def cached_web_call(self, url, data):
+		"""
+		web_call for jchem util requests, which are pure functions of
+		their payload. Valid results are kept in jchem_cache.
+		"""
+		cache_key = request_key("POST", url, data)
+		results = jchem_cache.get(cache_key)
+		if results is not None:
+			return results
+		results = self.web_call(url, data)
+		if results.get('valid'):
+			jchem_cache.set(cache_key, results)
+		return results
+
+
+	def parse_web_response(self, response):
+		"""
+		Returns web_call response data as dict, with 'valid'
+		set from check_response_for_errors.
+		"""
+		results = json.loads(response.content)
+
+		valid_object = self.check_response_for_errors(results)
+
+		if valid_object.get('valid'):
+			results['valid'] = True
+			return results
+
+		else:
+			error_response = {
+				'error': valid_object.get('error'),
+				'data': results,
+				'valid': False
+			}
+			return error_response
+
+
+
+
+
+	def validate_response(self, response):
+		"""
+		Default response validation for request_with_retries,
+		calcs override this with their own checks.
+		"""
+		if response.status_code != 200:
+			logging.warning("{} server response status: {}".format(self.name, response.status_code))
+			return False
+		return True
+
+
+	def validate_json_response(self, response):
+		"""
+		validate_response, plus a JSON body check, so a 200 with e.g.
+		an html error page or empty body is retried like an invalid
+		response rather than failing the calc's json parsing.
+		"""
+		if not self.validate_response(response):
+			return False
+		try:
+			json.loads(response.content)
+		except ValueError as e:
+			logging.warning("{} server response isn't json: {}".format(self.name, e))
+			return False
+		return True
+
+
+	def check_upstream(self, url):
+		"""
+		Returns a fast-fail response ({'valid': False, 'data': ...}) if
+		the url's upstream circuit is open, or None if it's available.
+		"""
+		if url and not transport.is_available(url):
+			logging.warning("{} upstream {} unavailable (circuit open).".format(self.name, transport.get_host(url)))
+			return fast_fail_response(transport.get_host(url), "Cannot reach {} calculator".format(self.name))
+		return None
+
+
+	def request_with_retries(self, url, post_data):
+		"""
+		Makes POST request to a calc server using the calc's retry_policy,
+		retrying until validate_json_response passes or the policy gives up.
+		Returns the valid response, or None. Identical concurrent requests
+		share one set of tries (see single_flight).
+		"""
+		stored_response = self.get_stored_response(url, post_data)
+		if stored_response:
+			return stored_response
+
+		def send_request():
+			return transport.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
+
+		response = single_flight.do(request_key("POST", url, post_data),
+			lambda: self.retry_policy.execute(url, send_request, self.validate_json_response, self.max_retries))
+		self.store_response(url, post_data, response)
+		return response
+
+
+	async def async_request_with_retries(self, url, post_data):
+		"""
+		Async version of request_with_retries.
+		"""
+		stored_response = self.get_stored_response(url, post_data)
+		if stored_response:
+			return stored_response
+
+		async def send_request():
+			return await async_transport.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
+
+		response = await single_flight.async_do(request_key("POST", url, post_data),
+			lambda: self.retry_policy.async_execute(url, send_request, self.validate_json_response, self.max_retries))
+		self.store_response(url, post_data, response)
+		return response
+
+
+	def get_store_namespace(self):
+		"""
+		Response store namespace for the calc, e.g., "pkasolver:0.3".
+		Changing a calc's meta_info modelVersion (or its
+		CTS_<NAME>_MODEL_VERSION env var) invalidates its stored responses.
+		"""
+		name = self.name or self.__class__.__name__.lower()
+		version = os.environ.get("CTS_{}_MODEL_VERSION".format(name.upper()))
+		meta_info = getattr(self, 'meta_info', None)
+		if not version and meta_info:
+			version = meta_info.get('metaInfo', {}).get('modelVersion')
+		return "{}:{}".format(name, version or "0")
+
+
+	def get_stored_response(self, url, payload=None):
+		"""
+		Returns the calc's stored response for a request (a requests-like
+		response object), or None.
+		"""
+		stored = response_store.get(self.get_store_namespace(), url, payload)
+		if not stored:
+			return None
+		status, content = stored
+		try:
+			json.loads(content)
+		except ValueError:
+			return None  # stored before responses had to be json
+		response = AsyncResponse(url, status, content)
+		response.from_store = True
+		return response
+
+
+	def store_response(self, url, payload, response):
+		"""
+		Saves a valid upstream response to the response store.
+		"""
+		if response is None or getattr(response, 'from_store', False) or response.status_code != 200:
+			return
+		response_store.set(self.get_store_namespace(), url, payload, response.content, response.status_code)
+
+
+	async def async_data_request_handler(self, request_dict):
+		"""
+		Async version of the calcs' data_request_handler. Calcs without
+		their own run the sync handler in a worker thread.
+		"""
+		return await asyncio.to_thread(self.data_request_handler, request_dict)
+
+
+	def run_data_request(self, request_dict):
+		"""
+		Runs the calc's async_data_request_handler from sync code within
+		the request's deadline (request_dict 'deadline' as unix time, or the
+		CTS_REQUEST_BUDGET env var in seconds). Upstream calls get at most
+		the time remaining; if any were cut short, the response gets
+		'deadline_exceeded': True.
+		"""
+		with request_deadline(request_dict) as deadline:
+			response_obj = run_async(self.async_data_request_handler(request_dict))
+		return mark_deadline_exceeded(response_obj, deadline)
+
+
 
 
 
 	################# TRANSFORMATION PRODUCTS STUFF (DATA_WALKS) #######################
 
-	def nodeWrapper(self, smiles, height, width, scale, key=None, img_type=None, isProduct=None):
+	def nodeWrapper(self, smiles, height, width, scale, key=None, img_type=None, isProduct=None, results=None):
 		"""
 		Wraps image html tag around
 		the molecule's image source
-		Inputs: smiles, height, width, scale, key
+		Inputs: smiles, height, width, scale, key,
+		results (optional smilesToImage results, e.g., from smilesToImages)
 		Returns: html of wrapped image
 		"""
 
-		# 1. Get image from smiles
-		post = {
-			"smiles": smiles,
-			"scale": scale,
-			"height": height,
-			"width": width,
-			# "type": img_type
-		}
+		if self.image_reference_url and results is None:
+			return self.imageReferenceWrapper(smiles, height, width, scale, key, img_type, isProduct)
 
-		if img_type:
-			post.update({'type': img_type})
-
-		results = self.smilesToImage(post)
+		# 1. Get image from smiles
+		if results is None:
+			results = self.smilesToImage(self.get_image_post(smiles, height, width, scale, img_type))
 
 		# 2. Get imageUrl out of results
 		img, imgScale = '', ''
@@ -558,6 +950,92 @@ class Calculator(object):
 		return html
 
 
+	def get_image_post(self, smiles, height, width, scale, img_type=None):
+		"""
+		smilesToImage request_obj for nodeWrapper's image args.
+		"""
+		post = {
+			"smiles": smiles,
+			"scale": scale,
+			"height": height,
+			"width": width,
+			# "type": img_type
+		}
+
+		if img_type:
+			post.update({'type': img_type})
+
+		return post
+
+
+	def imageReferenceWrapper(self, smiles, height, width, scale, key=None, img_type=None, isProduct=None):
+		"""
+		nodeWrapper html for image_reference_url mode: the <img> links to
+		the image (see get_image_url), which the browser loads lazily,
+		so hidden images (e.g., the popup's png for pdf) aren't fetched
+		until they're shown.
+		"""
+		src = self.get_image_url(self.get_image_post(smiles, height, width, scale, img_type))
+		size = ''.join(' {}={}'.format(name, value) for name, value in [('width', width), ('height', height)] if value)
+		if img_type and img_type == 'svg':
+			id_attr = ' id="' + str(key) + '"' if key else ''
+			return '<div class="cts-chem-wrap" style="background-color:white;"{}><img alt="{}" src="{}"{} loading="lazy" /></div>'.format(id_attr, smiles, src, size)
+		if isProduct:
+			return '<img class="metabolite" id="{}" alt="{}" src="{}"{} loading="lazy" />'.format(key, smiles, src, size)
+		return '<img class="metabolite hidden-chem" id="{}" alt="{}" src="{}"{} loading="lazy" hidden />'.format(key, smiles, src, size)
+
+
+	def get_image_url(self, request_obj):
+		"""
+		Returns image_reference_url with the image's normalized params
+		(see ImageCache.get_params) as the query, so a molecule's url
+		is the same wherever it appears.
+		"""
+		params = {name: value for name, value in image_cache.get_params(request_obj).items() if value is not None}
+		return self.image_reference_url + "?" + urlencode(sorted(params.items()))
+
+
+	def get_image_response(self, query):
+		"""
+		Resolves an image url's query (dict) through smilesToImage
+		(and so the image cache). Returns (content_type, body), or
+		None if the image can't be drawn.
+		"""
+		if not query.get('smiles'):
+			return None
+		request_obj = {'smiles': query['smiles'], 'type': query.get('type') or "png"}
+		try:
+			for name in ['width', 'height', 'scale']:
+				if query.get(name):
+					request_obj[name] = int(float(query[name]))
+		except (TypeError, ValueError) as e:
+			logging.warning("get_image_response exception: {}".format(e))
+			return None
+		results = self.smilesToImage(request_obj)
+		if not results.get('valid') or 'data' not in results:
+			return None
+		image = results['data'][0]['image']['image']
+		if request_obj['type'] == 'svg':
+			return "image/svg+xml", image.encode("utf-8")
+		return "image/png", base64.b64decode(image)
+
+
+	def get_popup_image_params(self, isProduct=False):
+		"""
+		nodeWrapper (height, width, img_type, isProduct) args for
+		the two images in a popupBuilder popup.
+		"""
+		if isProduct:
+			return [
+				(None, 250, 'svg', None),  # svg popups for chemspec and gentrans outputs
+				(None, None, None, None)  # hidden png for pdf
+			]
+		return [
+			(None, None, 'png', True),  # NOTE: testing just png for popups to fix missing lines in svgs
+			(None, None, None, None)  # hidden png for pdf
+		]
+
+
 	def imgTmpl2(self, data, isProduct):
 		"""
 		Creates <img> without Django templates.
@@ -598,7 +1076,7 @@ class Calculator(object):
 	# 	return Template(imgTmpl)
 
 
-	def popupBuilder(self, root, paramKeys, molKey=None, header=None, isProduct=False):
+	def popupBuilder(self, root, paramKeys, molKey=None, header=None, isProduct=False, images=None):
 		"""
 		Wraps molecule data (e.g., formula, iupac, mass, 
 		smiles, image) for hover-over popups in chemspec
@@ -609,6 +1087,8 @@ class Calculator(object):
 		paramKeys - keys to use for building table
 		molKey - (optional) add id to wrap table
 		header - (optional) add header above key/values 
+		images - (optional) smilesToImage results for the popup's
+		images (see get_popup_image_params), if already requested
 
 		Returns: dictionary where html key is 
 		the wrapped html and the other keys are
@@ -618,12 +1098,9 @@ class Calculator(object):
 		html = '<div id="{}_div" class="nodeWrapDiv"><div class="metabolite_img" style="float:left;">'.format(molKey)
 
 		# smiles, height, width, scale, key=None, img_type=None
-		if isProduct:
-			html += self.nodeWrapper(root['smiles'], None, 250, self.image_scale, molKey, 'svg')  # svg popups for chemspec and gentrans outputs
-			html += self.nodeWrapper(root['smiles'], None, None, self.image_scale, molKey, None)  # hidden png for pdf
-		else:
-			html += self.nodeWrapper(root['smiles'], None, None, self.image_scale, molKey, 'png', True)  # NOTE: testing just png for popups to fix missing lines in svgs
-			html += self.nodeWrapper(root['smiles'], None, None, self.image_scale, molKey, None)  # hidden png for pdf
+		for i, (height, width, img_type, is_product_img) in enumerate(self.get_popup_image_params(isProduct)):
+			results = images[i] if images else None
+			html += self.nodeWrapper(root['smiles'], height, width, self.image_scale, molKey, img_type, is_product_img, results)
 
 		html += '</div>'
 
@@ -1,4 +1,3 @@
-import requests
 import json
 import time
 import os
@@ -6,6 +5,7 @@ import logging
 from bs4 import BeautifulSoup
 
 from .calculator import Calculator
+from .http_transport import transport
 
 
 headers = {"Content-type": "application/json", "Accept": "text/html"}
@@ -45,7 +45,7 @@ class BiotransCalc(Calculator):
 		Returns an ID for looking up response and status.
 		"""
 		try:
-			return requests.post(url, json=post_data, headers=headers, timeout=self.request_timeout, verify=False)
+			return transport.post(url, json=post_data, headers=headers, timeout=self.request_timeout, verify=False)
 		except Exception as e:
 			logging.warning("Exception in calculator_biotrans: {}".format(e))
 			return {"error": "Error making request to biotransformer."}
@@ -1,4 +1,3 @@
-import requests
 import json
 import time
 import os
@@ -7,6 +6,8 @@ from bs4 import BeautifulSoup
 
 from .calculator import Calculator
 from .chemical_information import SMILESFilter
+from .http_transport import transport
+from .metrics import metrics
 
 
 
@@ -25,6 +26,7 @@ class BiotransCalc(Calculator):
 		self.baseUrl = os.environ.get('CTS_BIOTRANS_SERVER', "http://biotransformer.ca")
 		self.query_url = self.baseUrl + '/queries.json'  # initiates request
 		self.pred_url = self.baseUrl + '/queries/{}.json'  # returns status and results
+		metrics.register_endpoint(self.pred_url)  # labels requests by endpoint rather than query id
 		self.urlStruct = "/biotrans/rest/run"
 		self.props = ["CYP450", "EC-BASED", "PHASEII", "HGUT", "ENVMICRO", "ALLHUMAN", "SUPERBIO"]
 		self.biotrans_tasks = ["PREDICTION", "IDENTIFICATION"]
@@ -118,7 +120,7 @@ class BiotransCalc(Calculator):
 		Returns an ID for looking up response and status.
 		"""
 		try:
-			return requests.post(self.query_url, json=api_query, headers=headers, timeout=self.request_timeout)
+			return transport.post(self.query_url, json=api_query, headers=headers, timeout=self.request_timeout)
 		except Exception as e:
 			logging.warning("Exception in calculator_biotrans: {}".format(e))
 			return None
@@ -128,7 +130,7 @@ class BiotransCalc(Calculator):
 		Makes request for predictions.
 		"""
 		try:
-			result = requests.get(self.pred_url.format(query_id))  # /queries/[id].json
+			result = transport.get(self.pred_url.format(query_id))  # /queries/[id].json
 			return json.loads(result.content)
 		except Exception as e:
 			logging.warning("Exception in calculator_biotrans: {}".format(e))
@@ -1,11 +1,12 @@
-import requests
 import json
 import logging
+import asyncio
 import os
 # import redis
 from .chemical_information import SMILESFilter
 from .calculator import Calculator
 from .jchem_properties import JchemProperty
+from .http_transport import transport
 from rdkit import Chem
 
 
@@ -123,7 +124,7 @@ class JchemCalc(Calculator):
         request_obj["structure"] = request_dict["chemical"]
 
         try:
-            response = requests.post(self.ctsws_pka_url, json=request_obj)
+            response = transport.post(self.ctsws_pka_url, json=request_obj)
             response_json = json.loads(response.content)
         except Exception as e:
             logging.error("Could not make request to ctsws pka: {}".format(e))
@@ -143,6 +144,13 @@ class JchemCalc(Calculator):
           + request_dict - POST data for p-chem request or speciation (transformation
             products moved to MetabolizerCalc).
         """
+        return self.run_data_request(request_dict)
+
+
+    async def async_data_request_handler(self, request_dict):
+        """
+        Async version of data_request_handler.
+        """
 
         for key, val in self.pchem_request.items():
             if not key in request_dict.keys():
@@ -150,7 +158,7 @@ class JchemCalc(Calculator):
 
         _filtered_smiles = ''
         try:
-            _filtered_smiles = SMILESFilter().parseSmilesByCalculator(request_dict['chemical'], request_dict['calc']) # call smilesfilter
+            _filtered_smiles = await asyncio.to_thread(SMILESFilter().parseSmilesByCalculator, request_dict['chemical'], request_dict['calc']) # call smilesfilter
         except Exception as err:
             logging.warning("Error filtering SMILES: {}".format(err))
             request_dict.update({'data': 'Cannot filter SMILES for ChemAxon data'})
@@ -167,7 +175,7 @@ class JchemCalc(Calculator):
                 'run_type': "single",
                 'request_post': request_dict
             }
-            speciation_data = self.get_speciation_results(request_dict)
+            speciation_data = await asyncio.to_thread(self.get_speciation_results, request_dict)
             data_obj['request_post'] = {'service': "speciation"}
             data_obj['data'] = speciation_data
 
@@ -186,12 +194,12 @@ class JchemCalc(Calculator):
 
                 if request_dict['prop'] == 'kow_wph' or request_dict['prop'] == 'kow_no_ph':
                     _response_dict.update({'method': request_dict['method']})
-                    _results = self.jchem_prop_obj.getJchemPropData(_response_dict)
+                    _results = await self.jchem_prop_obj.async_getJchemPropData(_response_dict)
                     _response_dict.update({'data': _results['data'], 'method': request_dict['method']})
                     return _response_dict
 
                 else:
-                    _results = self.jchem_prop_obj.getJchemPropData(_response_dict)
+                    _results = await self.jchem_prop_obj.async_getJchemPropData(_response_dict)
                     _response_dict.update({'data': _results['data'], 'method': None})
                     return _response_dict
 
@@ -4,6 +4,7 @@ import logging
 import os
 
 from .calculator import Calculator
+from .async_transport import async_transport
 
 
 class EnvipathCalc(Calculator):
@@ -125,6 +126,11 @@ class EnvipathCalc(Calculator):
 
 
     def data_request_handler(self, request_dict):
+        return self.run_data_request(request_dict)
+
+
+
+    async def async_data_request_handler(self, request_dict):
 
         # metabolizer_data = request_dict.get("metabolizer_post")
         chemical = request_dict["chemical"]
@@ -139,7 +145,10 @@ class EnvipathCalc(Calculator):
         }
 
         try:
-            response = requests.post(self.envipath_api_url, json=post_data, timeout=self.timeout)
+            response = self.get_stored_response(self.envipath_api_url, post_data)
+            if not response:
+                response = await async_transport.post(self.envipath_api_url, json=post_data, timeout=self.timeout)
+                self.store_response(self.envipath_api_url, post_data, response)
         except requests.exceptions.RequestException as e:
             logging.warning("calculator_envipath exception: {}".format(e))
             _response_obj.update({'error': "Error getting data from Envipath"})
@@ -1,11 +1,13 @@
-import requests
 import json
 import logging
+import asyncio
 import os
 
 from .calculator import Calculator
 from .chemical_information import SMILESFilter
 from .calculator_rdkit import RdkitCalc
+from .http_transport import transport
+from .async_transport import run_async
 
 
 
@@ -92,34 +94,32 @@ class EpiCalc(Calculator):
 
     
     def makeDataRequest(self, url, structure, calc=None):
-        _post = {'structure': structure}
-        if self.melting_point != None:
-            _post['melting_point'] = self.melting_point
-        return self.request_logic(url, _post)
+        return run_async(self.async_makeDataRequest(url, structure, calc))
 
     
     def request_logic(self, url, post_data):
         """
         Handles retries and validation of responses
         """
+        return run_async(self.async_request_logic(url, post_data))
 
-        _valid_result = False  # for retry logic
-        _retries = 0
-        while not _valid_result and _retries < self.max_retries:
-            # retry data request to chemaxon server until max retries or a valid result is returned
-            try:
-                response = requests.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
-                _valid_result = self.validate_response(response)
-                if _valid_result:
-                    self.results = json.loads(response.content)
-                    return self.results
-                _retries += 1
-            except Exception as e:
-                logging.warning("Exception in calculator_epi.py: {}".format(e))
-                _retries += 1
 
-            logging.info("Max retries: {}, Retries left: {}".format(self.max_retries, _retries))
-        self.results = "calc server not found"
+    async def async_makeDataRequest(self, url, structure, calc=None):
+        _post = {'structure': structure}
+        if self.melting_point != None:
+            _post['melting_point'] = self.melting_point
+        return await self.async_request_logic(url, _post)
+
+
+    async def async_request_logic(self, url, post_data):
+        """
+        Async version of request_logic.
+        """
+        response = await self.async_request_with_retries(url, post_data)
+        if response is None:
+            self.results = "calc server not found"
+            return self.results
+        self.results = json.loads(response.content)
         return self.results
 
 
@@ -462,7 +462,7 @@ class EpiCalc(Calculator):
 
                 logging.info("Making QSAR request to EPI.")
 
-                response = requests.post(url, data=json.dumps({'structure': parent}), headers=self.headers)
+                response = transport.post(url, data=json.dumps({'structure': parent}), headers=self.headers)
 
                 if response.status_code != 200:
                     logging.warning("Error requesting half-life data from EPI Suite.\nStatus code: {}\nContent: {}".format(response.status_code, response.content))
@@ -685,6 +685,13 @@ class EpiCalc(Calculator):
         """
         Makes requests to the EPI Suite server
         """
+        return self.run_data_request(request_dict)
+
+
+    async def async_data_request_handler(self, request_dict):
+        """
+        Async version of data_request_handler.
+        """
         
         _filtered_smiles = ''
         _response_dict = {}
@@ -695,8 +702,13 @@ class EpiCalc(Calculator):
                 _response_dict[key] = request_dict.get(key)
         _response_dict.update({'request_post': request_dict, 'method': None})
 
+        _fast_fail = self.check_upstream(self.baseUrl)  # skips filtering if EPI's circuit is open
+        if _fast_fail:
+            _response_dict.update(_fast_fail)
+            return _response_dict
+
         try:
-            _filtered_smiles = SMILESFilter().parseSmilesByCalculator(request_dict['chemical'], request_dict['calc']) # call smilesfilter
+            _filtered_smiles = await asyncio.to_thread(SMILESFilter().parseSmilesByCalculator, request_dict['chemical'], request_dict['calc']) # call smilesfilter
         except Exception as err:
             logging.warning("Error filtering SMILES: {}".format(err))
             _response_dict.update({
@@ -710,7 +722,7 @@ class EpiCalc(Calculator):
             
             request_dict['filtered_smiles'] = _filtered_smiles
 
-            _result_obj = self.make_qsar_request(request_dict)
+            _result_obj = await asyncio.to_thread(self.make_qsar_request, request_dict)
 
             # TODO: Account for not valid result_obj
 
@@ -724,18 +736,18 @@ class EpiCalc(Calculator):
             _get_mp = request_dict.get('prop') == 'water_sol' or request_dict.get('prop') == 'vapor_press'
             
             if _get_mp:
-                self.melting_point = self.get_melting_point(_filtered_smiles, 
+                self.melting_point = await self.async_get_melting_point(_filtered_smiles, 
                                         request_dict.get('sessionid'), self)
             else:
                 self.melting_point = None
 
-            _result_obj = self.makeDataRequest(self.baseUrl, _filtered_smiles, request_dict['calc']) # make call for data!
+            _result_obj = await self.async_makeDataRequest(self.baseUrl, _filtered_smiles, request_dict['calc']) # make call for data!
 
             if _get_mp and not self.melting_point:
                 # MP not found from measured or test, getting from results,
                 # and requesting data again with set MP..
                 self.melting_point = self.get_mp_from_results(_result_obj)
-                _result_obj = self.makeDataRequest(self.baseUrl, _filtered_smiles, request_dict['calc'])  # Make request using MP
+                _result_obj = await self.async_makeDataRequest(self.baseUrl, _filtered_smiles, request_dict['calc'])  # Make request using MP
 
             _response_dict.update(_result_obj)
             _response_dict['valid'] = True
@@ -1,6 +1,7 @@
 import requests
 import json
 import logging
+import asyncio
 import os
 import re
 from collections import defaultdict
@@ -174,6 +175,10 @@ class MeasuredCalc(Calculator, CCTE):
 
 
 	def data_request_handler(self, request_dict):
+		return self.run_data_request(request_dict)
+
+
+	async def async_data_request_handler(self, request_dict):
 
 		_filtered_smiles = ''
 		_response_dict = {}
@@ -186,7 +191,7 @@ class MeasuredCalc(Calculator, CCTE):
 		_response_dict.update({'request_post': request_dict, 'method': None})
 
 		try:
-			_filtered_smiles = SMILESFilter().parseSmilesByCalculator(request_dict['chemical'], request_dict['calc']) # call smilesfilter
+			_filtered_smiles = await asyncio.to_thread(SMILESFilter().parseSmilesByCalculator, request_dict['chemical'], request_dict['calc']) # call smilesfilter
 		except Exception as err:
 			logging.warning("Error filtering SMILES: {}".format(err))
 			_response_dict.update({
@@ -209,7 +214,7 @@ class MeasuredCalc(Calculator, CCTE):
 			return _response_dict
 
 		# Makes property request to CCTE for MP, BP, WS, VP, HL, and KOW.
-		prop_response = self.make_propery_request(dtxsid)
+		prop_response = await self.async_make_propery_request(dtxsid)
 
 		if not prop_response:
 			_response_dict.update({
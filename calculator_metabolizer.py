@@ -1,9 +1,11 @@
 import requests
 import json
 import logging
+import asyncio
 import os
 # import redis
 from .calculator import Calculator
+from .async_transport import run_async
 
 
 
@@ -41,6 +43,7 @@ class MetabolizerCalc(Calculator):
 
         self.tree_image_height = 114  # height of molecule in gentrans spacetree
         self.tree_image_width = 100  # width of molecule in gentrans spacetree
+        self.batch_tree_images = os.environ.get('CTS_GENTRANS_BATCH_IMAGES', 'false').lower() == 'true'  # builds node images with the tree
 
         self.gen_limit = 2
 
@@ -103,15 +106,78 @@ class MetabolizerCalc(Calculator):
         # node image, and popup image for products...
         # logging.info("PRODUCTS LIST: {}".format(self.products_list))
 
-        
-        # Could make one big request to get node images from list of 
-        # nodes here! But, the tree would need to be walked again so it
-        # can have edit the 'name' key with the node images...
-
+        if self.batch_tree_images:
+            self.add_tree_images(reDict['tree'])
 
         return json.dumps(reDict)
 
 
+    def get_tree_images(self, tree):
+        """
+        Builds the node image and popup image for every node in a
+        spacetree (from traverse) with a few batch image requests
+        instead of three smilesToImage requests per node.
+        Returns {node id: {'node_image': html, 'popup_image': popupBuilder dict}}.
+        """
+        nodes = []
+        self.walk_tree(tree, nodes)
+
+        popup_params = self.get_popup_image_params(True)
+        image_posts = []
+        for node in nodes:
+            smiles = node['data']['smiles']
+            image_posts.append(self.get_image_post(smiles, self.tree_image_height, self.tree_image_width, self.image_scale, 'svg'))
+            for height, width, img_type, is_product_img in popup_params:
+                image_posts.append(self.get_image_post(smiles, height, width, self.image_scale, img_type))
+
+        if self.image_reference_url:
+            results = [None] * len(image_posts)  # nodes link to images instead
+        else:
+            results = self.smilesToImages(image_posts)
+        images_per_node = 1 + len(popup_params)
+
+        tree_images = {}
+        for i, node in enumerate(nodes):
+            smiles = node['data']['smiles']
+            node_results = results[i * images_per_node:(i + 1) * images_per_node]
+            tree_images[node['id']] = {
+                'node_image': self.nodeWrapper(smiles, self.tree_image_height, self.tree_image_width, self.image_scale, node['id'], 'svg', True, node_results[0]),
+                'popup_image': self.popupBuilder(
+                    {"smiles": smiles},
+                    self.metabolite_keys,
+                    "{}".format(node['id']),
+                    "Metabolite Information", True, node_results[1:])
+            }
+        return tree_images
+
+
+    def add_tree_images(self, tree):
+        """
+        Fills in each spacetree node's image (the 'name' key, a loading
+        image until then) and popup using get_tree_images.
+        """
+        tree_images = self.get_tree_images(tree)
+        nodes = []
+        self.walk_tree(tree, nodes)
+        for node in nodes:
+            images = tree_images[node['id']]
+            node['name'] = images['node_image']
+            node['data']['node_image'] = images['node_image']
+            node['data']['popup_image'] = images['popup_image']
+        return tree
+
+
+    def walk_tree(self, node, nodes):
+        """
+        Appends a spacetree node and its descendants to nodes.
+        """
+        if not node or 'data' not in node:
+            return
+        nodes.append(node)
+        for child in node.get('children', []):
+            self.walk_tree(child, nodes)
+
+
     def traverse(self, root, gen_limit, unranked=False):
         """
         For gentrans model output - products tree
@@ -198,6 +264,10 @@ class MetabolizerCalc(Calculator):
 
 
     def data_request_handler(self, request_dict):
+        return self.run_data_request(request_dict)
+
+
+    async def async_data_request_handler(self, request_dict):
 
         _data_dict = request_dict.get('metabolizer_post')
         _data_dict.update({'structure': request_dict.get('chemical'), 'excludeCondition': 'hasValenceError()'})
@@ -212,7 +282,7 @@ class MetabolizerCalc(Calculator):
         if 'photolysis_unranked' in _data_dict.get('transformationLibraries', []):
             unranked = True
 
-        response = self.getTransProducts(_data_dict)
+        response = await self.async_getTransProducts(_data_dict)
 
         if "error" in response:
             _response_obj["error"] = response["error"]
@@ -221,7 +291,8 @@ class MetabolizerCalc(Calculator):
             _response_obj["error"] = "Error getting transformation products"
             return _response_obj
 
-        _results = self.recursive(response, int(request_dict['gen_limit']), unranked)
+        # batch tree images make blocking jchem/rdkit calls, so the tree is built off the event loop
+        _results = await asyncio.to_thread(self.recursive, response, int(request_dict['gen_limit']), unranked)
 
         _products_data = json.loads(_results)
 
@@ -255,6 +326,13 @@ class MetabolizerCalc(Calculator):
         """
         Makes request to metabolizer
         """
+        return run_async(self.async_getTransProducts(request_obj))
+
+
+    async def async_getTransProducts(self, request_obj):
+        """
+        Async version of getTransProducts.
+        """
         structure = request_obj.get("structure")
         gen_limit = request_obj.get("generationLimit")
         trans_libs = request_obj.get("transformationLibraries", [])
@@ -271,7 +349,7 @@ class MetabolizerCalc(Calculator):
 
         url = self.efs_server_url + self.efs_metabolizer_endpoint
         self.request_timeout = 120
-        return self.web_call(url, request_obj)
+        return await self.async_web_call(url, request_obj)
 
 
 
@@ -1,9 +1,9 @@
-import requests
 import json
 import logging
 import os
 
 from .calculator import Calculator
+from .async_transport import async_transport
 
 
 class MolgpkaCalc(Calculator):
@@ -51,6 +51,9 @@ class MolgpkaCalc(Calculator):
         return results
 
     def data_request_handler(self, request_dict):
+        return self.run_data_request(request_dict)
+
+    async def async_data_request_handler(self, request_dict):
 
         chemical = request_dict["chemical"]
 
@@ -65,9 +68,13 @@ class MolgpkaCalc(Calculator):
         results = None
 
         try:
-            response = requests.get(self.molgpka_api_url, params=post_data, timeout=self.timeout)
+            response = self.get_stored_response(self.molgpka_api_url, post_data)
+            if not response:
+                response = await async_transport.get(self.molgpka_api_url, params=post_data, timeout=self.timeout)
             results = json.loads(response.content)
             results = self.validate_response(results)
+            if results.get("status") == True:
+                self.store_response(self.molgpka_api_url, post_data, response)
         except Exception as e:
             logging.warning("calculator_molgpka exception: {}".format(e))
             _response_obj.update({"valid": False, "error": "Error getting data from molgpka"})
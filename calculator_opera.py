@@ -1,13 +1,15 @@
-import requests
 import json
 import logging
 import os
 import math
+import asyncio
 from .calculator import Calculator
 # from .chemical_information import SMILESFilter
 from .chemical_information import ChemInfo
 from .mongodb_handler import MongoDBHandler
 from .actorws import CCTE_EPA
+from .retry_policy import RetryPolicy
+from .async_transport import run_async
 
 
 db_handler = MongoDBHandler()  # mongodb handler for opera pchem data
@@ -27,6 +29,8 @@ class OperaCalc(Calculator):
         self.baseUrl = os.environ['CTS_OPERA_SERVER']
         self.urlStruct = "/opera/rest/run"
         self.request_timeout = 300  # 3 min timeout for OPERAWS
+        # OPERA timeouts mean an overloaded server, so they aren't retried:
+        self.retry_policy = RetryPolicy(retry_on_timeout=False, max_elapsed=2 * self.request_timeout)
         self.props = ['kow_no_ph', 'melting_point', 'boiling_point', 'henrys_law_con', 'vapor_press', 'water_sol', 'ion_con', 'kow_wph', 'log_bcf', 'koc']
         self.opera_props = ['LogP_pred', 'MP_pred', 'BP_pred', 'LogVP_pred', 'LogWS_pred', 'pKa_a_pred',
             'pKa_b_pred', 'LogD55_pred', 'LogD74_pred', 'LogBCF_pred', 'LogKoc_pred']
@@ -136,8 +140,7 @@ class OperaCalc(Calculator):
             _ws_result = (10**ws_data_val) * ws_data_obj['mass'] * 1000.0
         else:
             # Requests mass from Calculator
-            json_obj = self.getMass({'chemical': ws_data_obj['chemical']})
-            mass = json_obj['data'][0]['mass']
+            mass = self.get_mass(ws_data_obj['chemical'])
             # _ws_result = 1000 * mass * 10**-(ws_data_val)  # from TESTWS WS conversion
             _ws_result = (10**ws_data_val) * mass * 1000.0
         return _ws_result
@@ -267,30 +270,28 @@ class OperaCalc(Calculator):
         return new_results
 
     def makeDataRequest(self, smiles):
-        _post = {'smiles': smiles}
-        _url = self.baseUrl + self.urlStruct
-        return self.request_logic(_url, _post)
+        return run_async(self.async_makeDataRequest(smiles))
     
     def request_logic(self, url, post_data):
         """
         Handles retries and validation of responses
         """
-        _valid_result = False  # for retry logic
-        _retries = 0
-        while not _valid_result and _retries < self.max_retries:
-            # retry data request to chemaxon server until max retries or a valid result is returned
-            try:
-                response = requests.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
-                _valid_result = self.validate_response(response)
-                if _valid_result:
-                    self.results = json.loads(response.content)
-                    return self.results
-                _retries += 1
-            except Exception as e:
-                logging.warning("Exception in calculator_opera.py: {}".format(e))
-                _retries += 1
-            logging.info("Max retries: {}, Retries left: {}".format(self.max_retries, _retries))
-        self.results = "calc server not found"
+        return run_async(self.async_request_logic(url, post_data))
+
+    async def async_makeDataRequest(self, smiles):
+        _post = {'smiles': smiles}
+        _url = self.baseUrl + self.urlStruct
+        return await self.async_request_logic(_url, _post)
+
+    async def async_request_logic(self, url, post_data):
+        """
+        Async version of request_logic.
+        """
+        response = await self.async_request_with_retries(url, post_data)
+        if response is None:
+            self.results = "calc server not found"
+            return self.results
+        self.results = json.loads(response.content)
         return self.results
 
     def validate_response(self, response):
@@ -346,6 +347,12 @@ class OperaCalc(Calculator):
         """
         Makes requests to the OPERA Suite server
         """
+        return self.run_data_request(request_dict)
+
+    async def async_data_request_handler(self, request_dict):
+        """
+        Async version of data_request_handler.
+        """
 
         OPERA_URL = os.environ.get("CTS_OPERA_SERVER")
 
@@ -359,10 +366,16 @@ class OperaCalc(Calculator):
             _response_dict[key] = request_dict.get(key)
         _response_dict.update({'request_post': request_dict, 'method': None})
 
+        _fast_fail = self.check_upstream(self.baseUrl)
+        if _fast_fail:
+            _response_dict.update(_fast_fail)
+            return _response_dict
+
         try:
-            _result_obj = self.makeDataRequest(request_dict['chemical'])
+            _result_obj = await self.async_makeDataRequest(request_dict['chemical'])
 
-            _result_obj = self.parse_results_for_cts(_response_dict, _result_obj)       
+            # water solubility conversion may request masses from jchem, so it's parsed off the event loop:
+            _result_obj = await asyncio.to_thread(self.parse_results_for_cts, _response_dict, _result_obj)
 
             _response_dict['data'] = _result_obj
             _response_dict['valid'] = True
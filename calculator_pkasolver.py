@@ -1,9 +1,10 @@
-import requests
 import json
 import logging
+import asyncio
 import os
 
 from .calculator import Calculator
+from .async_transport import async_transport
 
 
 class PkaSolverCalc(Calculator):
@@ -61,6 +62,9 @@ class PkaSolverCalc(Calculator):
         return results
 
     def data_request_handler(self, request_dict):
+        return self.run_data_request(request_dict)
+
+    async def async_data_request_handler(self, request_dict):
 
         chemical = request_dict["chemical"]
         microspecies = []  # pkasolver microspecies
@@ -76,17 +80,25 @@ class PkaSolverCalc(Calculator):
         results = None
 
         try:
-            response = requests.get(self.pkasolver_api_url, params=post_data, timeout=self.timeout)
+            response = self.get_stored_response(self.pkasolver_api_url, post_data)
+            if not response:
+                response = await async_transport.get(self.pkasolver_api_url, params=post_data, timeout=self.timeout)
             results = json.loads(response.content)
             results = self.validate_response(results)
+            if results.get("status") == True:
+                self.store_response(self.pkasolver_api_url, post_data, response)
         except Exception as e:
             logging.warning("calculator_pkasolver exception: {}".format(e))
             _response_obj.update({"valid": False, 'error': "Error getting data from pkasolver"})
             return _response_obj
 
-        # Get chem info for returned microspecies:
-        for key, smiles in results.get("species", {}).items():
-            chem_info = self.getStructInfo(smiles)
+        # Get chem info for returned microspecies (jchem requests run concurrently):
+        species = list(results.get("species", {}).items())
+        if self.local_struct_info:
+            struct_infos = await asyncio.to_thread(self.getStructInfos, [smiles for key, smiles in species])  # one batch request for the names
+        else:
+            struct_infos = await asyncio.gather(*[asyncio.to_thread(self.getStructInfo, smiles) for key, smiles in species])
+        for (key, smiles), chem_info in zip(species, struct_infos):
             ms_key = "microspecies" + str(int(key) + 1)
             chem_info.update({"key": ms_key})
             microspecies.append(chem_info)
@@ -1,9 +1,10 @@
 import json
 import logging
-import requests
+import asyncio
 import os
 from .calculator import Calculator
 from .chemical_information import SMILESFilter
+from .async_transport import run_async
 
 
 class SparcCalc(Calculator):
@@ -101,6 +102,10 @@ class SparcCalc(Calculator):
 
 
     def data_request_handler(self, request_dict):
+        return self.run_data_request(request_dict)
+
+
+    async def async_data_request_handler(self, request_dict):
 
         for key, val in self.pchem_request.items():
             if not key in request_dict.keys():
@@ -108,9 +113,14 @@ class SparcCalc(Calculator):
                 request_dict.update({key: val})
 
 
+        _fast_fail = self.check_upstream(self.base_url)
+        if _fast_fail:
+            request_dict.update(_fast_fail)
+            return request_dict
+
         _filtered_smiles = ''
         try:
-            _filtered_smiles = SMILESFilter().parseSmilesByCalculator(request_dict['chemical'], request_dict['calc']) # call smilesfilter
+            _filtered_smiles = await asyncio.to_thread(SMILESFilter().parseSmilesByCalculator, request_dict['chemical'], request_dict['calc']) # call smilesfilter
         except Exception as err:
             logging.warning("Error filtering SMILES: {}".format(err))
             request_dict.update({'data': 'Cannot filter SMILES'})
@@ -121,7 +131,7 @@ class SparcCalc(Calculator):
 
         # Gets melting point for sparc calculations.
         if request_dict.get('prop') == 'water_sol' or request_dict.get('prop') == 'vapor_press':                
-            self.melting_point = self.get_melting_point(_filtered_smiles, 
+            self.melting_point = await self.async_get_melting_point(_filtered_smiles, 
                                     request_dict.get('sessionid'), self)
         else:
             self.melting_point = None
@@ -138,14 +148,14 @@ class SparcCalc(Calculator):
         try:
             # Runs ion_con endpoint if it's user's requested property
             if request_dict.get('prop') == 'ion_con':
-                response = self.makeCallForPka() # response as d ict returned..
+                response = await self.async_makeCallForPka() # response as d ict returned..
                 pka_data = self.getPkaResults(response)
                 _response_dict.update({'data': pka_data, 'prop': 'ion_con'})
                 return _response_dict
 
             # Runs kow_wph endpoint if it's user's requested property
             elif request_dict.get('prop') == 'kow_wph':
-                response = self.makeCallForLogD() # response as dict returned..
+                response = await self.async_makeCallForLogD() # response as dict returned..
                 _response_dict.update({'data': self.getLogDForPH(response, request_dict['ph']), 'prop': 'kow_wph'})
                 return _response_dict
 
@@ -153,7 +163,7 @@ class SparcCalc(Calculator):
             else:
                 _post = self.get_sparc_query()
                 _url = self.base_url + self.multiproperty_url
-                _multi_response = self.makeDataRequest()
+                _multi_response = await self.async_makeDataRequest()
 
                 if 'calculationResults' in _multi_response:
                     _multi_response = self.parseMultiPropResponse(_multi_response['calculationResults'], request_dict)
@@ -169,31 +179,31 @@ class SparcCalc(Calculator):
 
 
     def makeDataRequest(self):
+        return run_async(self.async_makeDataRequest())
+
+
+    async def async_makeDataRequest(self):
         _post = self.get_sparc_query()
         _url = self.base_url + self.multiproperty_url
-        return self.request_logic(_url, _post)
+        return await self.async_request_logic(_url, _post)
 
 
     def request_logic(self, url, post_data):
         """
         Handles retries and validation of responses
         """
-        _valid_result = False  # for retry logic
-        _retries = 0
-        while not _valid_result and _retries < self.max_retries:
-            # retry data request to chemaxon server until max retries or a valid result is returned
-            try:
-                response = requests.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
-                _valid_result = self.validate_response(response)
-                if _valid_result:
-                    self.results = json.loads(response.content)
-                    return self.results
-                _retries += 1
-            except Exception as e:
-                logging.warning("Exception in calculator_sparc.py: {}".format(e))
-                _retries += 1
-            logging.info("Max retries: {}, Retries left: {}".format(self.max_retries, _retries))
-        self.results = "calc server not found"
+        return run_async(self.async_request_logic(url, post_data))
+
+
+    async def async_request_logic(self, url, post_data):
+        """
+        Async version of request_logic.
+        """
+        response = await self.async_request_with_retries(url, post_data)
+        if response is None:
+            self.results = "calc server not found"
+            return self.results
+        self.results = json.loads(response.content)
         return self.results
 
 
@@ -267,6 +277,10 @@ class SparcCalc(Calculator):
         """
         Separate call for SPARC pKa
         """
+        return run_async(self.async_makeCallForPka())
+
+
+    async def async_makeCallForPka(self):
         _pka_url = "/sparc-integration/rest/calc/fullSpeciation"
         _url = self.base_url + _pka_url
         logging.info("URL: {}".format(_url))
@@ -283,7 +297,7 @@ class SparcCalc(Calculator):
         }
         _post_string = json.dumps(_sparc_post)
 
-        return self.request_logic(_url, _sparc_post)
+        return await self.async_request_logic(_url, _sparc_post)
 
 
     def getPkaResults(self, results):
@@ -328,6 +342,10 @@ class SparcCalc(Calculator):
         Seprate call for octanol/water partition
         coefficient with pH (logD?)
         """
+        return run_async(self.async_makeCallForLogD())
+
+
+    async def async_makeCallForLogD(self):
         _logd_url = "/sparc-integration/rest/calc/logd"
         _url = self.base_url + _logd_url
         _post = {
@@ -345,7 +363,7 @@ class SparcCalc(Calculator):
            "smiles": self.smiles
         }
 
-        logd_results = self.request_logic(_url, _post)
+        logd_results = await self.async_request_logic(_url, _post)
         return logd_results
 
 
@@ -1,13 +1,15 @@
 import requests
 import json
 import logging
+import asyncio
 import os
-import urllib3
-from urllib3.util.ssl_ import create_urllib3_context
 import urllib.parse
 
 from .calculator import Calculator
 from .chemical_information import SMILESFilter
+from .http_transport import transport
+from .async_transport import async_transport, run_async
+from .single_flight import single_flight, request_key
 
 
 headers = {'Content-Type': 'application/json'}
@@ -31,6 +33,9 @@ class TestWSCalc(Calculator):
 		if not self.baseUrl:
 			self.baseUrl = "https://comptox.epa.gov/dashboard/web-test"
 
+		# comptox needs legacy SSL renegotiation, set on TESTWS's pooled session:
+		transport.register_host(self.baseUrl, legacy_ssl=True)
+
 		self.methods = ['hc', 'nn', 'gc']  # general property methods
 		self.method = None
 		self.bcf_method = "sm"
@@ -91,9 +96,8 @@ class TestWSCalc(Calculator):
 		Expecting water sol data from TESTWS to have the following keys:
 		"expValMolarLog", "expValMass","predValMolarLog","predValMass","molarLogUnits","massUnits"
 		"""
-		# Requests mass from Jchem:
-		json_obj = self.getMass({'chemical': _response_dict['chemical']})
-		mass = json_obj['data'][0]['mass']
+		# Gets mass (local, or from Jchem):
+		mass = self.get_mass(_response_dict['chemical'])
 		_response_dict.update({'mass': mass})
 		_ws_result = 1000 * float(_response_dict['mass']) * 10**-(float(_response_dict['data']))
 		_response_dict.update({'data': _ws_result})
@@ -102,16 +106,21 @@ class TestWSCalc(Calculator):
 
 
 	def makeDataRequest(self, structure, calc, prop, method):
+		return run_async(self.async_makeDataRequest(structure, calc, prop, method))
+
+
+
+	async def async_makeDataRequest(self, structure, calc, prop, method):
 		test_prop = self.propMap[prop]['urlKey'] # prop name TEST understands
 		_url = self.baseUrl + "/{}".format(test_prop)
 		_payload = {'smiles': structure, 'method': method}
 		url = "{}/{}?{}".format(self.baseUrl, test_prop, urllib.parse.urlencode(_payload))
 		try:
-			response = self.ssl_legacy_request(url)
-		except urllib3.exceptions.TimeoutError:
+			response = await self.async_ssl_legacy_request(url)
+		except requests.exceptions.Timeout as te:
 			logging.warning("timeout exception: {}".format(te))
 			return {'error': 'timeout error'}
-		except urllib3.exceptions.HTTPError:
+		except requests.exceptions.ConnectionError as ce:
 			logging.warning("connection exception: {}".format(ce))
 			return {'error': 'connection error'}
 		except Exception as e:
@@ -126,29 +135,30 @@ class TestWSCalc(Calculator):
 		"""
 		Bypassing SSL legacy error being thrown when making requests to comptox.
 		https://github.com/urllib3/urllib3/issues/2653
+		The legacy SSL context is mounted on TESTWS's pooled session (see __init__).
 		"""
-		response = None
-		ctx = create_urllib3_context()
-		ctx.load_default_certs()
-		ctx.options |= 0x4  # ssl.OP_LEGACY_SERVER_CONNECT
-		with urllib3.PoolManager(ssl_context=ctx) as http:
-			try:
-				response = http.request("GET", url)
-			except urllib3.exceptions.TimeoutError:
-				logging.warning("timeout exception: {}".format(te))
-				return {'error': 'timeout error'}
-			except urllib3.exceptions.HTTPError:
-				logging.warning("connection exception: {}".format(ce))
-				return {'error': 'connection error'}
-		response_obj = requests.Response()
-		response_obj.status_code = response.status
-		response_obj._content = response.data.decode("utf-8")
-		response_obj.content
-		return response_obj
+		return transport.get(url, timeout=self.timeout)
+
+
+	async def async_ssl_legacy_request(self, url):
+		"""
+		Async version of ssl_legacy_request.
+		"""
+		response = self.get_stored_response(url)
+		if response:
+			return response
+		response = await single_flight.async_do(request_key("GET", url),
+			lambda: async_transport.get(url, timeout=self.timeout))
+		self.store_response(url, None, response)
+		return response
 
 
 	
-	def data_request_handler(self, request_dict):	
+	def data_request_handler(self, request_dict):
+		return self.run_data_request(request_dict)
+
+
+	async def async_data_request_handler(self, request_dict):
 
 		_filtered_smiles = ''
 		_response_dict = {}
@@ -161,10 +171,15 @@ class TestWSCalc(Calculator):
 		# _response_dict.update({'request_post': {'service': "pchemprops"}})  # TODO: get rid of 'request_post' and double data
 
 
+		_fast_fail = self.check_upstream(self.baseUrl)
+		if _fast_fail:
+			_response_dict.update(_fast_fail)
+			return _response_dict
+
 		# filter smiles before sending to TEST:
 		# ++++++++++++++++++++++++ smiles filtering!!! ++++++++++++++++++++
 		try:
-			_filtered_smiles = SMILESFilter().parseSmilesByCalculator(request_dict.get('chemical'), self.name) # call smilesfilter
+			_filtered_smiles = await asyncio.to_thread(SMILESFilter().parseSmilesByCalculator, request_dict.get('chemical'), self.name) # call smilesfilter
 		except Exception as err:
 			logging.warning("Error filtering SMILES: {}".format(err))
 			_response_dict.update({'data': "Cannot filter SMILES for TEST WS data"})
@@ -180,7 +195,7 @@ class TestWSCalc(Calculator):
 			# Make sure method name is all caps (it's an acronym):
 			_response_dict['method'] = _response_dict.get('method').upper()
 
-		_response = self.makeDataRequest(_filtered_smiles, self.name, request_dict.get('prop'), self.method)
+		_response = await self.async_makeDataRequest(_filtered_smiles, self.name, request_dict.get('prop'), self.method)
 
 		if 'error' in _response:
 			_response_dict.update({'data': _response['error']})
@@ -0,0 +1,115 @@
+"""
+Cache for cactus.nci.nih.gov CAS lookups by SMILES, with separate
+TTLs for hits, misses ("N/A") and errors. With background refresh
+(CTS_CAS_BACKGROUND_REFRESH), expired answers are returned right
+away and looked up again on a background thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import logging
+import time
+import os
+
+from .memory_cache import cache_from_env
+
+
+
+class CASCache:
+	"""
+	CAS lookups by SMILES. Lookup functions return (status, cas), with
+	status "hit", "miss" or "error", and entries expire after
+	CTS_CAS_CACHE_HIT_TTL, CTS_CAS_CACHE_MISS_TTL or
+	CTS_CAS_CACHE_ERROR_TTL seconds, respectively.
+	"""
+
+	def __init__(self):
+		self.memo = cache_from_env("cas", "CTS_CAS_CACHE", max_size=8192, ttl=0)  # entries carry their own expiry
+		self.ttls = {
+			'hit': float(os.environ.get('CTS_CAS_CACHE_HIT_TTL', 7 * 24 * 3600)),
+			'miss': float(os.environ.get('CTS_CAS_CACHE_MISS_TTL', 24 * 3600)),
+			'error': float(os.environ.get('CTS_CAS_CACHE_ERROR_TTL', 300))
+		}
+		self.background_refresh = os.environ.get('CTS_CAS_BACKGROUND_REFRESH', 'false').lower() == 'true'
+		self.refresh_workers = int(os.environ.get('CTS_CAS_REFRESH_WORKERS', 2))
+		self.executor = None
+		self.refreshing = set()  # SMILES with a background lookup in progress
+		self.lock = threading.Lock()
+
+	def get(self, smiles, lookup):
+		"""
+		Returns the CAS for a SMILES, calling lookup(smiles) if it
+		isn't cached or has expired (unless refreshing in the background).
+		"""
+		entry = self.memo.get(smiles)
+		if entry is not None:
+			if time.time() < entry['expires']:
+				return entry['cas']
+			if self.background_refresh:
+				self.refresh(smiles, lookup)
+				return entry['cas']
+		return self.lookup(smiles, lookup, entry)
+
+	def lookup(self, smiles, lookup, entry=None):
+		"""
+		Calls lookup and caches its result. An error keeps an expired
+		hit's CAS (for the error TTL) rather than replacing it with "N/A".
+		"""
+		try:
+			status, cas = lookup(smiles)
+		except Exception as e:
+			logging.warning("CAS lookup exception: {}".format(e))
+			status, cas = "error", "N/A"
+		if status == "error" and entry is not None and entry['status'] == "hit":
+			status, cas = "hit", entry['cas']
+			self.memo.set(smiles, {'cas': cas, 'status': status, 'expires': time.time() + self.ttls['error']})
+			return cas
+		self.memo.set(smiles, {'cas': cas, 'status': status, 'expires': time.time() + self.ttls.get(status, self.ttls['error'])})
+		return cas
+
+	def is_error(self, smiles):
+		"""
+		Whether a SMILES' cached answer is from a failed lookup.
+		"""
+		entry = self.memo.get(smiles)
+		return entry is not None and entry['status'] == "error"
+
+	def refresh(self, smiles, lookup):
+		"""
+		Looks up an expired SMILES on the refresh pool, once at a time.
+		"""
+		with self.lock:
+			if smiles in self.refreshing:
+				return
+			self.refreshing.add(smiles)
+			if self.executor is None:
+				self.executor = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix="cts-cas-refresh")
+			executor = self.executor
+		entry = self.memo.get(smiles)
+		def run():
+			try:
+				self.lookup(smiles, lookup, entry)
+			finally:
+				with self.lock:
+					self.refreshing.discard(smiles)
+		executor.submit(run)
+
+	def get_stats(self):
+		stats = self.memo.get_stats()
+		stats['refreshing'] = len(self.refreshing)
+		return stats
+
+	def reset_after_fork(self):
+		"""
+		Pool threads don't survive a fork, so child processes start their own.
+		"""
+		self.executor = None
+		self.refreshing = set()
+		self.lock = threading.Lock()
+
+
+
+cas_cache = CASCache()  # shared by ChemInfo.make_cas_request
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=cas_cache.reset_after_fork)
@@ -1,9 +1,12 @@
-import requests
 import logging
 import os
 import html
 import json
 
+from .http_transport import transport
+from .async_transport import async_transport, run_async
+from .metrics import metrics
+
 
 PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
 
@@ -26,6 +29,10 @@ class CCTE:
 		self.chem_details_dtxcid_url = "chemical/detail/search/by-dtxcid/{}"
 		self.chem_fate_url = "chemical/fate/search/by-dtxsid/{}"
 
+		for endpoint in [self.chem_search_equal_url, self.chem_search_substring_url, self.chem_search_starting_url,
+				self.chem_prop_dtxsid_url, self.chem_details_dtxsid_url, self.chem_details_dtxcid_url, self.chem_fate_url]:
+			metrics.register_endpoint(endpoint)  # labels requests by endpoint rather than chemical
+
 		# Required headers for their API:
 		self.headers = {
 			"Accept": "application/json",
@@ -125,7 +132,7 @@ class CCTE:
 		data_obj = None
 		if response.status_code != 200:
 			logging.warning("ccte request non-200: {}".format(response))
-			return {"status": False, "error": "Error making request to CCTE."}
+			return {"status": False, "error": "Error making request to CCTE.", "status_code": response.status_code}
 		try:
 			data_obj = json.loads(response.content)
 		except Exception as e:
@@ -141,7 +148,7 @@ class CCTE:
 		url = self.ccte_base_url + self.chem_search_equal_url.format(html.escape(chemical))
 		response = None
 		try:
-			response = requests.get(url, headers=self.headers, timeout=self.default_timeout)
+			response = transport.get(url, headers=self.headers, timeout=self.default_timeout)
 		except Exception as e:
 			logging.warning("ccte make_search_request exception, url: {}: {}".format(url, e))
 			return False
@@ -149,6 +156,8 @@ class CCTE:
 		if not isinstance(response_obj, list) and response_obj.get("status") != True:
 			# TODO: More exception handling?
 			return response_obj
+		if not response_obj:
+			return {}  # no chemical found
 		if len(response_obj) != 1:
 			logging.warning("More than one chemical returned in chemical search: {}".format(response_obj))
 			# TODO: idk, gonna pick the first one for now.
@@ -170,7 +179,7 @@ class CCTE:
 		"""
 		try:
 			url = self.ccte_base_url + self.chem_details_dtxsid_url.format(html.escape(dtxsid))
-			response = requests.get(url, headers=self.headers)
+			response = transport.get(url, headers=self.headers)
 			logging.info("Details response for {}: {}".format())
 			return json.loads(response.content)
 		except Exception as e:
@@ -188,9 +197,15 @@ class CCTE:
 		Makes a chemical property request using DTXSID
 		as the input type.
 		"""
+		return run_async(self.async_make_propery_request(dtxsid))
+
+	async def async_make_propery_request(self, dtxsid):
+		"""
+		Async version of make_propery_request.
+		"""
 		try:
 			url = self.ccte_base_url + self.chem_prop_dtxsid_url.format(html.escape(dtxsid))
-			response = requests.get(url, headers=self.headers)
+			response = await async_transport.get(url, headers=self.headers)
 			logging.info("Property response for {}: {}".format(url, response.content))
 			return json.loads(response.content)
 		except Exception as e:
@@ -235,7 +250,7 @@ class CCTE:
 		logging.warning("esp_dtxsid: {}".format(esp_dtxsid))
 		# url = self.ccte_base_url + self.chem_fate_url.format(html.escape(dtxsid))
 		url = self.ccte_base_url + self.chem_fate_url.format(dtxsid)
-		response = requests.get(url, headers=self.headers)
+		response = transport.get(url, headers=self.headers)
 		logging.info("Fate response for {}: {}".format())
 		return json.loads(response.content)
 		# except Exception as e:
@@ -0,0 +1,158 @@
+"""
+Read-through/write-through cache for get_cheminfo results, keyed by
+the normalized input chemical and is_node. An in-process LRU
+(CTS_CHEM_INFO_CACHE) sits in front of the mongodb chem_info
+collections (when CTS_DB_HOST is set), which expire documents after
+CTS_CHEM_INFO_DB_TTL seconds.
+"""
+
+import threading
+import logging
+import time
+import re
+import os
+
+from .memory_cache import cache_from_env
+
+try:
+	from .mongodb_handler import MongoDBHandler
+except ImportError:
+	MongoDBHandler = None  # pymongo not installed, in-process cache only
+
+
+
+ID_PLACEHOLDER = "{{chem_info_id}}"  # stands in for request_post's 'id' in cached popup html
+
+
+
+class ChemInfoCache:
+	"""
+	Caches successful get_cheminfo molecule objects. Database errors
+	are logged and treated as cache misses.
+	"""
+
+	def __init__(self, db_handler=None):
+		self.memory = cache_from_env("chem_info", "CTS_CHEM_INFO_CACHE", max_size=512, ttl=24 * 3600)
+		self.db_enabled = os.environ.get('CTS_CHEM_INFO_DB_CACHE', 'true').lower() == 'true'
+		self.db_handler = db_handler
+		self.db_retry_interval = 60  # seconds between reconnect attempts
+		self.db_last_attempt = None
+		self.db_lock = threading.Lock()
+
+	def get_key(self, chemical, is_node):
+		"""
+		Normalizes the user's chemical (surrounding and repeated
+		whitespace). SMILES aren't canonicalized, since the same
+		string can be a name (e.g., acronyms) or SMILES.
+		"""
+		return "{}|{}".format(" ".join(str(chemical).split()), "node" if is_node else "chem")
+
+	def get_db(self):
+		"""
+		Returns a connected MongoDBHandler, or None if the db cache is
+		disabled or unavailable (reconnects at most every db_retry_interval).
+		"""
+		if not self.db_enabled or (self.db_handler is None and (MongoDBHandler is None or not os.environ.get('CTS_DB_HOST'))):
+			return None
+		with self.db_lock:
+			if self.db_handler is not None and self.db_handler.is_connected:
+				return self.db_handler
+			if self.db_last_attempt and time.time() - self.db_last_attempt < self.db_retry_interval:
+				return None
+			self.db_last_attempt = time.time()
+			try:
+				db_handler = self.db_handler or MongoDBHandler()
+				db_handler.connect_to_db()
+				if db_handler.is_connected:
+					db_handler.create_chem_info_indexes()
+				self.db_handler = db_handler
+			except Exception as e:
+				logging.warning("chem_info_cache db connection exception: {}".format(e))
+				return None
+			return self.db_handler if self.db_handler.is_connected else None
+
+	def needs_extra(self, request_post):
+		"""
+		Whether a request uses the extra collection's fields (node
+		and popup images, or structureData for marvin sketch).
+		"""
+		return bool(request_post.get('is_node') or request_post.get('get_structure_data'))
+
+	def get(self, request_post):
+		"""
+		Returns the cached molecule object for a get_cheminfo request,
+		or None. Memory entries read from the db without the extra
+		fields are read again if a request needs them.
+		"""
+		key = self.get_key(request_post.get('chemical'), request_post.get('is_node'))
+		include_extra = self.needs_extra(request_post)
+		entry = self.memory.get(key)
+		if entry is None or (include_extra and not entry['extra']):
+			db_handler = self.get_db()
+			if db_handler is None:
+				return None
+			try:
+				molecule_obj = db_handler.find_chem_info_document(key, include_extra=include_extra)
+			except Exception as e:
+				logging.warning("chem_info_cache find exception: {}".format(e))
+				return None
+			if molecule_obj is None:
+				return None
+			entry = {'data': molecule_obj, 'extra': include_extra}
+			self.memory.set(key, entry)
+		return self.set_popup_id(entry['data'], request_post.get('id'))
+
+	def set(self, request_post, response_obj):
+		"""
+		Caches a successful, complete get_cheminfo response's molecule
+		object. Responses cut short by the deadline, or 'partial' ones
+		(a CCTE or CAS lookup failed), aren't cached.
+		"""
+		if not isinstance(response_obj, dict) or response_obj.get('status') is not True:
+			return
+		if response_obj.get('deadline_exceeded') or response_obj.get('partial'):
+			return
+		key = self.get_key(request_post.get('chemical'), request_post.get('is_node'))
+		molecule_obj = self.remove_popup_id(response_obj['data'], request_post.get('id'))
+		self.memory.set(key, {'data': molecule_obj, 'extra': True})
+		db_handler = self.get_db()
+		if db_handler is None:
+			return
+		try:
+			db_handler.insert_chem_info_data(key, molecule_obj)
+		except Exception as e:
+			logging.warning("chem_info_cache insert exception: {}".format(e))
+
+	def remove_popup_id(self, molecule_obj, popup_id):
+		"""
+		Swaps the request's 'id' in the popup html (ids of its div,
+		table and image) for ID_PLACEHOLDER.
+		"""
+		molecule_obj = dict(molecule_obj)
+		if molecule_obj.get('popup_image'):
+			molecule_obj['popup_image'] = re.sub('id="' + re.escape(str(popup_id)) + '(?=["_])', 'id="' + ID_PLACEHOLDER, molecule_obj['popup_image'])
+		return molecule_obj
+
+	def set_popup_id(self, molecule_obj, popup_id):
+		molecule_obj = dict(molecule_obj)
+		if molecule_obj.get('popup_image'):
+			molecule_obj['popup_image'] = molecule_obj['popup_image'].replace('id="' + ID_PLACEHOLDER, 'id="' + str(popup_id))
+		return molecule_obj
+
+	def get_stats(self):
+		return self.memory.get_stats()
+
+	def reset_after_fork(self):
+		"""
+		MongoClient isn't fork-safe, so child processes connect again.
+		"""
+		self.db_handler = None
+		self.db_last_attempt = None
+		self.db_lock = threading.Lock()
+
+
+
+chem_info_cache = ChemInfoCache()  # shared by ChemInfo.get_cheminfo
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=chem_info_cache.reset_after_fork)
@@ -3,10 +3,19 @@ __author__ = "np"
 import requests
 import logging
 import json
+import os
 from .calculator_metabolizer import MetabolizerCalc
 from .actorws import ACTORWS, CCTE_EPA
 from .smilesfilter import SMILESFilter
 from .ccte import CCTE
+from .http_transport import transport
+from .tracing import tracer
+from .metrics import metrics
+from .deadline import request_deadline, mark_deadline_exceeded, deadline_expired
+from .step_graph import run_step_graph, run_each
+from .chem_info_cache import chem_info_cache
+from .cas_cache import cas_cache
+from . import local_chem
 
 
 
@@ -72,6 +81,7 @@ class ChemInfo(object):
 		self.smiles_filter_obj = SMILESFilter()
 		self.calc_obj = MetabolizerCalc()  # note: inherits Calculator class as well
 		self.cas_url = "https://cactus.nci.nih.gov/chemical/structure/{}/cas"  # associated CAS
+		metrics.register_endpoint(self.cas_url)  # labels requests by endpoint rather than SMILES
 		self.carbon_anomolies = {
 			"C": "methane",
 			"CC": "ethane",
@@ -142,6 +152,11 @@ class ChemInfo(object):
 			'data': None,
 			'request_post': None
 		}
+		self.attach_trace = os.environ.get('CTS_TRACE_CHEMINFO', 'false').lower() == 'true'  # adds 'trace' to all responses
+		self.trace = None  # root span of the last get_cheminfo call
+		self.local_chemical_type = os.environ.get('CTS_LOCAL_CHEMICAL_TYPE', 'true').lower() == 'true'  # classifies obvious identifiers without jchem
+		self.batch_workers = int(os.environ.get('CTS_CHEMINFO_BATCH_WORKERS', 8))  # chemicals built concurrently by get_cheminfo_batch
+		self.ccte_batch_size = int(os.environ.get('CTS_CCTE_BATCH_SIZE', 100))  # chemicals per CCTE batch search
 
 	def create_cheminfo_table(self, workflow_obj):
 		"""
@@ -163,11 +178,113 @@ class ChemInfo(object):
 		return data
 
 	def get_cheminfo(self, request_post, only_dsstox=False):
+		"""
+		Runs build_cheminfo in a trace. The trace (a tree of each step's
+		duration and outcome) is kept as self.trace, and added to the
+		response as 'trace' if request_post has 'debug_trace' set (or
+		CTS_TRACE_CHEMINFO is true).
+
+		The lookup runs within request_post's 'deadline' (unix time) or
+		CTS_CHEMINFO_BUDGET seconds. Optional steps are skipped once it
+		has passed, and the response gets 'deadline_exceeded': True.
+
+		Complete responses are cached (see chem_info_cache), except
+		only_dsstox ones.
+		"""
+		with tracer.start_trace("get_cheminfo", chemical=request_post.get('chemical'), is_node=bool(request_post.get('is_node'))) as trace, \
+				request_deadline(request_post, 'CTS_CHEMINFO_BUDGET') as deadline:
+			response_obj = self.get_cached_cheminfo(request_post) if not only_dsstox else None
+			if trace and not only_dsstox:
+				trace.set_attribute('cache_hit', response_obj is not None)
+			if response_obj is None:
+				response_obj = self.build_cheminfo(request_post, only_dsstox)
+				if not only_dsstox:
+					mark_deadline_exceeded(response_obj, deadline)
+					chem_info_cache.set(request_post, response_obj)
+			if trace and isinstance(response_obj, dict) and response_obj.get('status') is False:
+				trace.set_error(response_obj.get('error'))
+		self.trace = trace
+		if trace and not only_dsstox and (request_post.get('debug_trace') or self.attach_trace):
+			response_obj['trace'] = trace.to_dict()
+		return response_obj
+
+	def get_cached_cheminfo(self, request_post):
+		"""
+		Returns a wrapped get_cheminfo response from chem_info_cache, or None.
+		"""
+		molecule_obj = chem_info_cache.get(request_post)
+		if molecule_obj is None:
+			return None
+		return {'status': True, 'data': molecule_obj, 'request_post': request_post}
+
+	def get_cheminfo_batch(self, chemicals):
+		"""
+		get_cheminfo for a list of chemicals (or request_posts), e.g., for
+		batch pages. Returns responses in the same order.
+
+		Chemicals are built concurrently (CTS_CHEMINFO_BATCH_WORKERS)
+		without the per-chemical CCTE search. Their DSSTOX data is then
+		looked up by preferred name in CCTE batch searches of
+		CTS_CCTE_BATCH_SIZE chemicals.
+		"""
+		request_posts = [chemical if isinstance(chemical, dict) else {'chemical': chemical} for chemical in chemicals]
+		responses = [self.get_cached_cheminfo(request_post) for request_post in request_posts]
+		missed = [i for i, response_obj in enumerate(responses) if response_obj is None]
+		for i, response_obj in zip(missed, run_each(self.build_batch_cheminfo, [request_posts[i] for i in missed], self.batch_workers)):
+			responses[i] = response_obj
+		built = [i for i in missed if responses[i].get('status') is True]
+		dsstox_results = self.get_batch_dsstox_results([responses[i]['data'].get('preferredName') for i in built])
+		for i in built:
+			molecule_obj = responses[i]['data']
+			dsstox_data = dsstox_results.get(molecule_obj.get('preferredName'), {})
+			if dsstox_data is None:
+				responses[i]['partial'] = True  # CCTE search failed
+			self.add_dsstox_data(molecule_obj, dsstox_data or {})
+			chem_info_cache.set(request_posts[i], responses[i])
+		return responses
+
+	def build_batch_cheminfo(self, request_post):
+		"""
+		Runs build_cheminfo without the CCTE search, wrapping any
+		exception as a "Cannot process chemical" response.
+		"""
+		try:
+			return self.build_cheminfo(request_post, skip_ccte=True)
+		except Exception as e:
+			logging.warning("Error building batch chem info for {}: {}".format(request_post.get('chemical'), e))
+			return {'status': False, 'error': "Cannot process chemical", 'request_post': request_post}
+
+	def get_batch_dsstox_results(self, names):
+		"""
+		Returns {preferred name: DSSTOX data} from CCTE batch searches.
+		Chunks that fail fall back to single CCTE searches, and names
+		whose single search fails too map to None.
+		"""
+		names = list(dict.fromkeys(name for name in names if name and name != "N/A" and "\n" not in name))
+		chunks = [names[i:i + self.ccte_batch_size] for i in range(0, len(names), self.ccte_batch_size)]
+		dsstox_results = {}
+		failed = []
+		for chunk, chunk_results in zip(chunks, run_each(self.ccte_epa_obj.get_batch_results, chunks, self.batch_workers)):
+			if isinstance(chunk_results, dict):
+				dsstox_results.update(chunk_results)
+			else:
+				failed.extend(chunk)
+		if failed:
+			logging.warning("CCTE batch search failed for {} chemicals, using single searches.".format(len(failed)))
+		for name, ccte_results in zip(failed, run_each(self.ccte_obj.make_search_request, failed, self.batch_workers)):
+			if self.is_ccte_error(ccte_results):
+				dsstox_results[name] = None
+			elif isinstance(ccte_results, dict) and ccte_results.get('data'):
+				dsstox_results[name] = ccte_results['data']
+		return dsstox_results
+
+	def build_cheminfo(self, request_post, only_dsstox=False, skip_ccte=False):
 		"""
 		Makes call to Calculator for chemaxon
 		data. Converts incoming structure to smiles,
 		then filters smiles, and then retrieves data
 		:param request:
+		:param skip_ccte: leaves DSSTOX data for the caller (see get_cheminfo_batch)
 		:return: chemical details response json
 
 		Note: Due to marvin sketch image data (<cml> image) being
@@ -198,18 +315,26 @@ class ChemInfo(object):
 		# Checks chemical against chem_name_smiles_map:
 		chemical = self.check_name_smiles_map(chemical)
 
-		is_valid_structure = self.check_structure_request(chemical)
+		# Classifies obvious identifiers (e.g., clean SMILES, CAS#) locally:
+		chemical, local_type = self.get_local_chemical_type(chemical)
 
-		# Checks for valid structure:
-		if "error" in is_valid_structure:
-			response_obj = {}
-			response_obj['status'] = False
-			response_obj['error'] = is_valid_structure["error"]
-			response_obj['request_post'] = request_post
-			return response_obj
+		# Checks for valid structure (RDKit already checked local SMILES):
+		if local_type not in ['smiles', 'CAS#']:
+			with tracer.span("structure_check"):
+				is_valid_structure = self.check_structure_request(chemical)
+			if "error" in is_valid_structure:
+				response_obj = {}
+				response_obj['status'] = False
+				response_obj['error'] = is_valid_structure["error"]
+				response_obj['request_post'] = request_post
+				return response_obj
 
 		# Determines chemical type from user (e.g., smiles, cas, name, etc.):
-		chem_type = self.calc_obj.get_chemical_type(chemical)
+		with tracer.span("chemical_type") as span:
+			chem_type = {'type': local_type} if local_type else self.calc_obj.get_chemical_type(chemical)
+			if span:
+				span.set_attribute('type', chem_type.get('type'))
+				span.set_attribute('local', bool(local_type))
 
 		if not chem_type.get('type') or 'error' in chem_type:
 			
@@ -220,7 +345,8 @@ class ChemInfo(object):
 			# If ChemAxon can't get chemical type, then try to get chem info
 			# data from ACTORWS instead.
 			logging.info("Couldn't get chemical type from ChemAxon. Trying to get data from ACTORWS.")
-			chemid_results = self.handle_no_chemaxon(chemical, request_post)
+			with tracer.span("actorws_chemid"):
+				chemid_results = self.handle_no_chemaxon(chemical, request_post)
 			if 'error' in chemid_results:
 				return chemid_results  # already wrapped for frontend
 			if chemid_results.get('smiles'):
@@ -232,8 +358,9 @@ class ChemInfo(object):
 
 
 		# Checks chemical to make sure it's not actually an acronym instead of smiles (e.g., PFAS):
-		if chem_type.get('type') == 'smiles' or chem_type.get('type') == 'smarts':
-			converted_smiles = self.smiles_name_check(chemical)
+		if (chem_type.get('type') == 'smiles' or chem_type.get('type') == 'smarts') and self.is_possible_name(chemical, local_type):
+			with tracer.span("name_check"):
+				converted_smiles = self.smiles_name_check(chemical)
 			# Switches chem type to "name" if smiles was actually an acronym:
 			if converted_smiles:
 				# Was actually a name and successfully converted to smiles
@@ -275,11 +402,13 @@ class ChemInfo(object):
 			orig_smiles = chemical  # use user-entered smiles as orig_siles
 		else:
 			logging.info("smiles not in user request or actorws results, getting from jchem ws..")
-			orig_smiles = self.calc_obj.convertToSMILES({'chemical': chemical}).get('structure')
+			with tracer.span("convert_to_smiles"):
+				orig_smiles = self.calc_obj.convertToSMILES({'chemical': chemical}).get('structure')
 
 		# Gets filtered SMILES:
 		try:
-			filtered_smiles = self.smiles_filter_obj.filterSMILES(orig_smiles, is_node=request_post.get('is_node'))			
+			with tracer.span("filter_smiles"):
+				filtered_smiles = self.smiles_filter_obj.filterSMILES(orig_smiles, is_node=request_post.get('is_node'))
 			if isinstance(filtered_smiles, dict) and 'error' in filtered_smiles:
 				response_obj = {}
 				response_obj['status'] = False
@@ -294,30 +423,27 @@ class ChemInfo(object):
 			response_obj['request_post'] = request_post
 			return response_obj
 
-		# Gets chemical details from jchem ws:
-		jchem_response = self.calc_obj.getChemDetails({'chemical': filtered_smiles})
-		
-		# Creates molecule object with jchem response:
-		molecule_obj = Molecule().createMolecule(chemical, orig_smiles, jchem_response, get_sd)
-
-		# Sets 'smiles' (main chemical key for pchem requests, etc.) to CTS standardized smiles:
-		molecule_obj['smiles'] = filtered_smiles
-
-
-		# # ACTORWS requests handling for getting DSSTOX data
-		# if chem_type.get('type') == 'CAS#':
-		# 	# Gets dsstox results using user-entered CAS#:
-		# 	dsstox_results = self.ccte_epa_obj.get_chemical_results(chemical, "casrn")
-		# elif chem_type.get("type") == "name":
-		# 	dsstox_results = self.ccte_epa_obj.get_chemical_results(chemical, "name")
-		# else:
-		# 	dsstox_results = self.ccte_epa_obj.get_chemical_results(molecule_obj["preferredName"], "name")
-		# _actor_results.update(dsstox_results)
+		# Steps after filtering run as a dependency graph (independent ones concurrently):
+		steps = {
+			'molecule': (lambda: self.get_molecule(chemical, orig_smiles, filtered_smiles, get_sd), []),
+			'ccte': (self.get_ccte_results if not skip_ccte else lambda molecule_obj: None, ['molecule'])
+		}
+		if not only_dsstox:
+			steps.update({
+				'cas': (lambda: self.get_cas(filtered_smiles), []),
+				'has_carbon': (lambda: self.get_has_carbon(filtered_smiles, is_node), [])
+			})
+			if is_node:
+				steps.update({
+					'node_image': (lambda: self.get_node_image(filtered_smiles), []),
+					'popup_image': (lambda: self.get_popup_image(filtered_smiles, request_post), [])
+				})
+		step_results = run_step_graph(steps)
 
-		# Public CCTE requests handling for getting DSSTOX data
-		ccte_results = self.ccte_obj.make_search_request(molecule_obj["preferredName"])
+		molecule_obj = step_results['molecule']
+		ccte_results = step_results['ccte']
 
-		if ccte_results:
+		if ccte_results and not self.is_ccte_error(ccte_results):
 			_actor_results.update(ccte_results)
 
 		logging.warning("CCTE RESULTS: {}".format(ccte_results))
@@ -328,24 +454,34 @@ class ChemInfo(object):
 			# return dsstox_results.get('data', {})
 			return _actor_results.get('data', {})
 
+		molecule_obj['cas'] = step_results['cas']
+		molecule_obj['has_carbon'] = step_results['has_carbon']
 
-		cas_list = self.make_cas_request(filtered_smiles)  # gets CAS from cactus.nci.nih.gov (deprecated in jchemws)
-
-		molecule_obj['cas'] = cas_list
+		self.add_dsstox_data(molecule_obj, _actor_results.get('data', {}))
 
+		# Adds popup image with cheminfo table if it's a gentrans product (i.e., node):
+		if is_node:
+			molecule_obj.update({'node_image': step_results['node_image']})
+			molecule_obj.update({'popup_image': step_results['popup_image']})
 
-		has_carbon = self.smiles_filter_obj.check_for_carbon(filtered_smiles)
-		if not has_carbon and is_node:
-			molecule_obj['has_carbon'] = False
-		else:
-			molecule_obj['has_carbon'] = True
+		wrapped_post = {}
+		wrapped_post['status'] = True  # 'metadata': '',
+		wrapped_post['data'] = molecule_obj
+		wrapped_post['request_post'] = request_post
 
+		# Flags data missing due to a failed lookup (rather than not found), so it isn't cached:
+		if self.is_ccte_error(ccte_results) or cas_cache.is_error(filtered_smiles):
+			wrapped_post['partial'] = True
 
-		# # Sets 'smiles' (main chemical key for pchem requests, etc.) to CTS standardized smiles:
-		# molecule_obj['smiles'] = filtered_smiles
+		return wrapped_post
 
+	def add_dsstox_data(self, molecule_obj, dsstox_data):
+		"""
+		Replaces molecule_obj values with CCTE DSSTOX data (besides
+		iupac and smiles), filling any missing DSSTOX keys with "N/A".
+		"""
 		# Replaces certain keys in molecule_obj with actorws values:
-		for key, val in _actor_results.get('data', {}).items():
+		for key, val in dsstox_data.items():
 			if not val:
 				continue
 			if key != 'iupac' and key != 'smiles':
@@ -355,25 +491,106 @@ class ChemInfo(object):
 		for key in self.actorws_obj.dsstox_result_keys:
 			if key not in molecule_obj:
 				molecule_obj.update({key: "N/A"})  # fill in any missed data from actorws with "N/A"
+		return molecule_obj
 
-		# Adds popup image with cheminfo table if it's a gentrans product (i.e., node):
-		# if is_node or db_handler.is_connected:
-		if is_node:
-			molecule_obj.update({'node_image': self.calc_obj.nodeWrapper(filtered_smiles, self.calc_obj.tree_image_height, self.calc_obj.tree_image_width, self.calc_obj.image_scale, self.calc_obj.metID,'svg', True)})
-			molecule_obj.update({
-				'popup_image': self.calc_obj.popupBuilder(
-					{"smiles": filtered_smiles}, 
-					self.calc_obj.metabolite_keys, 
-					"{}".format(request_post.get('id')),
-					"Metabolite Information", True)
-			})
+	def get_molecule(self, chemical, orig_smiles, filtered_smiles, get_sd):
+		"""
+		Creates the molecule object from jchem ws chemical details,
+		with 'smiles' set to the CTS standardized smiles.
+		"""
+		with tracer.span("chem_details"):
+			jchem_response = self.calc_obj.getChemDetails({'chemical': filtered_smiles})
+		molecule_obj = Molecule().createMolecule(chemical, orig_smiles, jchem_response, get_sd)
+		molecule_obj['smiles'] = filtered_smiles  # main chemical key for pchem requests, etc.
+		return molecule_obj
 
-		wrapped_post = {}
-		wrapped_post['status'] = True  # 'metadata': '',
-		wrapped_post['data'] = molecule_obj
-		wrapped_post['request_post'] = request_post
+	def get_ccte_results(self, molecule_obj):
+		"""
+		Public CCTE search for DSSTOX data by the molecule's preferred name.
+		"""
+		if deadline_expired():
+			logging.warning("Deadline exceeded, skipping CCTE search.")
+			return None
+		with tracer.span("ccte_search") as span:
+			try:
+				ccte_results = self.ccte_obj.make_search_request(molecule_obj["preferredName"])
+			except Exception as e:
+				logging.warning("Exception searching CCTE: {}".format(e))
+				ccte_results = False
+			if span:
+				span.set_attribute('found', bool(ccte_results) and not self.is_ccte_error(ccte_results))
+		return ccte_results
+
+	def is_ccte_error(self, ccte_results):
+		"""
+		Whether a CCTE search failed (request error), rather than found
+		nothing (empty results or a 404).
+		"""
+		if ccte_results is False or isinstance(ccte_results, Exception):
+			return True
+		return isinstance(ccte_results, dict) and ccte_results.get('status') is False and ccte_results.get('status_code') != 404
 
-		return wrapped_post
+	def get_cas(self, smiles):
+		if deadline_expired():
+			logging.warning("Deadline exceeded, skipping CAS lookup.")
+			return "N/A"
+		with tracer.span("cas_lookup"):
+			return self.make_cas_request(smiles)  # gets CAS from cactus.nci.nih.gov (deprecated in jchemws)
+
+	def get_has_carbon(self, smiles, is_node):
+		with tracer.span("carbon_check"):
+			has_carbon = self.smiles_filter_obj.check_for_carbon(smiles)
+		return bool(has_carbon or not is_node)
+
+	def get_node_image(self, smiles):
+		with tracer.span("node_image"):
+			return self.calc_obj.nodeWrapper(smiles, self.calc_obj.tree_image_height, self.calc_obj.tree_image_width, self.calc_obj.image_scale, self.calc_obj.metID, 'svg', True)
+
+	def get_popup_image(self, smiles, request_post):
+		with tracer.span("popup_image"):
+			return self.calc_obj.popupBuilder(
+				{"smiles": smiles},
+				self.calc_obj.metabolite_keys,
+				"{}".format(request_post.get('id')),
+				"Metabolite Information", True)
+
+	def get_local_chemical_type(self, chemical):
+		"""
+		Returns (chemical, type) from local_chem's identifier type, with
+		DSSTOX IDs swapped for their CCTE SMILES. Type is None when the
+		chemical's ambiguous, or CTS_LOCAL_CHEMICAL_TYPE is false.
+		"""
+		if not self.local_chemical_type:
+			return chemical, None
+		local_type = local_chem.get_identifier_type(chemical)
+		if local_type in ['dtxsid', 'dtxcid']:
+			smiles = self.get_dsstox_smiles(chemical.strip().upper())
+			if not smiles:
+				return chemical, None
+			chemical, local_type = smiles, local_chem.get_identifier_type(smiles)
+		return (chemical.strip(), local_type) if local_type else (chemical, None)
+
+	def get_dsstox_smiles(self, dsstox_id):
+		"""
+		Gets the SMILES for a DTXSID or DTXCID from the CCTE chemical search.
+		"""
+		with tracer.span("dsstox_id_search"):
+			try:
+				ccte_results = self.ccte_obj.make_search_request(dsstox_id)
+			except Exception as e:
+				logging.warning("Exception searching CCTE for {}: {}".format(dsstox_id, e))
+				return None
+		if isinstance(ccte_results, dict) and ccte_results.get('data'):
+			return ccte_results['data'].get('smiles')
+		return None
+
+	def is_possible_name(self, chemical, local_type):
+		"""
+		Whether a SMILES could also be a name or acronym (e.g., PFOS), which
+		smiles_name_check asks jchem about. Local SMILES with anything but
+		letters (rings, branches, bonds, brackets) can't be.
+		"""
+		return local_type != 'smiles' or chemical.isalpha()
 
 	def handle_no_chemaxon(self, chemical, request_post):
 		"""
@@ -434,19 +651,28 @@ class ChemInfo(object):
 	def make_cas_request(self, smiles):
 		"""
 		Manually gets CAS list, which used to work with
-		Jchem Web Services.
+		Jchem Web Services. Lookups are cached (see cas_cache).
+		"""
+		return cas_cache.get(smiles, self.request_cas)
+
+	def request_cas(self, smiles):
+		"""
+		Gets CAS list from cactus. Returns (status, cas), with
+		status "hit", "miss" (not found) or "error".
 		"""
 		try:
 			url = self.cas_url.format(requests.utils.quote(smiles))  # encoding smiles for url
-			response = requests.get(url, verify=False, timeout=5)
+			response = transport.get(url, verify=False, timeout=5)
+			if response.status_code == 404:
+				return "miss", "N/A"
 			if response.status_code != 200:
-				return "N/A"
+				return "error", "N/A"
 			if '<html>' in response.content.decode('utf-8'):
-				return "N/A"
-			return response.content.decode('utf-8').replace('\n', ', ')  # returns curated CAS list
+				return "miss", "N/A"
+			return "hit", response.content.decode('utf-8').replace('\n', ', ')  # returns curated CAS list
 		except Exception as e:
 			logging.warning("Exception making CAS request: {}".format(e))
-			return "N/A"
+			return "error", "N/A"
 
 	def check_structure_request(self, chemical):
 		"""
@@ -0,0 +1,195 @@
+"""
+Per-upstream circuit breakers for the CTS calculators' HTTP calls.
+"""
+
+import requests
+from collections import deque
+import threading
+import logging
+import time
+import os
+
+from .deadline import DeadlineExceeded
+
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+	"""
+	Raised instead of making a request when an upstream's breaker is open.
+	Subclasses ConnectionError so calcs handle it like an unreachable server.
+	"""
+	pass
+
+
+
+class CircuitBreaker:
+	"""
+	Circuit breaker for one upstream (e.g., "http://jchem-host:8080").
+	  + closed - requests go through, outcomes recorded in a rolling window
+	  + open - requests fail fast until open_seconds have passed
+	  + half_open - a few trial requests go through; a success closes
+	    the breaker, a failure opens it again
+	"""
+
+	CLOSED = "closed"
+	OPEN = "open"
+	HALF_OPEN = "half_open"
+
+	def __init__(self, name, failure_rate=0.5, min_calls=5, window_size=20, open_seconds=30, half_open_calls=1):
+		self.name = name
+		self.failure_rate = failure_rate  # opens when failures / calls >= failure_rate
+		self.min_calls = min_calls  # calls needed in window before failure_rate applies
+		self.window_size = window_size  # number of recent outcomes kept
+		self.open_seconds = open_seconds  # time spent open before trying half-open
+		self.half_open_calls = half_open_calls  # trial calls allowed while half-open
+		self.state = self.CLOSED
+		self.outcomes = deque(maxlen=window_size)  # True for failure, False for success
+		self.opened_at = None
+		self.trial_calls = 0
+		self.lock = threading.Lock()
+
+	def allow_request(self):
+		"""
+		Returns True if a request to the upstream may be made.
+		"""
+		with self.lock:
+			if self.state == self.OPEN:
+				if time.monotonic() - self.opened_at < self.open_seconds:
+					return False
+				logging.info("Circuit for {} half-open, trying upstream again.".format(self.name))
+				self.state = self.HALF_OPEN
+				self.trial_calls = 0
+			if self.state == self.HALF_OPEN:
+				if self.trial_calls >= self.half_open_calls:
+					return False
+				self.trial_calls += 1
+			return True
+
+	def record_success(self):
+		with self.lock:
+			if self.state == self.HALF_OPEN:
+				logging.info("Circuit for {} closed.".format(self.name))
+				self.state = self.CLOSED
+				self.outcomes.clear()
+			self.outcomes.append(False)
+
+	def record_failure(self):
+		with self.lock:
+			if self.state == self.HALF_OPEN:
+				self.trip()
+				return
+			self.outcomes.append(True)
+			num_calls = len(self.outcomes)
+			if num_calls >= self.min_calls and sum(self.outcomes) / num_calls >= self.failure_rate:
+				self.trip()
+
+	def record_ignored(self):
+		"""
+		Frees a half-open trial slot for a call that didn't reach the
+		upstream (e.g., a malformed request).
+		"""
+		with self.lock:
+			if self.state == self.HALF_OPEN and self.trial_calls > 0:
+				self.trial_calls -= 1
+
+	def is_open(self):
+		"""
+		Returns True while the breaker is open and failing fast
+		(doesn't use up a half-open trial call).
+		"""
+		with self.lock:
+			return self.state == self.OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+	def trip(self):
+		logging.warning("Circuit for {} opened, failing fast for {}s.".format(self.name, self.open_seconds))
+		self.state = self.OPEN
+		self.opened_at = time.monotonic()
+		self.outcomes.clear()
+
+	def get_state(self):
+		return self.state
+
+
+
+class CircuitBreakerRegistry:
+	"""
+	Holds a CircuitBreaker per upstream base URL.
+	"""
+
+	def __init__(self):
+		self.enabled = os.environ.get('CTS_BREAKER_ENABLED', 'true').lower() == 'true'
+		self.settings = {
+			'failure_rate': float(os.environ.get('CTS_BREAKER_FAILURE_RATE', 0.5)),
+			'min_calls': int(os.environ.get('CTS_BREAKER_MIN_CALLS', 5)),
+			'window_size': int(os.environ.get('CTS_BREAKER_WINDOW', 20)),
+			'open_seconds': float(os.environ.get('CTS_BREAKER_OPEN_SECONDS', 30)),
+		}
+		self.breakers = {}
+		self.lock = threading.Lock()
+
+	def get(self, upstream):
+		with self.lock:
+			if upstream not in self.breakers:
+				self.breakers[upstream] = CircuitBreaker(upstream, **self.settings)
+			return self.breakers[upstream]
+
+	def before_request(self, upstream, url=None):
+		"""
+		Returns the upstream's breaker (None if breakers are disabled).
+		Raises CircuitOpenError if the request shouldn't be made.
+		"""
+		if not self.enabled:
+			return None
+		breaker = self.get(upstream)
+		if not breaker.allow_request():
+			raise CircuitOpenError("Circuit open for {}, not requesting {}".format(upstream, url or upstream))
+		return breaker
+
+	def record(self, breaker, response=None, error=None):
+		"""
+		Records a request's outcome on the breaker from before_request.
+		"""
+		if not breaker:
+			return
+		if is_failure(response=response, error=error):
+			breaker.record_failure()
+		elif error is not None:
+			breaker.record_ignored()
+		else:
+			breaker.record_success()
+
+	def get_states(self):
+		"""
+		Returns {upstream: state} for all known upstreams.
+		"""
+		with self.lock:
+			return {name: breaker.get_state() for name, breaker in self.breakers.items()}
+
+
+
+def is_failure(response=None, error=None):
+	"""
+	Outcomes that count against an upstream: connection errors,
+	timeouts and 5xx responses. 4xx means the upstream is up.
+	"""
+	if error is not None:
+		if isinstance(error, DeadlineExceeded):
+			return False  # the caller ran out of time, not the upstream
+		return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+	return response.status_code >= 500
+
+
+def fast_fail_response(upstream, data=None):
+	"""
+	Error response in the calcs' {'valid': False, 'data': ...} shape
+	for an upstream whose circuit is open.
+	"""
+	return {
+		'valid': False,
+		'error': "{} is unavailable".format(upstream),
+		'data': data if data is not None else "calc server not available"
+	}
+
+
+
+breakers = CircuitBreakerRegistry()  # shared by every calculator in the process
@@ -0,0 +1,129 @@
+"""
+Request-scoped deadlines. A deadline set for a workflow (e.g., get_cheminfo
+or a calc's data_request_handler) is carried by a contextvar to every
+upstream call the workflow makes, and the transports clamp each call's
+timeout to the time remaining.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import requests
+import time
+import os
+
+
+
+current_deadline = contextvars.ContextVar("cts_deadline", default=None)
+
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+	"""
+	Raised when a workflow's deadline has passed. Subclasses Timeout,
+	so calcs handle it like a timed out request.
+	"""
+	pass
+
+
+
+class Deadline:
+	"""
+	Absolute deadline (unix time, so it can be passed between
+	processes, e.g., in a celery task's request_dict).
+	"""
+
+	def __init__(self, expires_at):
+		self.expires_at = expires_at
+		self.exceeded = False  # set when a call is cut short by the deadline
+
+	@classmethod
+	def from_budget(cls, seconds):
+		return cls(time.time() + seconds)
+
+	def remaining(self):
+		return max(0.0, self.expires_at - time.time())
+
+	def expired(self):
+		return time.time() >= self.expires_at
+
+	def check(self):
+		"""
+		Raises DeadlineExceeded if the deadline has passed.
+		"""
+		if self.expired():
+			self.exceeded = True
+			raise DeadlineExceeded("Deadline exceeded")
+
+	def clamp_timeout(self, timeout):
+		"""
+		Returns (timeout, clamped): min(timeout, remaining time), and
+		whether the remaining time was the smaller. Handles requests'
+		(connect, read) timeout tuples.
+		"""
+		self.check()
+		remaining = self.remaining()
+		if timeout is None:
+			return remaining, True
+		if isinstance(timeout, tuple):
+			return tuple(min(t, remaining) if t is not None else remaining for t in timeout), any(t is None or t > remaining for t in timeout)
+		return min(timeout, remaining), timeout > remaining
+
+
+
+def get_deadline():
+	"""
+	Returns the current workflow's Deadline, or None.
+	"""
+	return current_deadline.get()
+
+
+def deadline_expired():
+	deadline = current_deadline.get()
+	if deadline and deadline.expired():
+		deadline.exceeded = True
+		return True
+	return False
+
+
+@contextmanager
+def deadline_scope(seconds=None, expires_at=None):
+	"""
+	Sets a deadline for the calls made in the block. A deadline later
+	than the current one is ignored (nested workflows can only shorten it).
+	Yields the Deadline in effect (or None without one).
+	"""
+	parent = current_deadline.get()
+	if expires_at is None and seconds:
+		expires_at = time.time() + seconds
+	if not expires_at or (parent and parent.expires_at <= expires_at):
+		yield parent
+		return
+	deadline = Deadline(expires_at)
+	token = current_deadline.set(deadline)
+	try:
+		yield deadline
+	finally:
+		current_deadline.reset(token)
+		if deadline.exceeded and parent:
+			parent.exceeded = True
+
+
+def request_deadline(request_dict, budget_env='CTS_REQUEST_BUDGET'):
+	"""
+	deadline_scope for a request: uses the request's 'deadline' (unix time)
+	if it has one, otherwise the budget in seconds from the budget_env var
+	(no deadline if neither is set).
+	"""
+	expires_at = request_dict.get('deadline') if isinstance(request_dict, dict) else None
+	budget = os.environ.get(budget_env)
+	return deadline_scope(seconds=float(budget) if budget else None, expires_at=float(expires_at) if expires_at else None)
+
+
+def mark_deadline_exceeded(response_obj, deadline):
+	"""
+	Adds 'deadline_exceeded': True to a response if any of its calls were
+	cut short by the deadline, so callers know the results are partial.
+	"""
+	if deadline and deadline.exceeded and isinstance(response_obj, dict):
+		response_obj['deadline_exceeded'] = True
+	return response_obj
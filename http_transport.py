@@ -0,0 +1,200 @@
+"""
+Pooled, keep-alive HTTP transport shared by the CTS calculators.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.ssl_ import create_urllib3_context
+from urllib.parse import urlsplit
+import threading
+import logging
+import time
+import os
+
+from .circuit_breaker import breakers
+from .metrics import metrics, get_request_size
+from .deadline import get_deadline, DeadlineExceeded
+
+
+
+def create_legacy_ssl_context():
+	"""
+	SSL context that allows legacy SSL renegotiation, which
+	comptox (TESTWS) still requires.
+	https://github.com/urllib3/urllib3/issues/2653
+	"""
+	ctx = create_urllib3_context()
+	ctx.load_default_certs()
+	ctx.options |= 0x4  # ssl.OP_LEGACY_SERVER_CONNECT
+	return ctx
+
+
+
+class LegacySSLAdapter(HTTPAdapter):
+	"""
+	HTTPAdapter using the legacy SSL context (see create_legacy_ssl_context).
+	"""
+	def init_poolmanager(self, *args, **kwargs):
+		kwargs['ssl_context'] = create_legacy_ssl_context()
+		return super().init_poolmanager(*args, **kwargs)
+
+
+
+class HTTPTransport:
+	"""
+	One transport object per process. Keeps a pooled requests.Session
+	for each upstream host (scheme + netloc), so calls to jchem, CTSWS,
+	EPI, OPERA, etc. reuse their TCP/TLS connections.
+	"""
+
+	def __init__(self):
+		# Pool settings (per upstream host):
+		self.pool_connections = int(os.environ.get('CTS_HTTP_POOL_CONNECTIONS', 10))  # number of pools cached per session
+		self.pool_maxsize = int(os.environ.get('CTS_HTTP_POOL_MAXSIZE', 20))  # max connections kept alive per pool
+		self.pool_block = os.environ.get('CTS_HTTP_POOL_BLOCK', 'false').lower() == 'true'
+		self.keep_alive = os.environ.get('CTS_HTTP_KEEP_ALIVE', 'true').lower() == 'true'
+
+		self.host_settings = {}  # host-specific overrides, e.g., {'https://comptox.epa.gov': {'legacy_ssl': True}}
+		self.sessions = {}  # host -> requests.Session
+		self.lock = threading.Lock()
+
+	def get_host(self, url):
+		"""
+		Returns the pool key for a url (e.g., "http://localhost:8080").
+		"""
+		if "://" not in url:
+			# Some env settings leave off the scheme (e.g., "localhost:8080"):
+			url = "http://" + url
+		parts = urlsplit(url)
+		return "{}://{}".format(parts.scheme, parts.netloc).lower()
+
+	def register_host(self, url, pool_maxsize=None, pool_connections=None, legacy_ssl=False):
+		"""
+		Sets pool options for a single upstream host. Any existing
+		session for the host is rebuilt with the new settings.
+		"""
+		host = self.get_host(url)
+		settings = {
+			'pool_maxsize': pool_maxsize,
+			'pool_connections': pool_connections,
+			'legacy_ssl': legacy_ssl
+		}
+		with self.lock:
+			if self.host_settings.get(host) == settings:
+				return
+			self.host_settings[host] = settings
+			session = self.sessions.pop(host, None)
+		if session:
+			session.close()
+
+	def create_session(self, host):
+		"""
+		Creates a session with a connection pool sized for the host.
+		"""
+		settings = self.host_settings.get(host, {})
+		adapter_class = LegacySSLAdapter if settings.get('legacy_ssl') else HTTPAdapter
+		adapter = adapter_class(
+			pool_connections=settings.get('pool_connections') or self.pool_connections,
+			pool_maxsize=settings.get('pool_maxsize') or self.pool_maxsize,
+			pool_block=self.pool_block,
+			max_retries=0  # retries are handled by the calculators
+		)
+		session = requests.Session()
+		session.mount("http://", adapter)
+		session.mount("https://", adapter)
+		if not self.keep_alive:
+			session.headers['Connection'] = "close"
+		return session
+
+	def get_session(self, url):
+		"""
+		Returns the pooled session for the url's host, creating it if needed.
+		"""
+		host = self.get_host(url)
+		session = self.sessions.get(host)
+		if session:
+			return session
+		with self.lock:
+			session = self.sessions.get(host)
+			if not session:
+				session = self.create_session(host)
+				self.sessions[host] = session
+		return session
+
+	def request(self, method, url, **kwargs):
+		"""
+		Makes a request through the host's pooled session.
+		Accepts the same keyword args as requests.request.
+		Raises CircuitOpenError without a request if the host's breaker is open.
+		Inside a deadline_scope, the timeout is clamped to the time remaining,
+		and DeadlineExceeded is raised once it has run out.
+		"""
+		host = self.get_host(url)
+		bytes_sent = get_request_size(kwargs.get('data'), kwargs.get('json'))
+		deadline, clamped = get_deadline(), False
+		try:
+			if deadline:
+				kwargs['timeout'], clamped = deadline.clamp_timeout(kwargs.get('timeout'))
+			breaker = breakers.before_request(host, url)
+		except Exception as e:
+			metrics.record_request(host, method, url, error=e)
+			raise
+		start_time = time.monotonic()
+		try:
+			response = self.get_session(url).request(method, url, **kwargs)
+		except requests.exceptions.Timeout as e:
+			if not clamped:
+				breakers.record(breaker, error=e)
+				metrics.record_request(host, method, url, time.monotonic() - start_time, error=e, bytes_sent=bytes_sent)
+				raise
+			deadline.exceeded = True
+			error = DeadlineExceeded("Deadline exceeded requesting {}".format(url))
+			breakers.record(breaker, error=error)
+			metrics.record_request(host, method, url, time.monotonic() - start_time, error=error, bytes_sent=bytes_sent)
+			raise error from e
+		except Exception as e:
+			breakers.record(breaker, error=e)
+			metrics.record_request(host, method, url, time.monotonic() - start_time, error=e, bytes_sent=bytes_sent)
+			raise
+		breakers.record(breaker, response=response)
+		metrics.record_request(host, method, url, time.monotonic() - start_time, response=response, bytes_sent=bytes_sent)
+		return response
+
+	def is_available(self, url):
+		"""
+		Returns False if the url's upstream breaker is open.
+		"""
+		if not breakers.enabled:
+			return True
+		return not breakers.get(self.get_host(url)).is_open()
+
+	def get(self, url, **kwargs):
+		return self.request("GET", url, **kwargs)
+
+	def post(self, url, **kwargs):
+		return self.request("POST", url, **kwargs)
+
+	def close(self):
+		"""
+		Closes all pooled sessions.
+		"""
+		with self.lock:
+			sessions = list(self.sessions.values())
+			self.sessions = {}
+		for session in sessions:
+			session.close()
+
+	def reset_after_fork(self):
+		"""
+		Drops sessions inherited from a parent process (e.g., celery prefork
+		workers) so child processes don't share sockets with the parent.
+		"""
+		self.lock = threading.Lock()
+		self.sessions = {}
+
+
+
+transport = HTTPTransport()  # shared by every calculator in the process
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=transport.reset_after_fork)
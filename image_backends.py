@@ -0,0 +1,116 @@
+"""
+Molecule image backends for Calculator.smilesToImage. The default is
+jchem ws (a /util/detail request per image); the RDKit backend draws
+images locally. Select one per deployment with CTS_IMAGE_BACKEND
+("jchem" or "rdkit").
+"""
+
+import logging
+import base64
+import os
+
+try:
+	from rdkit import Chem
+	from rdkit.Chem import rdDepictor
+	from rdkit.Chem.Draw import rdMolDraw2D
+except ImportError:
+	Chem = None  # rdkit backend unavailable, images come from jchem
+
+
+
+class RDKitImageBackend:
+	"""
+	Draws smilesToImage images with RDKit. Honors the jchem request params:
+	  + width and height - fixed image size, molecule fit to it
+	  + width only - image width, height kept in proportion
+	  + scale - otherwise, bond length in pixels (image fits the molecule)
+	  + type - "svg" or "png" (default), png images are base64 encoded
+	Returns results shaped like jchem's /util/detail response.
+	"""
+
+	name = "rdkit"
+
+	def render(self, request_obj):
+		smiles = request_obj.get('smiles')
+		img_type = request_obj.get('type') or "png"
+		width = request_obj.get('width')
+		height = request_obj.get('height')
+		scale = request_obj.get('scale') or 100
+
+		mol = Chem.MolFromSmiles(smiles) if smiles else None
+		if mol is None:
+			logging.warning("RDKit could not parse SMILES for image: {}".format(smiles))
+			return {'error': "Chemical not recognized", 'valid': False}
+		rdDepictor.Compute2DCoords(mol)
+
+		if width and height:
+			image, width, height = self.draw(mol, img_type, int(width), int(height))
+		else:
+			image, natural_width, natural_height = self.draw(mol, img_type, -1, -1, scale)  # canvas fit to molecule
+			if width:
+				height = max(1, round(int(width) * natural_height / natural_width))
+				image, width, height = self.draw(mol, img_type, int(width), height)
+			else:
+				width, height = natural_width, natural_height
+
+		return {
+			'data': [{
+				'image': {
+					'image': image,
+					'width': width,
+					'height': height,
+					'type': img_type
+				}
+			}],
+			'valid': True
+		}
+
+	def draw(self, mol, img_type, width, height, scale=None):
+		"""
+		Returns (image, width, height). A -1 width and height sizes
+		the canvas to the molecule at the scale's bond length.
+		"""
+		if img_type == "svg":
+			drawer = rdMolDraw2D.MolDraw2DSVG(width, height)
+		else:
+			drawer = rdMolDraw2D.MolDraw2DCairo(width, height)
+		if scale:
+			drawer.drawOptions().scalingFactor = scale / 1.5  # pixels per coordinate unit (rdDepictor bonds are 1.5 long)
+		drawer.DrawMolecule(mol)
+		drawer.FinishDrawing()
+		image = drawer.GetDrawingText()
+		if img_type == "svg":
+			image = image[image.find("<svg"):]  # drops the xml declaration for inline html
+		else:
+			image = base64.b64encode(image).decode("ascii")
+		return image, drawer.Width(), drawer.Height()
+
+
+
+image_backends = {
+	'rdkit': RDKitImageBackend
+}
+
+
+def register_image_backend(name, backend_class):
+	"""
+	Adds an image backend (a class with render(request_obj)).
+	"""
+	image_backends[name] = backend_class
+
+
+def get_image_backend(name=None):
+	"""
+	Returns an instance of the named (or CTS_IMAGE_BACKEND) image backend,
+	or None for jchem ws.
+	"""
+	name = (name or os.environ.get('CTS_IMAGE_BACKEND', 'jchem')).lower()
+	if name == "jchem":
+		return None
+	if name == "rdkit" and Chem is None:
+		logging.warning("CTS_IMAGE_BACKEND is rdkit but rdkit isn't installed, using jchem.")
+		return None
+	if name not in image_backends:
+		logging.warning("Unknown image backend {}, using jchem.".format(name))
+		return None
+	return image_backends[name]()
@@ -0,0 +1,115 @@
+"""
+Content-addressed cache of molecule images (smilesToImage results),
+keyed by canonical SMILES and image params. A bounded in-memory tier
+sits in front of an optional on-disk tier (a ResponseStore file, so
+images are shared by the workers and survive restarts).
+"""
+
+import threading
+import hashlib
+import logging
+import json
+import os
+
+from .memory_cache import cache_from_env
+from .response_store import ResponseStore
+from . import local_chem
+
+
+
+class ImageCache:
+	"""
+	Two-tier image cache.
+	  + memory - LRUCache of image results (CTS_IMAGE_CACHE_SIZE/_TTL/_ENABLED)
+	  + disk - ResponseStore at CTS_IMAGE_CACHE_PATH (disabled without a path),
+	    size capped by CTS_IMAGE_CACHE_MAX_MB
+	Images are namespaced by rendering backend (e.g., "jchem", "rdkit"),
+	since backends draw the same molecule differently.
+	"""
+
+	disk_url = "image://cts_calcs/image"  # ResponseStore entries need an "upstream" url
+
+	def __init__(self, memory=None, disk=None):
+		self.memory = memory if memory is not None else cache_from_env("image", "CTS_IMAGE_CACHE", max_size=2048, ttl=7 * 24 * 3600)
+		self.disk = disk if disk is not None else ResponseStore(
+			path=os.environ.get('CTS_IMAGE_CACHE_PATH'),
+			max_bytes=int(float(os.environ.get('CTS_IMAGE_CACHE_MAX_MB', 256)) * 1024 * 1024)
+		)
+		self.disk_hits = 0
+		self.disk_misses = 0
+		self.lock = threading.Lock()
+
+	def get_params(self, request_obj):
+		"""
+		Returns the smilesToImage params that determine an image (canonical
+		SMILES, type, width, height, scale), normalized the way
+		Calculator.get_image_request builds the jchem request.
+		"""
+		width, height = request_obj.get('width'), request_obj.get('height')
+		scale = request_obj.get('scale', 100)
+		if width and height:
+			scale = None  # image is fit to width and height
+		elif not width:
+			width, height = None, None
+		else:
+			height = None
+		return {
+			'smiles': local_chem.canonicalize(request_obj.get('smiles')) or request_obj.get('smiles'),  # equivalent SMILES share images
+			'type': request_obj.get('type') or "png",
+			'width': width,
+			'height': height,
+			'scale': scale
+		}
+
+	def get_key(self, request_obj, backend="jchem"):
+		params = self.get_params(request_obj)
+		params['backend'] = backend
+		return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+	def get(self, request_obj, backend="jchem", key=None):
+		"""
+		Returns a cached image result, or None. Disk hits are
+		copied into the memory tier.
+		"""
+		key = key or self.get_key(request_obj, backend)
+		result = self.memory.get(key)
+		if result is not None or not self.disk.enabled:
+			return result
+		stored = self.disk.get("image:" + backend, self.disk_url, key)
+		with self.lock:
+			if stored is None:
+				self.disk_misses += 1
+				return None
+			self.disk_hits += 1
+		try:
+			result = json.loads(stored[1])
+		except ValueError as e:
+			logging.warning("image_cache disk entry exception: {}".format(e))
+			return None
+		self.memory.set(key, result)
+		return result
+
+	def set(self, request_obj, result, backend="jchem", key=None):
+		"""
+		Caches a valid image result in both tiers.
+		"""
+		if not isinstance(result, dict) or not result.get('valid'):
+			return
+		key = key or self.get_key(request_obj, backend)
+		self.memory.set(key, result)
+		if self.disk.enabled:
+			self.disk.set("image:" + backend, self.disk_url, key, json.dumps(result))
+
+	def get_stats(self):
+		"""
+		Returns hit/miss counters for both tiers.
+		"""
+		with self.lock:
+			total = self.disk_hits + self.disk_misses
+			disk_stats = dict(self.disk.get_stats(), hits=self.disk_hits, misses=self.disk_misses,
+				hit_rate=round(self.disk_hits / total, 4) if total else None)
+		return {'memory': self.memory.get_stats(), 'disk': disk_stats}
+
+
+
+image_cache = ImageCache()  # shared by the calcs' smilesToImage
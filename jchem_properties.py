@@ -1,8 +1,9 @@
-import requests
 import json
 import logging
 import os
+import asyncio
 from .calculator import Calculator
+from .async_transport import run_async
 
 
 class JchemProperty(Calculator):
@@ -35,10 +36,18 @@ class JchemProperty(Calculator):
         Calls jchem web services from chemaxon and
         wraps data in a CTS data object (keys: calc, prop, method, data)
         """
+        return run_async(self.async_getJchemPropData(request_dict))
+
+
+
+    async def async_getJchemPropData(self, request_dict):
+        """
+        Async version of getJchemPropData.
+        """
         prop_obj = self.getPropObject(request_dict.get('prop'))
-        prop_obj.results = self.make_data_request(request_dict.get('chemical'), prop_obj, request_dict.get('method'))
+        prop_obj.results = await self.async_make_data_request(request_dict.get('chemical'), prop_obj, request_dict.get('method'))
 
-        prop_obj.results = prop_obj.get_data(request_dict)
+        prop_obj.results = await asyncio.to_thread(prop_obj.get_data, request_dict)  # may request struct infos from jchem
 
         _result_dict = {
             'calc': 'chemaxon',
@@ -84,6 +93,11 @@ class JchemProperty(Calculator):
 
 
     def make_data_request(self, structure, prop_obj, method=None):
+        return run_async(self.async_make_data_request(structure, prop_obj, method))
+
+
+
+    async def async_make_data_request(self, structure, prop_obj, method=None):
         url = self.baseUrl + prop_obj.url
         prop_obj.postData.update({
             "result-display": {
@@ -101,23 +115,11 @@ class JchemProperty(Calculator):
         if method:
             post_data['parameters']['method'] = method
 
-        _valid_result = False  # for retry logic
-        _retries = 0
-        while not _valid_result and _retries < self.max_retries:
-            # retry data request to chemaxon server until max retries or a valid result is returned
-            try:
-                response = requests.post(url, data=json.dumps(post_data), headers=self.headers, timeout=self.request_timeout)
-                _valid_result = self.validate_response(response)
-                if _valid_result:
-                    prop_obj.results = json.loads(response.content)
-                    return json.loads(response.content)
-                _retries += 1
-            except Exception as e:
-                logging.warning("Exception in jchem_calculator.py: {}".format(e))
-                _retries += 1
-
-            logging.info("Max retries: {}, Retries left: {}".format(self.max_retries, _retries))
-        return None
+        response = await self.async_request_with_retries(url, post_data)
+        if response is None:
+            return None
+        prop_obj.results = json.loads(response.content)
+        return prop_obj.results
 
 
 
@@ -297,10 +299,11 @@ class Pka(JchemProperty):
                 for ms in self.results['microspecies']:
                     msStructDict = {}  # list element in msList
                     msStructDict.update({'image': ms['image']['image'], 'key': ms['key']})
-                    if not test:
-                        structInfo = self.getStructInfo(ms['structureData']['structure'])
-                        msStructDict.update(structInfo)
                     msList.append(msStructDict)
+                if not test:
+                    structInfos = self.getStructInfos([ms['structureData']['structure'] for ms in self.results['microspecies']])
+                    for msStructDict, structInfo in zip(msList, structInfos):
+                        msStructDict.update(structInfo)
                 return msList
             except KeyError as ke:
                 logging.info("> key error: {}".format(ke))
@@ -448,11 +451,11 @@ class Tautomerization(JchemProperty):
 
             tauts = self.results['result']  # for DOMINANT tautomers
 
-            for taut in tauts:
+            structInfos = self.getStructInfos([taut['structureData']['structure'] for taut in tauts]) if not test else [{} for taut in tauts]
+
+            for taut, structInfo in zip(tauts, structInfos):
                 tautStructDict = {'image': taut['image']['image'], 'key': 'taut'}
-                if not test:
-                    structInfo = self.getStructInfo(taut['structureData']['structure'])
-                    tautStructDict.update(structInfo)
+                tautStructDict.update(structInfo)
                 tautStructDict.update({'dist': 100 * round(taut['dominantTautomerDistribution'], 4)})
                 tautImageList.append(tautStructDict)
 
@@ -480,11 +483,11 @@ class Stereoisomer(JchemProperty):
     def getStereoisomers(self, test=False):
         stereoList = []
         try:
-            for stereo in self.results['result']:
+            stereos = self.results['result']
+            structInfos = self.getStructInfos([stereo['structureData']['structure'] for stereo in stereos]) if not test else [{} for stereo in stereos]
+            for stereo, structInfo in zip(stereos, structInfos):
                 stereoDict = {'image': stereo['image']['image'], 'key': 'stereo'}
-                if not test:
-                    structInfo = self.getStructInfo(stereo['structureData']['structure'])
-                    stereoDict.update(structInfo)
+                stereoDict.update(structInfo)
                 stereoList.append(stereoDict)
             return stereoList
         except KeyError as ke:
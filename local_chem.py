@@ -0,0 +1,187 @@
+"""
+Local (RDKit) versions of jchem ws util calls that don't need
+jchem's chemistry, e.g., formula and mass for getStructInfo.
+RDKit is optional; without it, callers fall back to jchem ws.
+"""
+
+import logging
+import re
+
+from .memory_cache import cache_from_env
+
+try:
+	from rdkit import Chem
+	from rdkit.Chem import Descriptors, rdMolDescriptors
+	from rdkit.Chem.MolStandardize import rdMolStandardize
+except ImportError:
+	Chem = None  # local chemistry unavailable
+
+
+
+class MassProvider:
+	"""
+	Average mass (g/mol, jchem's chemicalTerms(mass)) by SMILES,
+	computed with RDKit and memoized per SMILES (CTS_MASS_CACHE_SIZE).
+	"""
+
+	def __init__(self):
+		self.memo = cache_from_env("mass", "CTS_MASS_CACHE", max_size=8192, ttl=0)  # masses don't expire
+
+	def get_mass(self, smiles):
+		"""
+		Returns the mass for a SMILES, or None if RDKit can't parse it.
+		"""
+		mass = self.memo.get(smiles)
+		if mass is not None:
+			return mass
+		mol = get_mol(smiles)
+		if mol is None:
+			return None
+		mass = round(Descriptors.MolWt(mol), 3)
+		self.memo.set(smiles, mass)
+		return mass
+
+	def get_masses(self, smiles_list):
+		"""
+		Returns masses for a list of SMILES (None for ones RDKit can't parse).
+		"""
+		masses = {}
+		for smiles in smiles_list:
+			if smiles not in masses:
+				masses[smiles] = self.get_mass(smiles)
+		return [masses[smiles] for smiles in smiles_list]
+
+
+
+def is_available():
+	return Chem is not None
+
+
+def get_mol(smiles):
+	"""
+	Returns an RDKit Mol for a SMILES, or None if it doesn't parse.
+	"""
+	if Chem is None or not smiles or not isinstance(smiles, str):
+		return None
+	try:
+		return Chem.MolFromSmiles(smiles)
+	except Exception as e:
+		logging.warning("local_chem get_mol exception: {}".format(e))
+		return None
+
+
+def get_struct_info(smiles):
+	"""
+	Returns getStructInfo's formula, mass, exactMass and (canonical)
+	smiles for a SMILES, with iupac None, or None if RDKit can't parse it.
+	"""
+	mol = get_mol(smiles)
+	if mol is None:
+		return None
+	return {
+		'formula': rdMolDescriptors.CalcMolFormula(mol),
+		'iupac': None,  # from jchem ws
+		'mass': round(Descriptors.MolWt(mol), 3),
+		'smiles': Chem.MolToSmiles(mol),
+		'exactMass': round(Descriptors.ExactMolWt(mol), 9)
+	}
+
+
+def canonicalize(smiles):
+	"""
+	Returns RDKit's canonical SMILES, or None if it doesn't parse.
+	"""
+	mol = get_mol(smiles)
+	return Chem.MolToSmiles(mol) if mol is not None else None
+
+
+def standardize(smiles):
+	"""
+	RDKit version of filterSMILES' standardization (CTSWS removeExplicitH
+	and transform, jchem major tautomer, CTSWS neutralize):
+	  + removes explicit hydrogens
+	  + normalizes groups (e.g., nitro to [N+](=O)[O-])
+	  + picks RDKit's canonical tautomer (not pH dependent, unlike jchem's major tautomer)
+	  + neutralizes charges
+	Returns the canonical SMILES, or None if RDKit can't standardize it.
+	"""
+	mol = get_mol(smiles)
+	if mol is None:
+		return None
+	try:
+		mol = Chem.RemoveHs(mol)
+		mol = rdMolStandardize.Normalize(mol)
+		mol = rdMolStandardize.TautomerEnumerator().Canonicalize(mol)
+		mol = rdMolStandardize.Uncharger().uncharge(mol)
+		return Chem.MolToSmiles(mol)
+	except Exception as e:
+		logging.warning("local_chem standardize exception: {}".format(e))
+		return None
+
+
+def has_element(smiles, symbol):
+	"""
+	Returns whether a SMILES has an atom of an element (e.g., "C"),
+	like an element in jchem's elemental analysis composition, or
+	None if RDKit can't parse it.
+	"""
+	mol = get_mol(smiles)
+	if mol is None:
+		return None
+	return any(atom.GetSymbol() == symbol for atom in mol.GetAtoms())
+
+
+def is_valid_cas(chemical):
+	"""
+	Returns whether a string is a CASRN (e.g., 50-78-2) with a valid
+	check digit.
+	"""
+	match = re.fullmatch(r"(\d{2,7})-(\d{2})-(\d)", chemical)
+	if not match:
+		return False
+	digits = (match.group(1) + match.group(2))[::-1]
+	return sum((i + 1) * int(digit) for i, digit in enumerate(digits)) % 10 == int(match.group(3))
+
+
+def is_valid_smiles(smiles):
+	"""
+	Returns whether RDKit parses a SMILES, with its aromatic
+	rings kekulizable (e.g., not "ccc").
+	"""
+	mol = get_mol(smiles)
+	if mol is None or mol.GetNumAtoms() == 0:
+		return False
+	try:
+		Chem.Kekulize(Chem.Mol(mol), clearAromaticFlags=True)
+	except Exception:
+		return False
+	return not any(atom.GetIsAromatic() and not atom.IsInRing() for atom in mol.GetAtoms())
+
+
+def get_identifier_type(chemical):
+	"""
+	Classifies the obvious chemical identifiers locally, with jchem's
+	/util/analyze type names: "CAS#", "smiles" and "mrv" (marvin
+	or other xml), plus "dtxsid" and "dtxcid" for DSSTOX IDs.
+	Returns None for anything ambiguous (e.g., names), which is left
+	to jchem.
+	"""
+	if not chemical or not isinstance(chemical, str):
+		return None
+	chemical = chemical.strip()
+	if chemical.startswith("<"):
+		lowered = chemical[:500].lower()
+		return "mrv" if "<cml" in lowered or "<?xml" in lowered or "<mdocument" in lowered else None
+	if is_valid_cas(chemical):
+		return "CAS#"
+	if re.fullmatch(r"DTXSID\d+", chemical, re.IGNORECASE):
+		return "dtxsid"
+	if re.fullmatch(r"DTXCID\d+", chemical, re.IGNORECASE):
+		return "dtxcid"
+	if " " not in chemical and is_valid_smiles(chemical):
+		return "smiles"
+	return None
+
+
+
+mass_provider = MassProvider()  # shared by the calcs' get_mass
@@ -0,0 +1,106 @@
+"""
+Bounded in-process caches (LRU eviction plus TTL) for results
+that are pure functions of their request, e.g., jchem util calls.
+"""
+
+from collections import OrderedDict
+import threading
+import logging
+import copy
+import time
+import os
+
+
+
+class LRUCache:
+	"""
+	Thread-safe LRU cache with per-entry TTL.
+	  + max_size - max entries kept, least recently used are evicted
+	  + ttl - seconds an entry is valid for (None for no expiry)
+	  + enabled - when False, get always misses and set does nothing
+	Values are deep-copied in and out, so callers can modify what they get.
+	"""
+
+	def __init__(self, name, max_size=1024, ttl=3600, enabled=True):
+		self.name = name
+		self.max_size = max_size
+		self.ttl = ttl
+		self.enabled = enabled
+		self.entries = OrderedDict()  # key -> (expires_at, value)
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.lock = threading.Lock()
+
+	def get(self, key, default=None):
+		if not self.enabled:
+			return default
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return default
+			expires_at, value = entry
+			if expires_at is not None and time.monotonic() >= expires_at:
+				del self.entries[key]
+				self.misses += 1
+				return default
+			self.entries.move_to_end(key)
+			self.hits += 1
+		return copy.deepcopy(value)
+
+	def set(self, key, value):
+		if not self.enabled or self.max_size <= 0:
+			return
+		expires_at = time.monotonic() + self.ttl if self.ttl else None
+		value = copy.deepcopy(value)
+		with self.lock:
+			self.entries[key] = (expires_at, value)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+				self.evictions += 1
+
+	def delete(self, key):
+		with self.lock:
+			self.entries.pop(key, None)
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+	def get_stats(self):
+		"""
+		Returns size and hit/miss counters.
+		"""
+		with self.lock:
+			total = self.hits + self.misses
+			return {
+				'name': self.name,
+				'size': len(self.entries),
+				'max_size': self.max_size,
+				'ttl': self.ttl,
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'hit_rate': round(self.hits / total, 4) if total else None
+			}
+
+
+
+def cache_from_env(name, prefix, max_size, ttl):
+	"""
+	Creates an LRUCache configured by <prefix>_ENABLED, <prefix>_SIZE
+	and <prefix>_TTL env vars (e.g., CTS_JCHEM_CACHE_SIZE).
+	"""
+	return LRUCache(
+		name,
+		max_size=int(os.environ.get(prefix + '_SIZE', max_size)),
+		ttl=float(os.environ.get(prefix + '_TTL', ttl)),
+		enabled=os.environ.get(prefix + '_ENABLED', 'true').lower() == 'true'
+	)
+
+
+
+# jchem util results (details, molExport, analyze) by request payload:
+jchem_cache = cache_from_env("jchem", "CTS_JCHEM_CACHE", max_size=4096, ttl=24 * 3600)
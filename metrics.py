@@ -0,0 +1,279 @@
+"""
+Per-upstream request metrics (latency histograms, statuses, retries,
+timeouts, bytes in/out) for the CTS calculators' HTTP calls, with
+export in Prometheus text format.
+"""
+
+from urllib.parse import urlsplit
+import requests
+import threading
+import bisect
+import json
+import re
+import os
+
+from .circuit_breaker import CircuitOpenError
+from .deadline import DeadlineExceeded
+
+
+
+# Latency buckets in seconds (calc servers like TEST and SPARC can take a minute):
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+
+class Histogram:
+	"""
+	Cumulative-bucket histogram, same layout as a Prometheus histogram.
+	"""
+
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.sum += value
+		self.count += 1
+
+	def get_quantile(self, q):
+		"""
+		Estimates a quantile (e.g., 0.99) by linear interpolation
+		within its bucket, like Prometheus' histogram_quantile.
+		"""
+		if not self.count:
+			return None
+		rank = q * self.count
+		cumulative = 0
+		for i, bucket_count in enumerate(self.counts):
+			if cumulative + bucket_count >= rank and bucket_count:
+				if i == len(self.buckets):
+					return self.buckets[-1]  # in +Inf bucket
+				lower = self.buckets[i - 1] if i > 0 else 0
+				return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+			cumulative += bucket_count
+		return self.buckets[-1]
+
+
+
+class MetricsRegistry:
+	"""
+	Holds the process' upstream request metrics, labeled by upstream
+	(e.g., "http://jchem-host:8080") and endpoint (url path). Endpoints
+	with values in the path (e.g., ccte's chemical/search/equal/{}) are
+	labeled by their registered template, and each upstream is capped at
+	max_endpoints labels so unknown paths can't grow the registry.
+	"""
+
+	def __init__(self):
+		self.enabled = os.environ.get('CTS_METRICS_ENABLED', 'true').lower() == 'true'
+		self.max_endpoints = int(os.environ.get('CTS_METRICS_MAX_ENDPOINTS', 50))  # per upstream
+		self.endpoint_templates = []  # (regex, label)
+		self.lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		self.latency = {}  # (upstream, endpoint, method) -> Histogram
+		self.requests = {}  # (upstream, endpoint, method, status) -> count
+		self.retries = {}  # (upstream, endpoint, reason) -> count
+		self.timeouts = {}  # (upstream, endpoint) -> count
+		self.bytes_sent = {}  # (upstream, endpoint) -> bytes
+		self.bytes_received = {}  # (upstream, endpoint) -> bytes
+		self.endpoints = {}  # upstream -> set of endpoint labels
+
+	def reset_after_fork(self):
+		"""
+		Child processes (e.g., celery prefork workers) start with
+		their own metrics rather than a copy of the parent's.
+		"""
+		self.lock = threading.Lock()
+		self.reset()
+
+	def register_endpoint(self, template):
+		"""
+		Adds an endpoint template with "{}" for path values, e.g.,
+		"chemical/search/equal/{}", so requests to it share a label.
+		"""
+		path = "/" + urlsplit(template).path.lstrip("/") if "://" in template else "/" + template.lstrip("/")
+		pattern = re.compile("^" + ".+".join(re.escape(part) for part in path.split("{}")) + "$")  # values can have "/" (e.g., SMILES)
+		with self.lock:
+			if path not in [label for regex, label in self.endpoint_templates]:
+				self.endpoint_templates.append((pattern, path))
+
+	def get_endpoint(self, upstream, url):
+		"""
+		Returns the endpoint label for a request url (path without the query).
+		"""
+		path = urlsplit(url if "://" in url else "http://" + url).path or "/"
+		for pattern, label in self.endpoint_templates:
+			if pattern.match(path):
+				return label
+		known = self.endpoints.setdefault(upstream, set())
+		if path not in known:
+			if len(known) >= self.max_endpoints:
+				return "other"
+			known.add(path)
+		return path
+
+	def get_status(self, response=None, error=None):
+		"""
+		Status label for an outcome: the response's status code, or
+		deadline_exceeded, timeout, circuit_open, connection_error or error.
+		"""
+		if response is not None:
+			return str(response.status_code)
+		if isinstance(error, DeadlineExceeded):
+			return "deadline_exceeded"
+		if isinstance(error, requests.exceptions.Timeout):
+			return "timeout"
+		if isinstance(error, CircuitOpenError):
+			return "circuit_open"
+		if isinstance(error, requests.exceptions.ConnectionError):
+			return "connection_error"
+		return "error"
+
+	def record_request(self, upstream, method, url, latency=None, response=None, error=None, bytes_sent=0):
+		"""
+		Records a request's outcome. Latency is None for requests
+		that weren't sent (e.g., the upstream's circuit was open).
+		"""
+		if not self.enabled:
+			return
+		status = self.get_status(response, error)
+		content = getattr(response, 'content', None)
+		bytes_received = len(content) if isinstance(content, (bytes, str)) else 0
+		with self.lock:
+			endpoint = self.get_endpoint(upstream, url)
+			key = (upstream, endpoint)
+			request_key = (upstream, endpoint, method.upper(), status)
+			self.requests[request_key] = self.requests.get(request_key, 0) + 1
+			if latency is not None:
+				histogram = self.latency.setdefault((upstream, endpoint, method.upper()), Histogram())
+				histogram.observe(latency)
+			if status == "timeout":
+				self.timeouts[key] = self.timeouts.get(key, 0) + 1
+			self.bytes_sent[key] = self.bytes_sent.get(key, 0) + bytes_sent
+			self.bytes_received[key] = self.bytes_received.get(key, 0) + bytes_received
+
+	def record_retry(self, upstream, url, reason):
+		"""
+		Records a retry of a request (reason is e.g. "status 503" or "Timeout").
+		"""
+		if not self.enabled:
+			return
+		with self.lock:
+			key = (upstream, self.get_endpoint(upstream, url), reason)
+			self.retries[key] = self.retries.get(key, 0) + 1
+
+	def get_summary(self):
+		"""
+		Returns {upstream: {requests, errors, retries, timeouts, p50, p99}}
+		with latency quantiles (seconds) across the upstream's endpoints.
+		"""
+		summary = {}
+		with self.lock:
+			for (upstream, endpoint, method, status), count in self.requests.items():
+				upstream_summary = summary.setdefault(upstream, {'requests': 0, 'errors': 0, 'retries': 0, 'timeouts': 0})
+				upstream_summary['requests'] += count
+				if not status.startswith("2"):
+					upstream_summary['errors'] += count
+			for (upstream, endpoint, reason), count in self.retries.items():
+				summary.setdefault(upstream, {'requests': 0, 'errors': 0, 'retries': 0, 'timeouts': 0})['retries'] += count
+			for (upstream, endpoint), count in self.timeouts.items():
+				summary[upstream]['timeouts'] += count
+			histograms = {}
+			for (upstream, endpoint, method), histogram in self.latency.items():
+				merged = histograms.setdefault(upstream, Histogram())
+				merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+				merged.count += histogram.count
+				merged.sum += histogram.sum
+		for upstream, histogram in histograms.items():
+			summary[upstream]['p50'] = histogram.get_quantile(0.5)
+			summary[upstream]['p99'] = histogram.get_quantile(0.99)
+		return summary
+
+	def export_prometheus(self):
+		"""
+		Returns the metrics in Prometheus text exposition format.
+		"""
+		lines = []
+		with self.lock:
+			lines += [
+				"# HELP cts_upstream_request_duration_seconds Upstream request latency.",
+				"# TYPE cts_upstream_request_duration_seconds histogram"
+			]
+			for (upstream, endpoint, method), histogram in sorted(self.latency.items()):
+				labels = format_labels(upstream=upstream, endpoint=endpoint, method=method)
+				cumulative = 0
+				for bucket, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+					cumulative += count
+					bucket_labels = format_labels(upstream=upstream, endpoint=endpoint, method=method, le=bucket)
+					lines.append("cts_upstream_request_duration_seconds_bucket{} {}".format(bucket_labels, cumulative))
+				lines.append("cts_upstream_request_duration_seconds_sum{} {}".format(labels, histogram.sum))
+				lines.append("cts_upstream_request_duration_seconds_count{} {}".format(labels, histogram.count))
+
+			lines += [
+				"# HELP cts_upstream_requests_total Upstream requests by status code or error.",
+				"# TYPE cts_upstream_requests_total counter"
+			]
+			for (upstream, endpoint, method, status), count in sorted(self.requests.items()):
+				labels = format_labels(upstream=upstream, endpoint=endpoint, method=method, status=status)
+				lines.append("cts_upstream_requests_total{} {}".format(labels, count))
+
+			lines += [
+				"# HELP cts_upstream_retries_total Upstream request retries.",
+				"# TYPE cts_upstream_retries_total counter"
+			]
+			for (upstream, endpoint, reason), count in sorted(self.retries.items()):
+				labels = format_labels(upstream=upstream, endpoint=endpoint, reason=reason)
+				lines.append("cts_upstream_retries_total{} {}".format(labels, count))
+
+			for name, help_text, values in [
+				("cts_upstream_timeouts_total", "Upstream requests that timed out.", self.timeouts),
+				("cts_upstream_sent_bytes_total", "Request body bytes sent to upstreams.", self.bytes_sent),
+				("cts_upstream_received_bytes_total", "Response body bytes received from upstreams.", self.bytes_received)
+			]:
+				lines += ["# HELP {} {}".format(name, help_text), "# TYPE {} counter".format(name)]
+				for (upstream, endpoint), value in sorted(values.items()):
+					lines.append("{}{} {}".format(name, format_labels(upstream=upstream, endpoint=endpoint), value))
+
+		return "\n".join(lines) + "\n"
+
+
+
+def format_labels(**labels):
+	"""
+	Returns Prometheus labels, e.g., {endpoint="/x",upstream="http://host"}.
+	"""
+	escaped = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+		for name, value in labels.items()]
+	return "{" + ",".join(escaped) + "}"
+
+
+def get_request_size(data=None, json_data=None):
+	"""
+	Returns the size in bytes of a request body (data or json kwarg).
+	"""
+	if data is None and json_data is not None:
+		data = json.dumps(json_data)
+	if isinstance(data, str):
+		return len(data.encode("utf-8"))
+	if isinstance(data, (bytes, bytearray)):
+		return len(data)
+	return 0
+
+
+def export_prometheus():
+	"""
+	Returns the process' upstream metrics in Prometheus text format.
+	"""
+	return metrics.export_prometheus()
+
+
+
+metrics = MetricsRegistry()  # shared by both transports and the retry policy
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=metrics.reset_after_fork)
@@ -16,6 +16,8 @@ class MongoDBHandler:
 		# MongoDB Settings:
 		self.db = None  # opens cts database (set in connection function)
 		self.chem_info_collection = None  # chem info data collection (set in connection function)
+		self.chem_info_extra_collection = None  # bulky chem info fields (images, structureData), by chem info _id
+		self.chem_info_ttl = int(os.environ.get('CTS_CHEM_INFO_DB_TTL', 30 * 24 * 3600))  # seconds chem info documents are kept
 		self.pchem_collection = None  # pchem data collection
 		self.db_conn_timeout = 1
 		self.is_connected = False
@@ -23,10 +25,10 @@ class MongoDBHandler:
 		self.mongodb_host = os.environ.get('CTS_DB_HOST')
 
 		# Keys for chem info collection document entry:
-		self.chem_info_keys = ["dsstoxSubstanceId", "chemical", "orig_smiles",
-			"smiles", "preferredName", "iupac", "formula", "casrn",
-			"cas", "mass", "exactMass", "structureData"]
-		self.extra_chem_info_Keys = ["node_image", "popup_image"]  # html wrappers w/ images for product nodes and popups
+		self.chem_info_keys = ["chemical", "orig_smiles", "smiles",
+			"preferredName", "iupac", "formula", "casrn", "cas", "dtxsid",
+			"mass", "exactMass", "has_carbon"]
+		self.extra_chem_info_Keys = ["structureData", "node_image", "popup_image"]  # marvin structure, html wrappers w/ images for product nodes and popups
 
 		# Keys for pchem collection document entry:
 		self.pchem_keys = ["dsstoxSubstanceId", "calc", "prop", "data", "method", "ph"]
@@ -43,7 +45,8 @@ class MongoDBHandler:
 			self.mongodb_conn = pymongo.MongoClient(host=self.mongodb_host, serverSelectionTimeoutMS=200, connectTimeoutMS=200)
 			self.is_connected = True
 			self.db = self.mongodb_conn.cts  # opens cts database
-			# self.chem_info_collection = self.db.chem_info  # chem info data collection
+			self.chem_info_collection = self.db.chem_info  # chem info data collection
+			self.chem_info_extra_collection = self.db.chem_info_extra  # bulky chem info fields
 			self.pchem_collection = self.db.pchem  # pchem data collection
 			self.dtxcid_collection = self.db.dtxcid  # dtxcid data collection
 			self.test_db_connection()
@@ -79,36 +82,56 @@ class MongoDBHandler:
 		jid = localDatetime.strftime('%Y%m%d%H%M%S%f')
 		return jid
 
-	# def create_chem_info_document(self, query_obj):
-	# 	"""
-	# 	Creates chem info object for querying and inserting.
-	# 	"""
-	# 	new_query_obj = dict()
-	# 	for key, val in query_obj.items():
-	# 		if key in self.chem_info_keys + self.extra_chem_info_Keys:
-	# 			new_query_obj[key] = val
-	# 	return new_query_obj
+	def create_chem_info_indexes(self):
+		"""
+		Creates TTL indexes so chem info documents expire
+		chem_info_ttl seconds after they're written.
+		"""
+		for collection in [self.chem_info_collection, self.chem_info_extra_collection]:
+			collection.create_index("created", expireAfterSeconds=self.chem_info_ttl)
 
-	# def find_chem_info_document(self, query_obj):
-	# 	"""
-	# 	Searches chem info collection for document matching chemical.
-	# 	Returns chem info data if it exists, or None if it doesn't.
-	# 	"""
-	# 	if not self.is_connected:
-	# 		return None
-	# 	chem_info_result = self.chem_info_collection.find_one(query_obj)  # searches db
-	# 	return chem_info_result
+	def create_chem_info_document(self, molecule_obj):
+		"""
+		Creates chem info objects for inserting. Returns (document,
+		extra document), with the bulky extra_chem_info_Keys
+		fields in the extra document.
+		"""
+		document = {key: val for key, val in molecule_obj.items() if key in self.chem_info_keys}
+		extra_document = {key: val for key, val in molecule_obj.items() if key in self.extra_chem_info_Keys}
+		return document, extra_document
 
-	# def insert_chem_info_data(self, molecule_obj):
-	# 	"""
-	# 	Inserts chem info data into chem info collection.
-	# 	Returns document unique _id.
-	# 	"""
-	# 	if not self.is_connected or not molecule_obj:
-	# 		return None
-	# 	db_object = self.create_chem_info_document(molecule_obj)
-	# 	chem_info_obj = self.chem_info_collection.insert_one(db_object)  # inserts query object
-	# 	return chem_info_obj
+	def find_chem_info_document(self, key, include_extra=False):
+		"""
+		Searches chem info collection for document matching chemical
+		(key). Returns chem info data (with the extra fields if
+		include_extra) if it exists, or None if it doesn't.
+		"""
+		if not self.is_connected:
+			return None
+		chem_info_result = self.chem_info_collection.find_one({'_id': key})  # searches db
+		if not chem_info_result:
+			return None
+		molecule_obj = chem_info_result['data']
+		if not include_extra:
+			return molecule_obj
+		extra_result = self.chem_info_extra_collection.find_one({'_id': key})
+		if extra_result:
+			molecule_obj.update(extra_result['data'])
+		return molecule_obj
+
+	def insert_chem_info_data(self, key, molecule_obj):
+		"""
+		Inserts (or replaces) chem info data in chem info collection.
+		Returns document unique _id.
+		"""
+		if not self.is_connected or not molecule_obj:
+			return None
+		document, extra_document = self.create_chem_info_document(molecule_obj)
+		created = datetime.datetime.now(pytz.UTC)
+		if extra_document:
+			self.chem_info_extra_collection.replace_one({'_id': key}, {'_id': key, 'data': extra_document, 'created': created}, upsert=True)
+		self.chem_info_collection.replace_one({'_id': key}, {'_id': key, 'data': document, 'created': created}, upsert=True)  # inserts query object
+		return key
 
 	def create_pchem_document(self, query_obj):
 		"""
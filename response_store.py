@@ -0,0 +1,175 @@
+"""
+Persistent on-disk store of calculator upstream responses (SQLite in
+WAL mode, so worker processes can read it concurrently). Responses are
+keyed by namespace (calc + model version), upstream, endpoint and a
+hash of the canonical payload.
+"""
+
+from urllib.parse import urlsplit
+import threading
+import sqlite3
+import hashlib
+import logging
+import time
+import os
+
+from .single_flight import request_key
+
+
+
+class ResponseStore:
+	"""
+	Content-addressed response store.
+	  + path - SQLite file shared by the workers (store is disabled without one)
+	  + max_bytes - size cap for stored content, oldest entries evicted first
+	  + eviction - "lru" (least recently read) or "fifo" (oldest written)
+	  + ttl - seconds a response is valid for (None for no expiry)
+	"""
+
+	touch_interval = 60  # seconds between access time updates for an entry
+	evict_interval = 100  # writes between size checks
+
+	def __init__(self, path=None, max_bytes=1024 * 1024 * 1024, eviction="lru", ttl=None):
+		self.path = path
+		self.enabled = bool(path)
+		self.max_bytes = max_bytes
+		self.eviction = eviction if eviction in ("lru", "fifo") else "lru"
+		self.ttl = ttl
+		self.local = threading.local()  # sqlite connections can't be shared across threads
+		self.writes = 0
+		self.lock = threading.Lock()
+
+	def get_connection(self):
+		"""
+		Returns the thread's connection, (re)opening it after a fork.
+		"""
+		conn = getattr(self.local, 'conn', None)
+		if conn and self.local.pid == os.getpid():
+			return conn
+		conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)  # autocommit
+		conn.execute("PRAGMA journal_mode=WAL")
+		conn.execute("PRAGMA synchronous=NORMAL")
+		conn.execute("""
+			CREATE TABLE IF NOT EXISTS responses (
+				key TEXT PRIMARY KEY,
+				namespace TEXT,
+				upstream TEXT,
+				endpoint TEXT,
+				status INTEGER,
+				content BLOB,
+				size INTEGER,
+				created REAL,
+				accessed REAL
+			)
+		""")
+		conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+		conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+		conn.execute("CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace)")
+		self.local.conn = conn
+		self.local.pid = os.getpid()
+		return conn
+
+	def get_key(self, namespace, url, payload=None):
+		"""
+		Returns (key, upstream, endpoint) for a request.
+		"""
+		parts = urlsplit(url if "://" in url else "http://" + url)
+		upstream = "{}://{}".format(parts.scheme, parts.netloc).lower()
+		endpoint = parts.path
+		canonical = "\n".join([namespace] + list(request_key("", url, payload)[1:]))
+		return hashlib.sha256(canonical.encode("utf-8")).hexdigest(), upstream, endpoint
+
+	def get(self, namespace, url, payload=None):
+		"""
+		Returns stored (status, content) for a request, or None.
+		"""
+		if not self.enabled:
+			return None
+		key = self.get_key(namespace, url, payload)[0]
+		try:
+			conn = self.get_connection()
+			row = conn.execute("SELECT status, content, created, accessed FROM responses WHERE key = ?", (key,)).fetchone()
+			if not row:
+				return None
+			status, content, created, accessed = row
+			now = time.time()
+			if self.ttl and now - created > self.ttl:
+				conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+				return None
+			if self.eviction == "lru" and now - accessed > self.touch_interval:
+				conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+			return status, content
+		except sqlite3.Error as e:
+			logging.warning("response_store get exception: {}".format(e))
+			return None
+
+	def set(self, namespace, url, payload, content, status=200):
+		"""
+		Stores a response's content. Failures are logged and ignored.
+		"""
+		if not self.enabled:
+			return
+		key, upstream, endpoint = self.get_key(namespace, url, payload)
+		if isinstance(content, str):
+			content = content.encode("utf-8")
+		now = time.time()
+		try:
+			conn = self.get_connection()
+			conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(key, namespace, upstream, endpoint, status, sqlite3.Binary(content), len(content), now, now))
+		except sqlite3.Error as e:
+			logging.warning("response_store set exception: {}".format(e))
+			return
+		with self.lock:
+			self.writes += 1
+			check_size = self.writes % self.evict_interval == 0
+		if check_size:
+			self.evict()
+
+	def evict(self):
+		"""
+		Deletes the least recently used (or oldest) entries until
+		the store is under 90% of max_bytes.
+		"""
+		order_by = "accessed" if self.eviction == "lru" else "created"
+		try:
+			conn = self.get_connection()
+			total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+			if total <= self.max_bytes:
+				return
+			to_free = total - int(0.9 * self.max_bytes)
+			freed, keys = 0, []
+			for key, size in conn.execute("SELECT key, size FROM responses ORDER BY {}".format(order_by)):
+				keys.append(key)
+				freed += size
+				if freed >= to_free:
+					break
+			for i in range(0, len(keys), 500):
+				chunk = keys[i:i + 500]
+				conn.execute("DELETE FROM responses WHERE key IN ({})".format(",".join("?" * len(chunk))), chunk)
+			logging.info("response_store evicted {} responses ({} bytes).".format(len(keys), freed))
+		except sqlite3.Error as e:
+			logging.warning("response_store evict exception: {}".format(e))
+
+	def drop_namespace(self, namespace):
+		"""
+		Deletes all responses in a namespace (e.g., an old model version).
+		"""
+		if not self.enabled:
+			return
+		self.get_connection().execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+
+	def get_stats(self):
+		if not self.enabled:
+			return {'enabled': False}
+		count, size = self.get_connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+		return {'enabled': True, 'path': self.path, 'count': count, 'size': size, 'max_bytes': self.max_bytes}
+
+
+
+response_store = ResponseStore(
+	path=os.environ.get('CTS_RESPONSE_STORE_PATH'),
+	max_bytes=int(float(os.environ.get('CTS_RESPONSE_STORE_MAX_MB', 1024)) * 1024 * 1024),
+	eviction=os.environ.get('CTS_RESPONSE_STORE_EVICTION', 'lru'),
+	ttl=float(os.environ['CTS_RESPONSE_STORE_TTL']) if os.environ.get('CTS_RESPONSE_STORE_TTL') else None
+)
@@ -0,0 +1,212 @@
+"""
+Shared retry policy for calculator requests: exponential backoff
+with jitter, retryable-status classification, a per-request retry
+budget, and a per-upstream retry cap.
+"""
+
+import requests
+from collections import deque
+import threading
+import asyncio
+import logging
+import random
+import time
+import os
+
+from .http_transport import transport
+from .circuit_breaker import CircuitOpenError
+from .metrics import metrics
+from .deadline import get_deadline, DeadlineExceeded
+
+
+
+class RetryBudget:
+	"""
+	Per-upstream retry cap. Within a sliding window, retries to an
+	upstream are limited to min_retries plus a ratio of the requests
+	made to it, so a struggling server isn't hit with 3x its normal load.
+	"""
+
+	def __init__(self, ratio=0.2, min_retries=10, window=60):
+		self.ratio = ratio  # allowed retries per request
+		self.min_retries = min_retries  # retries always allowed per window
+		self.window = window  # seconds
+		self.requests = deque()  # timestamps of requests
+		self.retries = deque()  # timestamps of retries
+		self.lock = threading.Lock()
+
+	def prune(self, now):
+		while self.requests and now - self.requests[0] > self.window:
+			self.requests.popleft()
+		while self.retries and now - self.retries[0] > self.window:
+			self.retries.popleft()
+
+	def record_request(self):
+		with self.lock:
+			now = time.monotonic()
+			self.prune(now)
+			self.requests.append(now)
+
+	def try_retry(self):
+		"""
+		Returns True and records the retry if the upstream has
+		retries left in the window, returns False otherwise.
+		"""
+		with self.lock:
+			now = time.monotonic()
+			self.prune(now)
+			allowed = self.min_retries + self.ratio * len(self.requests)
+			if len(self.retries) >= allowed:
+				return False
+			self.retries.append(now)
+			return True
+
+
+
+class RetryPolicy:
+	"""
+	Retry policy used by Calculator.request_with_retries.
+	  + max_attempts - total tries for a request (the calcs' max_retries)
+	  + base_delay, max_delay - exponential backoff bounds in seconds
+	  + jitter - uses "full jitter" (random delay up to the backoff)
+	  + retry_statuses - non-200 statuses worth retrying
+	  + retry_on_timeout - whether a timed out request is retried
+	  + max_elapsed - per-request budget in seconds for all tries and waits
+	"""
+
+	retry_budgets = {}  # upstream host -> RetryBudget, shared across calcs
+	budgets_lock = threading.Lock()
+
+	def __init__(self, base_delay=None, max_delay=None, jitter=True,
+			retry_statuses=(408, 429, 500, 502, 503, 504), retry_on_timeout=True, max_elapsed=None):
+		self.base_delay = base_delay if base_delay is not None else float(os.environ.get('CTS_RETRY_BASE_DELAY', 0.5))
+		self.max_delay = max_delay if max_delay is not None else float(os.environ.get('CTS_RETRY_MAX_DELAY', 8.0))
+		self.jitter = jitter
+		self.retry_statuses = retry_statuses
+		self.retry_on_timeout = retry_on_timeout
+		self.max_elapsed = max_elapsed
+
+	@classmethod
+	def get_retry_budget(cls, url):
+		"""
+		Returns the shared RetryBudget for the url's upstream host.
+		"""
+		host = transport.get_host(url)
+		with cls.budgets_lock:
+			if host not in cls.retry_budgets:
+				cls.retry_budgets[host] = RetryBudget(
+					ratio=float(os.environ.get('CTS_RETRY_BUDGET_RATIO', 0.2)),
+					min_retries=int(os.environ.get('CTS_RETRY_BUDGET_MIN', 10))
+				)
+			return cls.retry_budgets[host]
+
+	def get_delay(self, attempt):
+		"""
+		Backoff before the given retry (attempt 1 is the first retry).
+		"""
+		delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+		if self.jitter:
+			delay = random.uniform(0, delay)
+		return delay
+
+	def is_retryable_response(self, response):
+		"""
+		A 200 that failed the calc's validation (e.g., SPARC LOGD missing
+		plotCoordinates) is retried, as are the retry_statuses.
+		"""
+		if response.status_code == 200:
+			return True
+		return response.status_code in self.retry_statuses
+
+	def is_retryable_exception(self, error):
+		if isinstance(error, CircuitOpenError):
+			return False  # upstream is known to be down
+		if isinstance(error, DeadlineExceeded):
+			return False  # workflow is out of time
+		if isinstance(error, requests.exceptions.Timeout):
+			return self.retry_on_timeout
+		return isinstance(error, requests.exceptions.ConnectionError)
+
+	def execute(self, url, send_request, validate_response=None, max_attempts=3):
+		"""
+		Calls send_request() until validate_response(response) is True
+		or the policy gives up. Returns the valid response, or None.
+		"""
+		budget = self.get_retry_budget(url)
+		budget.record_request()
+		start_time = time.monotonic()
+		attempt = 0
+
+		while True:
+			attempt += 1
+			try:
+				response = send_request()
+				if not validate_response or validate_response(response):
+					return response
+				retryable = self.is_retryable_response(response)
+				reason = "status {}".format(response.status_code)
+			except Exception as e:
+				logging.warning("Exception requesting {}: {}".format(url, e))
+				retryable = self.is_retryable_exception(e)
+				reason = e.__class__.__name__
+
+			delay = self.get_retry_delay(url, budget, attempt, max_attempts, start_time, retryable, reason)
+			if delay is None:
+				return None
+			time.sleep(delay)
+
+	async def async_execute(self, url, send_request, validate_response=None, max_attempts=3):
+		"""
+		Same as execute, but awaits send_request() and the backoff.
+		"""
+		budget = self.get_retry_budget(url)
+		budget.record_request()
+		start_time = time.monotonic()
+		attempt = 0
+
+		while True:
+			attempt += 1
+			try:
+				response = await send_request()
+				if not validate_response or validate_response(response):
+					return response
+				retryable = self.is_retryable_response(response)
+				reason = "status {}".format(response.status_code)
+			except Exception as e:
+				logging.warning("Exception requesting {}: {}".format(url, e))
+				retryable = self.is_retryable_exception(e)
+				reason = e.__class__.__name__
+
+			delay = self.get_retry_delay(url, budget, attempt, max_attempts, start_time, retryable, reason)
+			if delay is None:
+				return None
+			await asyncio.sleep(delay)
+
+	def get_retry_delay(self, url, budget, attempt, max_attempts, start_time, retryable, reason):
+		"""
+		Returns the wait before the next try, or None if the policy gives up.
+		"""
+		if not retryable:
+			logging.warning("Not retrying {} ({}), error is not retryable.".format(url, reason))
+			return None
+		if attempt >= max_attempts:
+			logging.warning("Max retries: {}, Retries left: 0 ({}).".format(max_attempts, url))
+			return None
+
+		delay = self.get_delay(attempt)
+		if self.max_elapsed and time.monotonic() - start_time + delay > self.max_elapsed:
+			logging.warning("Retry budget of {}s spent for {}.".format(self.max_elapsed, url))
+			return None
+		deadline = get_deadline()
+		if deadline and delay >= deadline.remaining():
+			logging.warning("Deadline reached for {}, not retrying.".format(url))
+			deadline.exceeded = True
+			return None
+		if not budget.try_retry():
+			logging.warning("Retry cap reached for upstream {}, not retrying.".format(transport.get_host(url)))
+			return None
+
+		logging.info("Max retries: {}, Retries left: {}, retrying in {:.2f}s ({}).".format(
+			max_attempts, max_attempts - attempt, delay, reason))
+		metrics.record_retry(transport.get_host(url), url, reason)
+		return delay
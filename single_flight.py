@@ -0,0 +1,132 @@
+"""
+Single-flight coalescing of identical concurrent upstream requests:
+callers with the same (method, url, payload) key share one in-flight
+request and its result instead of each hitting the upstream.
+"""
+
+import threading
+import asyncio
+import logging
+import json
+import os
+
+
+
+def request_key(method, url, payload=None):
+	"""
+	Normalized key for a request. JSON payloads (dicts or JSON strings)
+	are compared with sorted keys, so key order doesn't matter.
+	"""
+	if isinstance(payload, bytes):
+		payload = payload.decode("utf-8", errors="replace")
+	if isinstance(payload, str):
+		try:
+			payload = json.loads(payload)
+		except ValueError:
+			pass
+	try:
+		body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+	except TypeError:
+		body = repr(payload)
+	return (method.upper(), url, body)
+
+
+
+class Call:
+	"""
+	An in-flight sync call that followers wait on.
+	"""
+	def __init__(self):
+		self.event = threading.Event()
+		self.result = None
+		self.error = None
+
+
+
+class SingleFlight:
+	"""
+	Coalesces identical concurrent calls, for threads (do) and for
+	coroutines on the same event loop (async_do). Results are shared
+	as-is, so callers shouldn't mutate them (e.g., share the response
+	and parse its content per caller).
+	"""
+
+	def __init__(self):
+		self.enabled = os.environ.get('CTS_COALESCE_REQUESTS', 'true').lower() == 'true'
+		self.calls = {}  # key -> Call
+		self.tasks = {}  # (event loop, key) -> asyncio.Task
+		self.coalesced = 0  # calls that shared another call's request
+		self.lock = threading.Lock()
+
+	def do(self, key, fn):
+		"""
+		Returns fn(), or the result of an identical call already in flight.
+		"""
+		if not self.enabled:
+			return fn()
+
+		with self.lock:
+			call = self.calls.get(key)
+			is_leader = call is None
+			if is_leader:
+				call = Call()
+				self.calls[key] = call
+			else:
+				self.coalesced += 1
+
+		if not is_leader:
+			logging.info("Sharing in-flight request: {} {}".format(key[0], key[1]))
+			call.event.wait()
+			if call.error:
+				raise call.error
+			return call.result
+
+		try:
+			call.result = fn()
+		except Exception as e:
+			call.error = e
+			raise
+		finally:
+			with self.lock:
+				del self.calls[key]
+			call.event.set()
+		return call.result
+
+	async def async_do(self, key, coro_fn):
+		"""
+		Awaits coro_fn(), or an identical call already in flight on this
+		loop. The request runs as its own task, so a cancelled caller
+		doesn't cancel it for the others.
+		"""
+		if not self.enabled:
+			return await coro_fn()
+
+		loop = asyncio.get_running_loop()
+		task_key = (loop, key)
+		with self.lock:
+			task = self.tasks.get(task_key)
+			if task is None:
+				task = loop.create_task(coro_fn())
+				self.tasks[task_key] = task
+				task.add_done_callback(lambda t: self.forget(task_key, t))
+			else:
+				self.coalesced += 1
+				logging.info("Sharing in-flight request: {} {}".format(key[0], key[1]))
+		return await asyncio.shield(task)
+
+	def forget(self, task_key, task):
+		with self.lock:
+			if self.tasks.get(task_key) is task:
+				del self.tasks[task_key]
+
+	def reset_after_fork(self):
+		self.lock = threading.Lock()
+		self.calls = {}
+		self.tasks = {}
+
+
+
+single_flight = SingleFlight()  # shared by every calculator in the process
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=single_flight.reset_after_fork)
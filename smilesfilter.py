@@ -1,9 +1,27 @@
-import requests
 import json
 import logging
+import threading
 import os
 from .calculator import Calculator
 from .jchem_properties import Tautomerization, ElementalAnalysis
+from .http_transport import transport
+from .single_flight import single_flight, request_key
+from .tracing import tracer
+from .memory_cache import cache_from_env
+from .response_store import response_store
+from . import local_chem
+
+
+
+# filterSMILES results by (smiles, is_node), in front of the response store:
+filter_cache = cache_from_env("filterSMILES", "CTS_FILTER_CACHE", max_size=4096, ttl=24 * 3600)
+
+# local vs remote standardization agreement for CTS_STANDARDIZER_MODE=verify:
+standardizer_stats = {'verified': 0, 'differ': 0}
+standardizer_stats_lock = threading.Lock()
+
+# parseSmilesByCalculator's prepared smiles by (smiles, preparation):
+prep_cache = cache_from_env("parseSmilesByCalculator", "CTS_PREP_CACHE", max_size=4096, ttl=24 * 3600)
 
 
 
@@ -26,37 +44,58 @@ class SMILESFilter(object):
 		}
 		self.baseUrl = os.environ['CTS_EFS_SERVER']
 		self.is_valid_url = self.baseUrl + '/ctsws/rest/isvalidchemical'
+		self.filter_store_url = self.baseUrl + '/cts/filterSMILES'  # response store key for filterSMILES results
+		self.standardizer_mode = os.environ.get('CTS_STANDARDIZER_MODE', 'remote').lower()  # remote, local or verify (local checked against remote)
+		self.local_carbon_check = os.environ.get('CTS_LOCAL_CARBON_CHECK', 'true').lower() == 'true'  # uses rdkit if installed
 
 
 
 	def is_valid_smiles(self, smiles):
 		"""
 		Makes request to ctsws /isvalidchemical endpoint to check
-		if user smiles is valid. Returns boolean.
+		if user smiles is valid. Returns boolean. Raises if CTSWS
+		fails (non-200 or no "true"/"false" result), so the failure
+		isn't taken (and cached) as an invalid chemical.
 		"""
 		
 		logging.warning("VALID URL: {}".format(self.is_valid_url))
 		
-		is_valid_response = requests.post(self.is_valid_url, data=json.dumps({'structure': smiles}), headers={'Content-Type': 'application/json'}, timeout=10)
+		is_valid_response = single_flight.do(request_key("POST", self.is_valid_url, {'structure': smiles}),
+			lambda: transport.post(self.is_valid_url, data=json.dumps({'structure': smiles}), headers={'Content-Type': 'application/json'}, timeout=10))
 		
 		logging.warning("VALID RESPONSE: {}".format(is_valid_response))
 		
 		logging.warning("RESPONSE CONTENT: {}".format(is_valid_response.content))
 		
-		is_valid = json.loads(is_valid_response.content).get('result')  # result should be "true" or "false"
+		if is_valid_response.status_code != 200:
+			raise Exception("CTSWS isvalidchemical request was not successful ({}).".format(is_valid_response.status_code))
+
+		try:
+			is_valid = json.loads(is_valid_response.content).get('result')  # result should be "true" or "false"
+		except (ValueError, AttributeError) as e:
+			raise Exception("CTSWS isvalidchemical response not valid: {}".format(e))
+
 		if is_valid == "true":
 			return True
-		else:
+		elif is_valid == "false":
 			return False
+		else:
+			raise Exception("CTSWS isvalidchemical result not valid: {}".format(is_valid))
 
 
 
 	def check_for_carbon(self, smiles):
 		"""
-		Makes request to jchem_properties's ElementalAnalysis class,
-		which returns the composition of a chemical from JchemWS
-		elemental analysis endpoint.
+		Checks for a carbon atom locally with RDKit, or for SMILES
+		RDKit can't parse (or without rdkit), makes request to
+		jchem_properties's ElementalAnalysis class, which returns
+		the composition of a chemical from JchemWS elemental
+		analysis endpoint.
 		"""
+		if self.local_carbon_check:
+			has_carbon = local_chem.has_element(smiles, "C")
+			if has_carbon is not None:
+				return has_carbon
 
 		# Makes request to get chemical composition:
 		analysis_class = ElementalAnalysis()
@@ -111,23 +150,118 @@ class SMILESFilter(object):
 		"""
 		cts ws call to jchem to perform various
 		smiles processing before being sent to
-		p-chem calculators
+		p-chem calculators. Results (filtered smiles, or error
+		dicts like "salt or mixture") are memoized by smiles
+		and is_node in filter_cache and the response store.
+		Upstream failures raise and aren't memoized.
 		"""
-		calc_object = Calculator()
+		cache_key = (smiles, bool(is_node))
+		result = filter_cache.get(cache_key)
+		if result is not None:
+			return result
+		payload = {'smiles': smiles, 'is_node': bool(is_node)}
+		result = self.get_stored_result(payload)
+		if result is None:
+			result = self.run_filters(smiles, is_node)
+			if isinstance(result, (str, dict)) and result:
+				response_store.set(self.get_store_namespace(), self.filter_store_url, payload, json.dumps(result))
+		if isinstance(result, (str, dict)) and result:
+			filter_cache.set(cache_key, result)
+		return result
+
+
+
+	def get_store_namespace(self):
+		"""
+		Response store namespace for filterSMILES results. Changing
+		CTS_FILTERSMILES_MODEL_VERSION (e.g., after a standardizer
+		update) invalidates them.
+		"""
+		namespace = "filtersmiles:{}".format(os.environ.get('CTS_FILTERSMILES_MODEL_VERSION', "0"))
+		return namespace + ":local" if self.standardizer_mode == "local" else namespace
+
+
+
+	def get_stored_result(self, payload):
+		stored = response_store.get(self.get_store_namespace(), self.filter_store_url, payload)
+		if not stored:
+			return None
+		try:
+			return json.loads(stored[1])
+		except ValueError as e:
+			logging.warning("filterSMILES stored result exception: {}".format(e))
+			return None
+
+
 
+	def run_filters(self, smiles, is_node=False):
+		"""
+		Runs filterSMILES' checks and filters (uncached).
+		"""
 		# Performs carbon check (but not for transformation products):
-		if not is_node and not self.check_for_carbon(smiles):
-			return {'error': "CTS only accepts organic chemicals"}
+		if not is_node:
+			with tracer.span("carbon_check"):
+				has_carbon = self.check_for_carbon(smiles)
+			if not has_carbon:
+				return {'error': "CTS only accepts organic chemicals"}
 
 		# Checks SMILES for invalid characters:
 		if not self.check_smiles_against_exludestring(smiles):
 			return {'error': "Chemical cannot be a salt or mixture"}
 
 		# Calls CTSWS /isvalidchemical endpoint:
-		if not self.is_valid_smiles(smiles):
+		with tracer.span("validity_check"):
+			is_valid = self.is_valid_smiles(smiles)
+		if not is_valid:
 			logging.warning("User chemical contains metals, sending error to client..")
 			return {'error': "Chemical cannot contain metals"}
 
+		return self.standardize(smiles)
+
+
+
+	def standardize(self, smiles):
+		"""
+		Standardizes a valid SMILES with the standardizer_mode's engine:
+		  + remote - CTSWS and jchem (remote_standardize)
+		  + local - RDKit (local_chem.standardize), remote if RDKit can't
+		  + verify - remote, also running local and logging differences
+		"""
+		if self.standardizer_mode == "local":
+			with tracer.span("standardize_local"):
+				local_smiles = local_chem.standardize(smiles)
+			if local_smiles:
+				return local_smiles
+		final_smiles = self.remote_standardize(smiles)
+		if self.standardizer_mode == "verify":
+			self.verify_standardization(smiles, final_smiles)
+		return final_smiles
+
+
+
+	def verify_standardization(self, smiles, remote_smiles):
+		"""
+		Compares local standardization of a SMILES to the remote
+		result, counting agreement in standardizer_stats.
+		"""
+		local_smiles = local_chem.standardize(smiles)
+		agrees = local_smiles is not None and local_smiles == local_chem.canonicalize(remote_smiles)
+		with standardizer_stats_lock:
+			standardizer_stats['verified'] += 1
+			if not agrees:
+				standardizer_stats['differ'] += 1
+		if not agrees:
+			logging.warning("Local standardization of {} differs: {} (local) vs {} (remote)".format(smiles, local_smiles, remote_smiles))
+		return agrees
+
+
+
+	def remote_standardize(self, smiles):
+		"""
+		CTSWS and jchem standardization steps of filterSMILES.
+		"""
+		calc_object = Calculator()
+
 		# Updated approach (todo: more efficient to have CTSWS use major taut instead of canonical)
 		# 1. CTSWS actions "removeExplicitH" and "transform".
 		url = calc_object.efs_server_url + calc_object.efs_standardizer_endpoint
@@ -138,14 +272,16 @@ class SMILESFilter(object):
 				"transform"
 			]
 		}
-		response = calc_object.web_call(url, post_data)
+		with tracer.span("standardize", actions="removeExplicitH,transform"):
+			response = calc_object.web_call(url, post_data)
 
 		filtered_smiles = response['results'][-1] # picks last item, format: [filter1 smiles, filter1 + filter2 smiles]
 		
 		# 2. Get major tautomer from jchem:
 		taut_obj = Tautomerization()
 		taut_obj.postData.update({'calculationType': 'MAJOR'})
-		taut_obj.make_data_request(filtered_smiles, taut_obj)
+		with tracer.span("major_tautomer"):
+			taut_obj.make_data_request(filtered_smiles, taut_obj)
 
 		# todo: verify this is major taut result smiles, not original smiles for major taut request...
 		major_taut_smiles = None
@@ -166,7 +302,8 @@ class SMILESFilter(object):
 				"neutralize"
 			]
 		}
-		response = calc_object.web_call(url, post_data)
+		with tracer.span("standardize", actions="neutralize"):
+			response = calc_object.web_call(url, post_data)
 
 		final_smiles = response['results'][-1]
 
@@ -174,17 +311,17 @@ class SMILESFilter(object):
 
 
 
-	def checkMass(self, chemical):
+	def checkMass(self, chemical, struct_mass=None):
 		"""
 		returns true if chemical mass is less
-		than 1500 g/mol
+		than 1500 g/mol (struct_mass if it's already known)
 		"""
 		try:
-			json_obj = Calculator().getMass({'chemical': chemical}) # get mass from jchem ws
+			if struct_mass is None:
+				struct_mass = Calculator().get_mass(chemical)  # local mass, or from jchem ws
 		except Exception as e:
 			logging.warning("!!! Error in checkMass() {} !!!".format(e))
 			raise e
-		struct_mass = json_obj['data'][0]['mass']
 
 		if struct_mass < 1500  and struct_mass > 0:
 			return True
@@ -237,18 +374,103 @@ class SMILESFilter(object):
 
 	def parseSmilesByCalculator(self, structure, calculator):
 		"""
-		Calculator-dependent SMILES filtering!
+		Calculator-dependent SMILES filtering! The prepared
+		smiles (or "structure too large") are cached in prep_cache
+		by structure and the calculator's preparation (see
+		get_preparation), so e.g. epi, sparc and measured share one.
+		"""
+		prepared = self.get_prepared_smiles(structure, self.get_preparation(calculator))
+		if 'error' in prepared:
+			raise Exception(prepared['error'])
+		filtered_smiles = prepared['smiles']
+
+		# 4. Check for metals and stuff (square brackets):
+		if calculator == 'epi' or calculator == 'measured':
+			if '[' in filtered_smiles or ']' in filtered_smiles:
+				# bubble up to calc for handling error
+				# raise Exception("{} cannot process metals..".format(calculator))
+				raise Exception({'data': "cannot process metals or charges"})
+
+		return filtered_smiles
+
+
+
+	def parseSmilesListByCalculator(self, structures, calculator):
+		"""
+		parseSmilesByCalculator for a list of structures. Masses for
+		the uncached structures are computed in one pass (see
+		Calculator.get_masses). Returns a list with the filtered smiles
+		for each structure, or the Exception parseSmilesByCalculator
+		would have raised for it.
+		"""
+		preparation = self.get_preparation(calculator)
+		uncached = [structure for structure in dict.fromkeys(structures) if prep_cache.get((structure, preparation)) is None]
+		if uncached and preparation != "none":
+			try:
+				masses = Calculator().get_masses(uncached)
+			except Exception as e:
+				logging.warning("Error getting masses for parseSmilesListByCalculator: {}".format(e))
+				masses = [None] * len(uncached)  # checkMass gets each mass
+			for structure, mass in zip(uncached, masses):
+				try:
+					self.get_prepared_smiles(structure, preparation, mass)
+				except Exception as e:
+					logging.warning("Error preparing {} for {}: {}".format(structure, calculator, e))  # reported below
+		results = []
+		for structure in structures:
+			try:
+				results.append(self.parseSmilesByCalculator(structure, calculator))
+			except Exception as e:
+				results.append(e)
+		return results
+
+
+
+	def get_preparation(self, calculator):
+		"""
+		Returns the name of a calculator's SMILES preparation:
+		  + "none" - chemaxon uses the smiles as is
+		  + "destereo" - epi, sparc and measured: mass check, clear stereos, untransform
+		  + "mass" - the other calcs: mass check
+		"""
+		if calculator == 'chemaxon':
+			return "none"
+		if calculator == 'epi' or calculator == 'sparc' or calculator == 'measured':
+			return "destereo"
+		return "mass"
+
+
+
+	def get_prepared_smiles(self, structure, preparation, struct_mass=None):
+		"""
+		Returns {'smiles': prepared smiles} or {'error': ...} for a
+		structure and preparation, from prep_cache or prepare_smiles.
+		Filtering errors ('transient') aren't cached.
+		"""
+		cache_key = (structure, preparation)
+		prepared = prep_cache.get(cache_key)
+		if prepared is None:
+			prepared = self.prepare_smiles(structure, preparation, struct_mass)
+			if not prepared.get('transient'):
+				prep_cache.set(cache_key, prepared)
+		return prepared
+
+
+
+	def prepare_smiles(self, structure, preparation, struct_mass=None):
+		"""
+		Runs a preparation's filters (uncached).
 		"""
 		filtered_smiles = structure
 
 		#1. check structure mass..
-		if calculator != 'chemaxon':
-			if not self.checkMass(structure):
+		if preparation != "none":
+			if not self.checkMass(structure, struct_mass):
 				# raise "Structure too large, must be < 1500 g/mol.."
-				raise Exception({'data': "structure too large"})
+				return {'error': {'data': "structure too large"}}
 
 		#2-3. clear stereos from structure, untransform [N+](=O)[O-] >> N(=O)=O..
-		if calculator == 'epi' or calculator == 'sparc' or calculator == 'measured':
+		if preparation == "destereo":
 			try:
 				# clear stereoisomers:
 				filtered_smiles = self.clearStereos(structure)
@@ -258,13 +480,6 @@ class SMILESFilter(object):
 				filtered_smiles = str(self.untransformSMILES(filtered_smiles)[-1])
 			except Exception as e:
 				logging.warning("!!! Error in parseSmilesByCalculator() {} !!!".format(e))
-				raise {'data': "error filtering chemical"}
-
-		# 4. Check for metals and stuff (square brackets):
-		if calculator == 'epi' or calculator == 'measured':
-			if '[' in filtered_smiles or ']' in filtered_smiles:
-				# bubble up to calc for handling error
-				# raise Exception("{} cannot process metals..".format(calculator))
-				raise Exception({'data': "cannot process metals or charges"})
+				return {'error': {'data': "error filtering chemical"}, 'transient': True}
 
-		return filtered_smiles
+		return {'smiles': filtered_smiles}
@@ -0,0 +1,63 @@
+"""
+Compares local (RDKit) standardization with filterSMILES' remote
+(CTSWS and jchem) standardization over a corpus of SMILES, to see
+how often they agree before switching CTS_STANDARDIZER_MODE to local.
+
+Usage (corpus file has one SMILES per line):
+	python -m cts_calcs.standardizer_comparison corpus.txt [report.json]
+"""
+
+import logging
+import json
+import sys
+
+from .smilesfilter import SMILESFilter
+from . import local_chem
+
+
+
+def compare_standardizers(smiles_list, filter_obj=None):
+	"""
+	Standardizes each SMILES both ways. Returns a report with counts
+	(compared, agree, differ, local_failed, remote_failed), the
+	agreement rate and the differences.
+	"""
+	filter_obj = filter_obj or SMILESFilter()
+	report = {'total': len(smiles_list), 'compared': 0, 'agree': 0, 'differ': 0,
+		'local_failed': 0, 'remote_failed': 0, 'differences': []}
+	for smiles in smiles_list:
+		try:
+			remote_smiles = filter_obj.remote_standardize(smiles)
+		except Exception as e:
+			logging.warning("Remote standardization of {} failed: {}".format(smiles, e))
+			report['remote_failed'] += 1
+			continue
+		local_smiles = local_chem.standardize(smiles)
+		if local_smiles is None:
+			report['local_failed'] += 1
+			continue
+		report['compared'] += 1
+		if local_smiles == local_chem.canonicalize(remote_smiles):
+			report['agree'] += 1
+		else:
+			report['differ'] += 1
+			report['differences'].append({'smiles': smiles, 'local': local_smiles, 'remote': remote_smiles})
+	report['agreement'] = round(report['agree'] / report['compared'], 4) if report['compared'] else None
+	return report
+
+
+def main(argv):
+	with open(argv[1]) as corpus:
+		smiles_list = [line.split()[0] for line in corpus if line.strip() and not line.startswith("#")]
+	report = compare_standardizers(smiles_list)
+	if len(argv) > 2:
+		with open(argv[2], "w") as report_file:
+			json.dump(report, report_file, indent=2)
+	print("{agree}/{compared} agree ({agreement}), {local_failed} local and {remote_failed} remote failures".format(**report))
+	for difference in report['differences']:
+		print("{smiles}\tlocal: {local}\tremote: {remote}".format(**difference))
+
+
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,108 @@
+"""
+Runs a workflow's steps as a small dependency graph: steps whose
+dependencies are done run concurrently on a bounded thread pool
+(CTS_STEP_WORKERS), so a workflow takes about as long as its slowest
+chain of steps rather than the sum of them. Steps run in a copy of the
+caller's context, so tracing spans and deadlines carry over.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import contextvars
+import threading
+import os
+
+
+
+executor = None
+executor_lock = threading.Lock()
+
+
+
+def get_executor():
+	global executor
+	with executor_lock:
+		if executor is None:
+			executor = ThreadPoolExecutor(max_workers=int(os.environ.get('CTS_STEP_WORKERS', 8)), thread_name_prefix="cts-step")
+		return executor
+
+
+def reset_after_fork():
+	"""
+	Pool threads don't survive a fork, so child processes
+	(e.g., celery prefork workers) start their own pool.
+	"""
+	global executor, executor_lock
+	executor = None
+	executor_lock = threading.Lock()
+
+
+def run_step_graph(steps):
+	"""
+	Runs steps, {name: (function, [dependency names])}, where a step's
+	function is called with its dependencies' results. Returns
+	{name: result}. If a step raises, steps that haven't started are
+	cancelled and the exception is raised.
+
+	One ready step always runs in the calling thread, so the graph
+	makes progress even when every pool thread is busy.
+	"""
+	pending = dict(steps)
+	results = {}
+	futures = {}
+	while pending or futures:
+		ready = [name for name, (function, dependencies) in pending.items() if all(dependency in results for dependency in dependencies)]
+		if ready:
+			for name in ready[:-1]:
+				function, dependencies = pending.pop(name)
+				args = [results[dependency] for dependency in dependencies]
+				futures[get_executor().submit(contextvars.copy_context().run, function, *args)] = name
+			name = ready[-1]
+			function, dependencies = pending.pop(name)
+			try:
+				results[name] = function(*[results[dependency] for dependency in dependencies])
+			except Exception:
+				cancel(futures)
+				raise
+			continue
+		if not futures:
+			raise ValueError("Steps with missing dependencies: {}".format(", ".join(pending)))
+		done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+		for future in done:
+			name = futures.pop(future)
+			try:
+				results[name] = future.result()
+			except Exception:
+				cancel(futures)
+				raise
+	return results
+
+
+def run_each(function, items, max_workers):
+	"""
+	Calls function on each item, on a pool of at most max_workers
+	threads (each call in a copy of the caller's context). Returns
+	results in item order, with an item's exception in place of its
+	result. The pool is separate from the step pool, so the calls
+	can run step graphs themselves.
+	"""
+	if not items:
+		return []
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="cts-each") as pool:
+		futures = [pool.submit(contextvars.copy_context().run, function, item) for item in items]
+	results = []
+	for future in futures:
+		try:
+			results.append(future.result())
+		except Exception as e:
+			results.append(e)
+	return results
+
+
+def cancel(futures):
+	for future in futures:
+		future.cancel()
+
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=reset_after_fork)
@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+import os
+import datetime
+import sys
+import requests
+from unittest.mock import Mock, AsyncMock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.async_transport import AsyncHTTPTransport, AsyncResponse, run_async
+	from qed.cts_celery.cts_calcs.retry_policy import RetryPolicy
+	from qed.cts_celery.cts_calcs.circuit_breaker import CircuitBreaker, breakers
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.async_transport import AsyncHTTPTransport, AsyncResponse, run_async
+	from qed.cts_app.cts_calcs.retry_policy import RetryPolicy
+	from qed.cts_app.cts_calcs.circuit_breaker import CircuitBreaker, breakers
+
+
+
+class TestAsyncTransport(unittest.TestCase):
+	"""
+	Unit test class for the async http transport module.
+	"""
+
+	print("cts async_transport unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for async transport unit tests.
+		"""
+		self.transport = AsyncHTTPTransport()
+		self.url = "http://localhost:8080/episuiteapi/rest/episuite/estimated"
+
+	def test_run_async(self):
+		"""
+		Testing that sync callers reuse the background event loop.
+		"""
+		print(">>> Running async_transport run_async unit test..")
+		async def get_loop():
+			return asyncio.get_running_loop()
+		self.assertIs(run_async(get_loop()), run_async(get_loop()))
+
+	def test_async_response(self):
+		"""
+		Testing the requests.Response-like parts of AsyncResponse.
+		"""
+		print(">>> Running async_transport AsyncResponse unit test..")
+		response = AsyncResponse(self.url, 200, b'{"test": true}')
+		self.assertEqual(response.json(), {"test": True})
+		self.assertEqual(response.text, '{"test": true}')
+
+	def test_timeout_error(self):
+		"""
+		Testing that aiohttp timeouts are raised as requests Timeouts.
+		"""
+		print(">>> Running async_transport timeout unit test..")
+		with patch.object(self.transport, 'send', new_callable=AsyncMock) as send_mock:
+			send_mock.side_effect = asyncio.TimeoutError()
+			with self.assertRaises(requests.exceptions.Timeout):
+				run_async(self.transport.post(self.url, data="{}", timeout=1))
+
+	def test_async_execute(self):
+		"""
+		Testing retry_policy's async_execute with invalid 200 responses.
+		"""
+		print(">>> Running retry_policy async_execute unit test..")
+		policy = RetryPolicy(base_delay=0.0, max_delay=0.0)
+		send_mock = AsyncMock(side_effect=[Mock(status_code=503), Mock(status_code=200)])
+		response = run_async(policy.async_execute(self.url, send_mock, lambda r: r.status_code == 200, max_attempts=3))
+		self.assertEqual(send_mock.await_count, 2)
+		self.assertEqual(response.status_code, 200)
+
+	def test_cancelled_half_open_trial(self):
+		"""
+		Testing that a cancelled half-open trial call frees its slot,
+		so the next request is let through.
+		"""
+		print(">>> Running async_transport cancelled trial unit test..")
+		breaker = CircuitBreaker("localhost:8080", open_seconds=0)
+		breaker.trip()
+		async def cancelled_post():
+			task = asyncio.ensure_future(self.transport.post(self.url, data="{}", timeout=1))
+			await asyncio.sleep(0.01)
+			task.cancel()
+			with self.assertRaises(asyncio.CancelledError):
+				await task
+		async def slow_send(*args, **kwargs):
+			await asyncio.sleep(1)
+		with patch.object(breakers, 'enabled', True), patch.object(breakers, 'get', return_value=breaker), \
+				patch.object(self.transport, 'send', side_effect=slow_send):
+			run_async(cancelled_post())
+		self.assertEqual(breaker.get_state(), CircuitBreaker.HALF_OPEN)
+		self.assertTrue(breaker.allow_request())
@@ -6,7 +6,7 @@ import datetime
 import logging
 import sys
 from tabulate import tabulate
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
 
 _path = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(
@@ -83,8 +83,8 @@ class TestChemaxonCalculator(unittest.TestCase):
 
 
 
-	@patch('qed.cts_app.cts_calcs.calculator_chemaxon.requests.post')
-	@patch('qed.cts_app.cts_calcs.calculator_chemaxon.JchemProperty.getJchemPropData')
+	@patch('qed.cts_app.cts_calcs.calculator_chemaxon.transport.post')
+	@patch('qed.cts_app.cts_calcs.calculator_chemaxon.JchemProperty.async_getJchemPropData', new_callable=AsyncMock)
 	@patch('qed.cts_app.cts_calcs.calculator_chemaxon.SMILESFilter.parseSmilesByCalculator')
 	def test_data_request_handler(self, smiles_filter_mock, pchem_mock, speciation_mock):
 		"""
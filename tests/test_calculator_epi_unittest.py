@@ -7,7 +7,7 @@ import logging
 import sys
 import requests
 from tabulate import tabulate
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
 
 _path = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(
@@ -144,7 +144,7 @@ class TestEpiCalculator(unittest.TestCase):
 
 		expected_result = {'test': True} # expected function result
 
-		with patch('qed.cts_app.cts_calcs.calculator_epi.EpiCalc.request_logic') as service_mock:
+		with patch('qed.cts_app.cts_calcs.calculator_epi.EpiCalc.async_request_logic', new_callable=AsyncMock) as service_mock:
 			service_mock.return_value = expected_result
 			response = self.calc_obj.makeDataRequest(self.test_smiles, "epi")
 
@@ -162,7 +162,7 @@ class TestEpiCalculator(unittest.TestCase):
 
 
 	@patch('qed.cts_app.cts_calcs.calculator_epi.EpiCalc.validate_response')
-	@patch('qed.cts_app.cts_calcs.calculator_epi.requests.post')	
+	@patch('qed.cts_app.cts_calcs.calculator.async_transport.post', new_callable=AsyncMock)
 	def test_request_logic(self, request_mock, validate_mock):
 		"""
 		Testing EPI Suite's request_logic function.
@@ -190,7 +190,7 @@ class TestEpiCalculator(unittest.TestCase):
 
 
 
-	@patch('qed.cts_app.cts_calcs.calculator_epi.EpiCalc.makeDataRequest')
+	@patch('qed.cts_app.cts_calcs.calculator_epi.EpiCalc.async_makeDataRequest', new_callable=AsyncMock)
 	@patch('qed.cts_app.cts_calcs.calculator_epi.SMILESFilter.parseSmilesByCalculator')
 	def test_data_request_handler(self, smiles_filter_mock, request_mock):
 		"""
@@ -223,4 +223,27 @@ class TestEpiCalculator(unittest.TestCase):
 			print(inspect.currentframe().f_code.co_name)
 			print(tabulate(tab, headers='keys', tablefmt='rst'))
 			
-		return
\ No newline at end of file
+		return
+
+
+	@patch('qed.cts_app.cts_calcs.calculator.async_transport.post', new_callable=AsyncMock)
+	def test_request_logic_not_json(self, request_mock):
+		"""
+		Testing that a 200 without a json body is retried, and that
+		request_logic returns "calc server not found" if none is json.
+		"""
+
+		print(">>> Running calculator_epi request_logic non-json unit test..")
+
+		self.calc_obj.retry_policy.base_delay, self.calc_obj.retry_policy.max_delay = 0.0, 0.0
+		html_response = Mock(status_code=200, content=b"<html>Service Unavailable</html>", from_store=False)
+		json_response = Mock(status_code=200, content=b'{"data": []}', from_store=False)
+
+		request_mock.side_effect = [html_response, json_response]
+		self.assertEqual(self.calc_obj.request_logic("http://localhost:8080/epi", {'structure': "CCO"}), {'data': []})
+
+		request_mock.side_effect = None
+		request_mock.return_value = html_response
+		self.assertEqual(self.calc_obj.request_logic("http://localhost:8080/epi", {'structure': "CC"}), "calc server not found")
+
+		return
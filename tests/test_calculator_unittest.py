@@ -235,6 +235,39 @@ class TestCalculators(unittest.TestCase):
 
 
 
+	def test_smilesToImages(self):
+		"""
+		Testing calculator module's smilesToImages function, which batches
+		smilesToImage requests to JchemWS by image parameters.
+		"""
+
+		print(">>> Running calculator smilesToImages unit test..")
+
+		image_data = self.get_example_result_json("smiles_to_image")['data'][0]
+
+		def batch_response(url, request):
+			return {'data': [image_data for structure in request['structures']], 'valid': True}
+
+		request_objs = [
+			{'smiles': "CCO", 'scale': 50, 'type': "svg"},
+			{'smiles': "CCC", 'scale': 50, 'type': "svg"},
+			{'smiles': "CCO", 'scale': 50, 'type': "svg"},  # duplicate
+			{'smiles': "CCO", 'scale': 50}  # png
+		]
+
+		with patch('qed.cts_app.cts_calcs.calculator.image_cache.memory.enabled', False), \
+				patch('qed.cts_app.cts_calcs.calculator.Calculator.web_call') as service_mock:
+			service_mock.side_effect = batch_response
+			self.calc_obj.image_batch_size = 50
+			response = self.calc_obj.smilesToImages(request_objs)
+
+		self.assertEqual(len(response), 4)
+		self.assertEqual(service_mock.call_count, 2)  # one request per image type
+		self.assertEqual(len(service_mock.call_args_list[0][0][1]['structures']), 2)
+		self.assertEqual(response[0], {'data': [image_data], 'valid': True})
+
+
+
 	def test_convertToSMILES(self):
 		"""
 		Testing calculator module's convertToSmiles function, which calls
@@ -351,7 +384,7 @@ class TestCalculators(unittest.TestCase):
 		expected_response = {'type': "smiles"}  # expected response from test function
 
 		# Testing function with a mock of requests.post, which is used by test function:
-		with patch('qed.cts_app.cts_calcs.calculator.requests.post') as service_mock:
+		with patch('qed.cts_app.cts_calcs.calculator.transport.post') as service_mock:
 
 			# Sets requests.post mock to return expected response content when test function calls it:
 			service_mock.return_value.content = json.dumps(expected_json)
@@ -461,7 +494,7 @@ class TestCalculators(unittest.TestCase):
 		expected_response = {'test': True}  # expected response from test function
 
 		# Testing function with a mock of requests.post, which is used by test function:
-		with patch('qed.cts_app.cts_calcs.calculator.requests.post') as service_mock:
+		with patch('qed.cts_app.cts_calcs.calculator.transport.post') as service_mock:
 
 			# Sets requests.post mock to return expected response content when test function calls it:
 			service_mock.return_value.content = json.dumps(mock_object)
@@ -0,0 +1,92 @@
+import unittest
+import os
+import datetime
+import sys
+import time
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.cas_cache import CASCache
+	from qed.cts_celery.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_celery.cts_calcs import chemical_information
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.cas_cache import CASCache
+	from qed.cts_app.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_app.cts_calcs import chemical_information
+
+
+
+class TestCASCache(unittest.TestCase):
+	"""
+	Unit test class for the cactus CAS lookup cache.
+	"""
+
+	print("cts cas_cache unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for CAS cache unit tests.
+		"""
+		self.cache = CASCache()
+		self.cache.ttls = {'hit': 60, 'miss': 60, 'error': 60}
+
+	def expire(self, smiles):
+		entry = self.cache.memo.get(smiles)
+		entry['expires'] = time.time() - 1
+		self.cache.memo.set(smiles, entry)
+
+	def test_ttls(self):
+		"""
+		Testing that hits, misses and errors are cached, and that an
+		error doesn't replace an expired hit's CAS.
+		"""
+		print(">>> Running cas_cache TTL unit test..")
+		lookup = Mock(side_effect=[("hit", "64-17-5"), ("miss", "N/A"), ("error", "N/A")])
+		self.assertEqual(self.cache.get("CCO", lookup), "64-17-5")
+		self.assertEqual(self.cache.get("CCO", lookup), "64-17-5")
+		self.assertEqual(self.cache.get("XX", lookup), "N/A")
+		self.assertEqual(self.cache.get("XX", lookup), "N/A")
+		self.assertEqual(lookup.call_count, 2)
+		self.expire("CCO")
+		self.assertEqual(self.cache.get("CCO", lookup), "64-17-5")  # cactus error
+		self.assertEqual(lookup.call_count, 3)
+		self.assertEqual(self.cache.memo.get("CCO")['status'], "hit")
+
+	def test_background_refresh(self):
+		"""
+		Testing that expired answers are returned without waiting on
+		the lookup, which runs once in the background.
+		"""
+		print(">>> Running cas_cache background refresh unit test..")
+		self.cache.background_refresh = True
+		self.cache.get("CCO", lambda smiles: ("miss", "N/A"))
+		self.expire("CCO")
+		def slow_lookup(smiles):
+			time.sleep(0.2)
+			return "hit", "64-17-5"
+		lookup = Mock(side_effect=slow_lookup)
+		start = time.time()
+		self.assertEqual(self.cache.get("CCO", lookup), "N/A")
+		self.assertEqual(self.cache.get("CCO", lookup), "N/A")
+		self.assertLess(time.time() - start, 0.1)
+		self.cache.executor.shutdown(wait=True)
+		self.assertEqual(lookup.call_count, 1)
+		self.assertEqual(self.cache.get("CCO", lookup), "64-17-5")
+
+	def test_request_cas(self):
+		"""
+		Testing cactus responses' statuses.
+		"""
+		print(">>> Running chemical_information request_cas unit test..")
+		chem_info = ChemInfo()
+		responses = [Mock(status_code=200, content=b"64-17-5\n8000-16-2"), Mock(status_code=404, content=b""), Mock(status_code=500, content=b"")]
+		with patch.object(chemical_information.transport, 'get', side_effect=responses):
+			self.assertEqual(chem_info.request_cas("CCO"), ("hit", "64-17-5, 8000-16-2"))
+			self.assertEqual(chem_info.request_cas("XX"), ("miss", "N/A"))
+			self.assertEqual(chem_info.request_cas("CCO"), ("error", "N/A"))
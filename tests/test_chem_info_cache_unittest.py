@@ -0,0 +1,184 @@
+import unittest
+import os
+import datetime
+import sys
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.chem_info_cache import ChemInfoCache
+	from qed.cts_celery.cts_calcs.mongodb_handler import MongoDBHandler
+	from qed.cts_celery.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_celery.cts_calcs import chemical_information
+	from qed.cts_celery.cts_calcs.cas_cache import CASCache
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_celery.cts_calcs.ccte import CCTE
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.chem_info_cache import ChemInfoCache
+	from qed.cts_app.cts_calcs.mongodb_handler import MongoDBHandler
+	from qed.cts_app.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_app.cts_calcs import chemical_information
+	from qed.cts_app.cts_calcs.cas_cache import CASCache
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_app.cts_calcs.ccte import CCTE
+
+
+
+class FakeCollection:
+	"""
+	Dict-backed stand-in for the pymongo collection calls the handler makes.
+	"""
+	def __init__(self):
+		self.documents = {}
+		self.indexes = []
+		self.finds = 0
+
+	def find_one(self, query):
+		self.finds += 1
+		return self.documents.get(query['_id'])
+
+	def replace_one(self, query, document, upsert=False):
+		self.documents[query['_id']] = document
+
+	def create_index(self, key, **kwargs):
+		self.indexes.append((key, kwargs))
+
+
+
+class TestChemInfoCache(unittest.TestCase):
+	"""
+	Unit test class for the get_cheminfo results cache.
+	"""
+
+	print("cts chem_info_cache unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for chem info cache unit tests.
+		"""
+		self.db_handler = MongoDBHandler()
+		self.db_handler.chem_info_collection = FakeCollection()
+		self.db_handler.chem_info_extra_collection = FakeCollection()
+		self.db_handler.is_connected = True
+		self.cache = ChemInfoCache(db_handler=self.db_handler)
+		self.cache.db_enabled = True
+		self.molecule_obj = {
+			'chemical': "CCO", 'smiles': "CCO", 'mass': 46.069, 'dtxsid': "DTXSID9020584",
+			'structureData': "<cml/>", 'node_image': '<img id="m1">',
+			'popup_image': '<div id="7_div"><img id="7"><table id="7_table"></table></div>'
+		}
+
+	def test_write_through(self):
+		"""
+		Testing that bulky fields are stored in the extra collection,
+		and that db documents are read back into the memory cache.
+		"""
+		print(">>> Running chem_info_cache write-through unit test..")
+		request_post = {'chemical': " CCO ", 'is_node': True, 'id': "7"}
+		self.cache.set(request_post, {'status': True, 'data': self.molecule_obj})
+		key = self.cache.get_key("CCO", True)
+		document = self.db_handler.chem_info_collection.documents[key]
+		self.assertNotIn('structureData', document['data'])
+		self.assertNotIn('popup_image', document['data'])
+		self.assertEqual(document['data']['dtxsid'], "DTXSID9020584")
+		self.assertEqual(set(self.db_handler.chem_info_extra_collection.documents[key]['data']), {'structureData', 'node_image', 'popup_image'})
+		self.assertIsNone(self.cache.get({'chemical': "CCO", 'is_node': False}))
+		self.cache.memory.clear()
+		result = self.cache.get({'chemical': "CCO", 'is_node': True, 'id': "12"})
+		self.assertEqual(result['popup_image'], '<div id="12_div"><img id="12"><table id="12_table"></table></div>')
+		self.assertEqual(result['node_image'], '<img id="m1">')
+		self.assertEqual(self.cache.get_stats()['size'], 1)
+
+	def test_extra_fields(self):
+		"""
+		Testing that the extra collection is only read for requests
+		that need its fields.
+		"""
+		print(">>> Running chem_info_cache extra fields unit test..")
+		request_post = {'chemical': "CCO"}
+		self.cache.set(request_post, {'status': True, 'data': self.molecule_obj})
+		extra_collection = self.db_handler.chem_info_extra_collection
+		self.cache.memory.clear()
+		result = self.cache.get(request_post)
+		self.assertEqual(result['dtxsid'], "DTXSID9020584")
+		self.assertNotIn('structureData', result)
+		self.assertEqual(extra_collection.finds, 0)
+		result = self.cache.get({'chemical': "CCO", 'get_structure_data': True})
+		self.assertEqual(result['structureData'], "<cml/>")
+		self.assertEqual(extra_collection.finds, 1)
+		self.cache.get({'chemical': "CCO", 'get_structure_data': True})
+		self.cache.get(request_post)
+		self.assertEqual(extra_collection.finds, 1)
+
+	def test_skipped_responses(self):
+		"""
+		Testing that failed and partial responses aren't cached, and
+		that db errors are treated as misses.
+		"""
+		print(">>> Running chem_info_cache skipped responses unit test..")
+		request_post = {'chemical': "CCO"}
+		self.cache.set(request_post, {'status': False, 'error': "Cannot process chemical"})
+		self.cache.set(request_post, {'status': True, 'data': self.molecule_obj, 'deadline_exceeded': True})
+		self.assertIsNone(self.cache.get(request_post))
+		self.assertEqual(self.db_handler.chem_info_collection.documents, {})
+		with patch.object(FakeCollection, 'find_one', side_effect=Exception("db down")):
+			self.assertIsNone(self.cache.get(request_post))
+
+	def test_get_cheminfo(self):
+		"""
+		Testing that get_cheminfo builds a chemical's info once.
+		"""
+		print(">>> Running chem_info get_cheminfo cache unit test..")
+		response_obj = {'status': True, 'data': self.molecule_obj}
+		with patch.object(chemical_information, 'chem_info_cache', self.cache), \
+				patch.object(ChemInfo, 'build_cheminfo', return_value=response_obj) as build_mock:
+			chem_info = ChemInfo()
+			chem_info.get_cheminfo({'chemical': "CCO", 'id': "7"})
+			result = chem_info.get_cheminfo({'chemical': "CCO", 'id': "7"})
+			chem_info.get_cheminfo({'chemical': "CCO"}, only_dsstox=True)
+		self.assertEqual(build_mock.call_count, 2)  # only_dsstox isn't cached
+		self.assertTrue(result['status'])
+		self.assertEqual(result['data']['popup_image'], self.molecule_obj['popup_image'])
+
+	def test_partial_responses(self):
+		"""
+		Testing that responses missing data because a CCTE or CAS lookup
+		failed aren't cached, while not-found data is.
+		"""
+		print(">>> Running chem_info_cache partial responses unit test..")
+		molecule_obj = {'chemical': "CCO", 'smiles': "CCO", 'preferredName': "Ethanol"}
+		ccte_results = {'calc': "actorws", 'prop': "dsstox", 'data': {'dtxsid': "DTXSID9020584"}}
+		chem_info = ChemInfo()
+		chem_info.local_chemical_type = False
+		def get_cheminfo(search_mock, cas_result):
+			with patch.object(chemical_information, 'chem_info_cache', self.cache), \
+					patch.object(chemical_information, 'cas_cache', CASCache()), \
+					patch.object(Calculator, 'get_chemical_type', return_value={'type': "smiles"}), \
+					patch.object(ChemInfo, 'check_structure_request', return_value={'valid': True}), \
+					patch.object(ChemInfo, 'smiles_name_check', return_value=None), \
+					patch.object(SMILESFilter, 'filterSMILES', return_value="CCO"), \
+					patch.object(ChemInfo, 'get_molecule', side_effect=lambda *args: dict(molecule_obj)), \
+					patch.object(ChemInfo, 'get_has_carbon', return_value=True), \
+					patch.object(ChemInfo, 'request_cas', return_value=cas_result), \
+					patch.object(CCTE, 'make_search_request', search_mock):
+				return chem_info.get_cheminfo({'chemical': "CCO"})
+		response_obj = get_cheminfo(Mock(side_effect=Exception("ccte down")), ("hit", "64-17-5"))
+		self.assertTrue(response_obj['status'])
+		self.assertTrue(response_obj['partial'])
+		self.assertEqual(response_obj['data']['dtxsid'], "N/A")
+		response_obj = get_cheminfo(Mock(return_value=False), ("hit", "64-17-5"))
+		self.assertTrue(response_obj['partial'])
+		response_obj = get_cheminfo(Mock(return_value=ccte_results), ("error", "N/A"))
+		self.assertTrue(response_obj['partial'])
+		self.assertIsNone(self.cache.get({'chemical': "CCO"}))
+		self.assertEqual(self.db_handler.chem_info_collection.documents, {})
+		response_obj = get_cheminfo(Mock(return_value={'status': False, 'status_code': 404}), ("miss", "N/A"))
+		self.assertNotIn('partial', response_obj)
+		self.assertEqual(self.cache.get({'chemical': "CCO"})['dtxsid'], "N/A")
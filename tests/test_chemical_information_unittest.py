@@ -0,0 +1,135 @@
+import unittest
+import os
+import datetime
+import sys
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_celery.cts_calcs.chem_info_cache import ChemInfoCache
+	from qed.cts_celery.cts_calcs.actorws import CCTE_EPA
+	from qed.cts_celery.cts_calcs.ccte import CCTE
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_celery.cts_calcs import local_chem
+	from qed.cts_celery.cts_calcs import chemical_information
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.chemical_information import ChemInfo
+	from qed.cts_app.cts_calcs.chem_info_cache import ChemInfoCache
+	from qed.cts_app.cts_calcs.actorws import CCTE_EPA
+	from qed.cts_app.cts_calcs.ccte import CCTE
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_app.cts_calcs import local_chem
+	from qed.cts_app.cts_calcs import chemical_information
+
+
+
+class TestChemInfo(unittest.TestCase):
+	"""
+	Unit test class for the chemical information module.
+	"""
+
+	print("cts chemical_information unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for chemical information unit tests.
+		"""
+		self.chem_info = ChemInfo()
+		self.chem_info.ccte_batch_size = 2
+		self.cache = ChemInfoCache()
+		self.cache.db_enabled = False
+
+	def build_cheminfo(self, request_post, only_dsstox=False, skip_ccte=False):
+		"""
+		Stands in for build_cheminfo, with the preferred name as the chemical.
+		"""
+		if request_post['chemical'] == "bad":
+			raise ValueError("jchem error")
+		molecule_obj = {'chemical': request_post['chemical'], 'preferredName': request_post['chemical'].title()}
+		return {'status': True, 'data': self.chem_info.add_dsstox_data(molecule_obj, {}), 'request_post': request_post}
+
+	def test_get_cheminfo_batch(self):
+		"""
+		Testing that DSSTOX data is looked up in chunked batch searches.
+		"""
+		print(">>> Running chemical_information get_cheminfo_batch unit test..")
+		batch_results = {'Aspirin': {'dtxsid': "DTXSID5020108", 'casrn': "50-78-2"}, 'Caffeine': {'dtxsid': "DTXSID0020232"}}
+		def get_batch_results(chemicals, identifier_type="CHEMICAL_NAME"):
+			return {chemical: batch_results[chemical] for chemical in chemicals if chemical in batch_results}
+		with patch.object(chemical_information, 'chem_info_cache', self.cache), \
+				patch.object(ChemInfo, 'build_cheminfo', side_effect=self.build_cheminfo) as build_mock, \
+				patch.object(CCTE_EPA, 'get_batch_results', side_effect=get_batch_results) as batch_mock, \
+				patch.object(CCTE, 'make_search_request') as search_mock:
+			responses = self.chem_info.get_cheminfo_batch(["aspirin", "caffeine", "bad", "water", "aspirin"])
+			self.chem_info.get_cheminfo_batch(["aspirin"])
+		self.assertEqual(batch_mock.call_count, 2)  # 3 unique names in chunks of 2
+		self.assertEqual(search_mock.call_count, 0)
+		self.assertEqual(build_mock.call_count, 5)  # last batch's aspirin cached
+		self.assertTrue(all(call[1]['skip_ccte'] for call in build_mock.call_args_list))
+		self.assertEqual(responses[0]['data']['dtxsid'], "DTXSID5020108")
+		self.assertEqual(responses[0]['data']['casrn'], "50-78-2")
+		self.assertEqual(responses[1]['data']['casrn'], "N/A")
+		self.assertFalse(responses[2]['status'])
+		self.assertEqual(responses[3]['data']['dtxsid'], "N/A")
+
+	def test_batch_fallback(self):
+		"""
+		Testing single CCTE searches when the batch endpoint fails.
+		"""
+		print(">>> Running chemical_information batch fallback unit test..")
+		search_results = {'calc': "actorws", 'prop': "dsstox", 'data': {'dtxsid': "DTXSID5020108"}}
+		with patch.object(CCTE_EPA, 'get_batch_results', return_value=None), \
+				patch.object(CCTE, 'make_search_request', return_value=search_results) as search_mock:
+			results = self.chem_info.get_batch_dsstox_results(["Aspirin", "N/A", None, "Aspirin"])
+		self.assertEqual(search_mock.call_count, 1)
+		self.assertEqual(results, {'Aspirin': {'dtxsid': "DTXSID5020108"}})
+
+	def test_ccte_epa_batch_results(self):
+		"""
+		Testing that CCTE batch rows are matched to searched chemicals.
+		"""
+		print(">>> Running actorws CCTE_EPA get_batch_results unit test..")
+		rows = [
+			{'input': "ASPIRIN", 'foundBy': "Approved Name", 'dtxsid': "DTXSID5020108", 'dtxcid': "DTXCID", 'casrn': "50-78-2", 'preferredName': "Aspirin"},
+			{'input': "water", 'foundBy': "NO_MATCH", 'dtxsid': None}
+		]
+		with patch.object(CCTE_EPA, '_make_request', return_value=rows) as request_mock:
+			results = CCTE_EPA().get_batch_results(["aspirin", "water"])
+		self.assertEqual(request_mock.call_args[0][1]['searchItems'], "aspirin\nwater")
+		self.assertEqual(request_mock.call_args[1]['timeout'], CCTE_EPA().batch_timeout)
+		self.assertEqual(results, {'aspirin': {'dtxsid': "DTXSID5020108", 'casrn': "50-78-2", 'preferredName': "Aspirin"}})
+		with patch.object(CCTE_EPA, '_make_request', side_effect=Exception("ACTORWS request was not successful.")):
+			self.assertIsNone(CCTE_EPA().get_batch_results(["aspirin"]))
+
+	@unittest.skipIf(not local_chem.is_available(), "rdkit not installed")
+	def test_local_chemical_type(self):
+		"""
+		Testing that clean SMILES skip jchem's type, structure and name
+		checks, and that ambiguous ones don't.
+		"""
+		print(">>> Running chemical_information local chemical type unit test..")
+		self.chem_info.local_chemical_type = True
+		filter_error = {'error': "stop after type checks"}
+		with patch.object(Calculator, 'get_chemical_type', return_value={'type': "smiles"}) as type_mock, \
+				patch.object(ChemInfo, 'check_structure_request', return_value={'valid': True}) as check_mock, \
+				patch.object(ChemInfo, 'smiles_name_check', return_value=None) as name_mock, \
+				patch.object(SMILESFilter, 'filterSMILES', return_value=filter_error) as filter_mock:
+			self.chem_info.build_cheminfo({'chemical': "CC(=O)Oc1ccccc1C(=O)O"})
+			self.assertEqual((type_mock.call_count, check_mock.call_count, name_mock.call_count), (0, 0, 0))
+			self.chem_info.build_cheminfo({'chemical': "CCO"})  # letters only, could be a name
+			self.assertEqual((type_mock.call_count, check_mock.call_count, name_mock.call_count), (0, 0, 1))
+			self.chem_info.build_cheminfo({'chemical': "ccc"})
+			self.assertEqual((type_mock.call_count, check_mock.call_count, name_mock.call_count), (1, 1, 2))
+		self.assertEqual(filter_mock.call_args_list[0][0][0], "CC(=O)Oc1ccccc1C(=O)O")
+		search_results = {'calc': "actorws", 'prop': "dsstox", 'data': {'dtxsid': "DTXSID5020108", 'smiles': "CC(=O)OC1=CC=CC=C1C(O)=O"}}
+		with patch.object(CCTE, 'make_search_request', return_value=search_results) as search_mock:
+			self.assertEqual(self.chem_info.get_local_chemical_type("dtxsid5020108"), ("CC(=O)OC1=CC=CC=C1C(O)=O", "smiles"))
+		self.assertEqual(search_mock.call_args[0][0], "DTXSID5020108")
@@ -0,0 +1,87 @@
+import unittest
+import os
+import datetime
+import sys
+import requests
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.circuit_breaker import CircuitBreaker, CircuitOpenError, is_failure, breakers
+	from qed.cts_celery.cts_calcs.http_transport import HTTPTransport
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.circuit_breaker import CircuitBreaker, CircuitOpenError, is_failure, breakers
+	from qed.cts_app.cts_calcs.http_transport import HTTPTransport
+
+
+
+class TestCircuitBreaker(unittest.TestCase):
+	"""
+	Unit test class for the per-upstream circuit breakers.
+	"""
+
+	print("cts circuit_breaker unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for circuit breaker unit tests.
+		"""
+		self.breaker = CircuitBreaker("http://localhost:8080", failure_rate=0.5, min_calls=4, window_size=10, open_seconds=30)
+
+	def test_opens_on_failure_rate(self):
+		"""
+		Testing that the breaker opens once the failure rate is reached.
+		"""
+		print(">>> Running circuit_breaker failure rate unit test..")
+		self.breaker.record_success()
+		self.breaker.record_failure()
+		self.breaker.record_success()
+		self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+		self.breaker.record_failure()
+		self.assertEqual(self.breaker.get_state(), CircuitBreaker.OPEN)
+		self.assertFalse(self.breaker.allow_request())
+
+	def test_half_open(self):
+		"""
+		Testing half-open trial calls after the open period.
+		"""
+		print(">>> Running circuit_breaker half-open unit test..")
+		self.breaker.open_seconds = 0
+		self.breaker.trip()
+		self.assertTrue(self.breaker.allow_request())  # trial call
+		self.assertEqual(self.breaker.get_state(), CircuitBreaker.HALF_OPEN)
+		self.assertFalse(self.breaker.allow_request())  # only one trial at a time
+		self.breaker.record_success()
+		self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+
+	def test_is_failure(self):
+		"""
+		Testing which outcomes count against an upstream.
+		"""
+		print(">>> Running circuit_breaker is_failure unit test..")
+		self.assertTrue(is_failure(error=requests.exceptions.Timeout()))
+		self.assertTrue(is_failure(response=Mock(status_code=503)))
+		self.assertFalse(is_failure(response=Mock(status_code=404)))
+		self.assertFalse(is_failure(error=ValueError()))
+
+	def test_transport_fails_fast(self):
+		"""
+		Testing that the transport doesn't make requests to an open circuit.
+		"""
+		print(">>> Running circuit_breaker transport fast-fail unit test..")
+		transport = HTTPTransport()
+		url = "http://localhost:8099/episuiteapi/rest/episuite/estimated"
+		session = transport.get_session(url)
+		self.breaker.trip()
+		with patch.object(breakers, 'enabled', True), patch.object(breakers, 'get', return_value=self.breaker):
+			with patch.object(session, 'request') as request_mock:
+				with self.assertRaises(CircuitOpenError):
+					transport.post(url, data="{}")
+			request_mock.assert_not_called()
+			self.assertFalse(transport.is_available(url))
+		transport.close()
@@ -0,0 +1,129 @@
+import unittest
+import requests
+import time
+import os
+import datetime
+import sys
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.deadline import Deadline, DeadlineExceeded, deadline_scope, get_deadline
+	from qed.cts_celery.cts_calcs.http_transport import HTTPTransport
+	from qed.cts_celery.cts_calcs.retry_policy import RetryPolicy
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs.async_transport import async_transport
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.deadline import Deadline, DeadlineExceeded, deadline_scope, get_deadline
+	from qed.cts_app.cts_calcs.http_transport import HTTPTransport
+	from qed.cts_app.cts_calcs.retry_policy import RetryPolicy
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs.async_transport import async_transport
+
+
+
+class TestDeadline(unittest.TestCase):
+	"""
+	Unit test class for request deadline propagation.
+	"""
+
+	print("cts deadline unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for deadline unit tests.
+		"""
+		self.url = "http://localhost:8080/episuiteapi/rest/episuite/estimated"
+
+	def test_clamp_timeout(self):
+		"""
+		Testing that timeouts are clamped to the time remaining.
+		"""
+		print(">>> Running deadline clamp_timeout unit test..")
+		deadline = Deadline.from_budget(10)
+		self.assertEqual(deadline.clamp_timeout(5), (5, False))
+		timeout, clamped = deadline.clamp_timeout(300)
+		self.assertTrue(clamped)
+		self.assertLessEqual(timeout, 10)
+		timeout, clamped = deadline.clamp_timeout((3, 300))
+		self.assertEqual(timeout[0], 3)
+		self.assertTrue(clamped)
+		with self.assertRaises(DeadlineExceeded):
+			Deadline(time.time() - 1).clamp_timeout(5)
+
+	def test_nested_scopes(self):
+		"""
+		Testing that nested scopes can shorten but not extend a deadline.
+		"""
+		print(">>> Running deadline_scope nesting unit test..")
+		self.assertIsNone(get_deadline())
+		with deadline_scope(seconds=5) as outer:
+			with deadline_scope(seconds=60) as inner:
+				self.assertIs(inner, outer)
+			with deadline_scope(seconds=1) as inner:
+				self.assertLess(inner.expires_at, outer.expires_at)
+				self.assertIs(get_deadline(), inner)
+			self.assertIs(get_deadline(), outer)
+		self.assertIsNone(get_deadline())
+
+	def test_transport_clamps(self):
+		"""
+		Testing that the transport clamps timeouts and fails fast after the deadline.
+		"""
+		print(">>> Running deadline transport unit test..")
+		transport = HTTPTransport()
+		session = transport.get_session(self.url)
+		with patch.object(session, 'request') as request_mock:
+			request_mock.return_value = Mock(status_code=200, content=b"{}")
+			with deadline_scope(seconds=2):
+				transport.post(self.url, data="{}", timeout=300)
+			self.assertLessEqual(request_mock.call_args[1]['timeout'], 2)
+
+			request_mock.side_effect = requests.exceptions.ReadTimeout()
+			with deadline_scope(seconds=2) as deadline:
+				with self.assertRaises(DeadlineExceeded):
+					transport.post(self.url, data="{}", timeout=300)
+			self.assertTrue(deadline.exceeded)
+
+			request_mock.reset_mock()
+			with deadline_scope(expires_at=time.time() - 1):
+				with self.assertRaises(DeadlineExceeded):
+					transport.post(self.url, data="{}", timeout=300)
+			request_mock.assert_not_called()
+		transport.close()
+
+	def test_no_retry_past_deadline(self):
+		"""
+		Testing that retry_policy won't wait past the deadline.
+		"""
+		print(">>> Running deadline retry_policy unit test..")
+		policy = RetryPolicy(base_delay=5, max_delay=5, jitter=False)
+		send_request = Mock(return_value=Mock(status_code=503))
+		with deadline_scope(seconds=1) as deadline:
+			self.assertIsNone(policy.execute(self.url, send_request, lambda response: response.status_code == 200))
+		self.assertEqual(send_request.call_count, 1)
+		self.assertTrue(deadline.exceeded)
+
+	def test_run_data_request(self):
+		"""
+		Testing that handlers get the request's deadline and mark partial results.
+		"""
+		print(">>> Running calculator run_data_request deadline unit test..")
+		deadlines = []
+		async def handler(request_dict):
+			deadlines.append(get_deadline())
+			try:
+				await async_transport.post(self.url, data="{}", timeout=300)
+			except DeadlineExceeded:
+				return {'valid': False, 'data': "timed out"}
+		calc_obj = Calculator()
+		with patch.object(calc_obj, 'async_data_request_handler', side_effect=handler):
+			response_obj = calc_obj.run_data_request({'chemical': "CCO", 'deadline': time.time() - 1})
+			self.assertTrue(response_obj['deadline_exceeded'])
+			self.assertIsNotNone(deadlines[0])
+			self.assertIsNone(get_deadline())
@@ -0,0 +1,82 @@
+import unittest
+import os
+import datetime
+import sys
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.http_transport import HTTPTransport, LegacySSLAdapter
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.http_transport import HTTPTransport, LegacySSLAdapter
+
+
+
+class TestHTTPTransport(unittest.TestCase):
+	"""
+	Unit test class for the pooled http transport module.
+	"""
+
+	print("cts http_transport unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for http transport unit tests.
+		"""
+		self.transport = HTTPTransport()
+		self.jchem_url = "http://localhost:8080/webservices/rest-v0/util/detail"
+		self.ctsws_url = "http://localhost:8081/ctsws/rest/standardizer"
+
+	def tearDown(self):
+		"""
+		Teardown routine for http transport unit tests.
+		"""
+		self.transport.close()
+
+	def test_get_host(self):
+		"""
+		Testing that urls (with or without scheme) map to their host pool key.
+		"""
+		print(">>> Running http_transport get_host unit test..")
+		self.assertEqual(self.transport.get_host(self.jchem_url), "http://localhost:8080")
+		self.assertEqual(self.transport.get_host("localhost:8080/webservices"), "http://localhost:8080")
+
+	def test_session_per_host(self):
+		"""
+		Testing that one session is reused per upstream host.
+		"""
+		print(">>> Running http_transport get_session unit test..")
+		session_1 = self.transport.get_session(self.jchem_url)
+		session_2 = self.transport.get_session(self.jchem_url + "?again")
+		session_3 = self.transport.get_session(self.ctsws_url)
+		self.assertIs(session_1, session_2)
+		self.assertIsNot(session_1, session_3)
+
+	def test_register_host(self):
+		"""
+		Testing host-specific pool settings and legacy ssl adapter.
+		"""
+		print(">>> Running http_transport register_host unit test..")
+		self.transport.register_host(self.jchem_url, pool_maxsize=50, legacy_ssl=True)
+		session = self.transport.get_session(self.jchem_url)
+		adapter = session.get_adapter(self.jchem_url)
+		self.assertIsInstance(adapter, LegacySSLAdapter)
+		self.assertEqual(adapter._pool_maxsize, 50)
+
+	def test_request(self):
+		"""
+		Testing that requests go through the host's pooled session.
+		"""
+		print(">>> Running http_transport request unit test..")
+		session = self.transport.get_session(self.jchem_url)
+		with patch.object(session, 'request') as request_mock:
+			request_mock.return_value = Mock(status_code=200)
+			response = self.transport.post(self.jchem_url, data="{}", timeout=5)
+		request_mock.assert_called_once_with("POST", self.jchem_url, data="{}", timeout=5)
+		self.assertEqual(response.status_code, 200)
+
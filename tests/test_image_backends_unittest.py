@@ -0,0 +1,81 @@
+import unittest
+import base64
+import os
+import datetime
+import sys
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.image_backends import RDKitImageBackend, get_image_backend, Chem
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.image_backends import RDKitImageBackend, get_image_backend, Chem
+	from qed.cts_app.cts_calcs.calculator import Calculator
+
+
+
+@unittest.skipIf(Chem is None, "rdkit not installed")
+class TestImageBackends(unittest.TestCase):
+	"""
+	Unit test class for the molecule image backends.
+	"""
+
+	print("cts image_backends unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for image backend unit tests.
+		"""
+		self.backend = RDKitImageBackend()
+		self.test_smiles = "CC(=O)OC1=C(C=CC=C1)C(O)=O"  # aspirin
+
+	def test_svg_fixed_size(self):
+		"""
+		Testing svg images drawn at the requested width and height.
+		"""
+		print(">>> Running rdkit image backend svg unit test..")
+		results = self.backend.render({'smiles': self.test_smiles, 'width': 100, 'height': 114, 'scale': 50, 'type': "svg"})
+		image = results['data'][0]['image']
+		self.assertTrue(results['valid'])
+		self.assertTrue(image['image'].startswith("<svg"))
+		self.assertEqual((image['width'], image['height'], image['type']), (100, 114, "svg"))
+
+	def test_png_scaled(self):
+		"""
+		Testing png images sized by scale, or by width with height in proportion.
+		"""
+		print(">>> Running rdkit image backend png unit test..")
+		small = self.backend.render({'smiles': self.test_smiles, 'scale': 25})['data'][0]['image']
+		large = self.backend.render({'smiles': self.test_smiles, 'scale': 50})['data'][0]['image']
+		self.assertEqual(small['type'], "png")
+		self.assertTrue(base64.b64decode(small['image']).startswith(b"\x89PNG"))
+		self.assertGreater(large['width'], small['width'])
+		sized = self.backend.render({'smiles': self.test_smiles, 'width': 250, 'scale': 50})['data'][0]['image']
+		self.assertEqual(sized['width'], 250)
+		self.assertAlmostEqual(sized['height'] / sized['width'], large['height'] / large['width'], places=1)
+
+	def test_invalid_smiles(self):
+		"""
+		Testing that unparsable SMILES return an error result.
+		"""
+		print(">>> Running rdkit image backend invalid smiles unit test..")
+		self.assertFalse(self.backend.render({'smiles': "C1CC"})['valid'])
+
+	def test_calculator_backend(self):
+		"""
+		Testing that smilesToImage uses the backend selected by CTS_IMAGE_BACKEND.
+		"""
+		print(">>> Running calculator image backend unit test..")
+		self.assertIsNone(get_image_backend("jchem"))
+		with patch.dict(os.environ, {'CTS_IMAGE_BACKEND': "rdkit"}):
+			calc_obj = Calculator()
+		with patch.object(Calculator, 'web_call') as web_call_mock:
+			html = calc_obj.nodeWrapper(self.test_smiles, 114, 100, 50, 1, 'svg', True)
+			web_call_mock.assert_not_called()
+		self.assertIn("<svg", html)
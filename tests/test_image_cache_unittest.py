@@ -0,0 +1,121 @@
+import unittest
+import tempfile
+import shutil
+import os
+import datetime
+import sys
+import base64
+from urllib.parse import urlsplit, parse_qsl
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.image_cache import ImageCache
+	from qed.cts_celery.cts_calcs import local_chem
+	from qed.cts_celery.cts_calcs.memory_cache import LRUCache
+	from qed.cts_celery.cts_calcs.response_store import ResponseStore
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs import calculator
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.image_cache import ImageCache
+	from qed.cts_app.cts_calcs import local_chem
+	from qed.cts_app.cts_calcs.memory_cache import LRUCache
+	from qed.cts_app.cts_calcs.response_store import ResponseStore
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs import calculator
+
+
+
+class TestImageCache(unittest.TestCase):
+	"""
+	Unit test class for the two-tier molecule image cache.
+	"""
+
+	print("cts image_cache unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for image cache unit tests.
+		"""
+		self.tmp_dir = tempfile.mkdtemp()
+		self.disk = ResponseStore(path=os.path.join(self.tmp_dir, "images.sqlite3"))
+		self.cache = ImageCache(memory=LRUCache("image", max_size=10), disk=self.disk)
+		self.image = {'data': [{'image': {'image': "<svg/>", 'width': 10, 'height': 10, 'type': "svg"}}], 'valid': True}
+
+	def tearDown(self):
+		"""
+		Teardown routine for image cache unit tests.
+		"""
+		shutil.rmtree(self.tmp_dir)
+
+	def test_key_params(self):
+		"""
+		Testing that images are keyed by the params that change them.
+		"""
+		print(">>> Running image_cache key unit test..")
+		self.assertEqual(self.cache.get_key({'smiles': "CCO", 'scale': 50}), self.cache.get_key({'smiles': "CCO", 'scale': 50, 'type': "png"}))
+		self.assertEqual(self.cache.get_key({'smiles': "CCO", 'width': 40, 'height': 30, 'scale': 50}), self.cache.get_key({'smiles': "CCO", 'width': 40, 'height': 30}))
+		self.assertNotEqual(self.cache.get_key({'smiles': "CCO", 'scale': 50}), self.cache.get_key({'smiles': "CCO", 'scale': 60}))
+		self.assertNotEqual(self.cache.get_key({'smiles': "CCO"}), self.cache.get_key({'smiles': "CCO"}, backend="rdkit"))
+
+	@unittest.skipIf(not local_chem.is_available(), "rdkit not installed")
+	def test_canonical_smiles(self):
+		"""
+		Testing that equivalent SMILES share an image.
+		"""
+		print(">>> Running image_cache canonical SMILES unit test..")
+		self.cache.set({'smiles': "OCC", 'type': "svg"}, self.image)
+		self.assertEqual(self.cache.get({'smiles': "CCO", 'type': "svg"}), self.image)
+
+	def test_disk_tier(self):
+		"""
+		Testing that images evicted from memory are read back from disk.
+		"""
+		print(">>> Running image_cache disk tier unit test..")
+		self.cache.set({'smiles': "CCO"}, self.image)
+		self.cache.set({'smiles': "CCO"}, {'error': "Chemical not recognized", 'valid': False})  # not cached
+		self.cache.memory.clear()
+		self.assertEqual(self.cache.get({'smiles': "CCO"}), self.image)
+		self.assertEqual(self.cache.memory.get_stats()['size'], 1)  # promoted
+		self.assertIsNone(self.cache.get({'smiles': "CCC"}))
+		stats = self.cache.get_stats()
+		self.assertEqual((stats['disk']['hits'], stats['disk']['misses']), (1, 1))
+
+	def test_smilesToImage(self):
+		"""
+		Testing that smilesToImage renders an image once.
+		"""
+		print(">>> Running calculator smilesToImage image cache unit test..")
+		calc_obj = Calculator()
+		with patch.object(calculator, 'image_cache', self.cache), \
+				patch.object(Calculator, 'web_call', return_value=self.image) as service_mock:
+			calc_obj.smilesToImage({'smiles': "CCO", 'type': "svg"})
+			response = calc_obj.smilesToImage({'smiles': "CCO", 'type': "svg"})
+		self.assertEqual(service_mock.call_count, 1)
+		self.assertEqual(response, self.image)
+
+	def test_image_reference(self):
+		"""
+		Testing that nodes link to images by url, and that the url
+		resolves to the image bytes.
+		"""
+		print(">>> Running calculator image reference unit test..")
+		calc_obj = Calculator()
+		calc_obj.image_reference_url = "/cts/rest/image"
+		png = {'data': [{'image': {'image': base64.b64encode(b"png").decode("ascii"), 'width': 10, 'height': 10, 'type': "png"}}], 'valid': True}
+		with patch.object(calculator, 'image_cache', self.cache), \
+				patch.object(Calculator, 'web_call', return_value=png) as service_mock:
+			html = calc_obj.nodeWrapper("CCO", None, None, 50, "1", None, True)
+			self.assertEqual(service_mock.call_count, 0)
+			src = html.split('src="')[1].split('"')[0]
+			self.assertTrue(src.startswith("/cts/rest/image?"))
+			self.assertIn('loading="lazy"', html)
+			response = calc_obj.get_image_response(dict(parse_qsl(urlsplit(src).query)))
+			self.assertEqual(response, ("image/png", b"png"))
+			self.assertEqual(calc_obj.smilesToImage(calc_obj.get_image_post("CCO", None, None, 50)), png)  # same cache entry
+		self.assertEqual(service_mock.call_count, 1)
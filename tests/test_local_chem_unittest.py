@@ -0,0 +1,145 @@
+import unittest
+import os
+import datetime
+import sys
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs import local_chem
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs.smilesfilter import SMILESFilter, ElementalAnalysis
+	from qed.cts_celery.cts_calcs.standardizer_comparison import compare_standardizers
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs import local_chem
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs.smilesfilter import SMILESFilter, ElementalAnalysis
+	from qed.cts_app.cts_calcs.standardizer_comparison import compare_standardizers
+
+
+
+@unittest.skipIf(not local_chem.is_available(), "rdkit not installed")
+class TestLocalChem(unittest.TestCase):
+	"""
+	Unit test class for the local (RDKit) chemistry functions.
+	"""
+
+	print("cts local_chem unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for local chem unit tests.
+		"""
+		self.calc_obj = Calculator()
+		self.calc_obj.local_struct_info = True
+
+	def test_get_struct_info(self):
+		"""
+		Testing formula, masses and canonical SMILES from RDKit.
+		"""
+		print(">>> Running local_chem get_struct_info unit test..")
+		info = local_chem.get_struct_info("OCC")
+		self.assertEqual(info['formula'], "C2H6O")
+		self.assertEqual(info['mass'], 46.069)
+		self.assertAlmostEqual(info['exactMass'], 46.041864812, places=6)
+		self.assertEqual(info['smiles'], "CCO")
+		self.assertIsNone(local_chem.get_struct_info("not a smiles"))
+
+	def test_getStructInfos(self):
+		"""
+		Testing that iupac names are requested in one batch, and that
+		unparseable structures fall back to jchem ws.
+		"""
+		print(">>> Running calculator getStructInfos unit test..")
+		names = {'data': [{'iupac': "ethanol"}, {'iupac': "propane"}], 'valid': True}
+		jchem_info = {'formula': "X", 'iupac': "x", 'mass': 1.0, 'smiles': "X", 'exactMass': 1.0}
+		with patch.object(Calculator, 'cached_web_call', return_value=names) as service_mock, \
+				patch.object(Calculator, 'getJchemStructInfo', return_value=jchem_info) as jchem_mock:
+			infos = self.calc_obj.getStructInfos(["OCC", "CCC", "CCO", "[X]"])
+		self.assertEqual(service_mock.call_count, 1)
+		self.assertEqual(len(service_mock.call_args[0][1]['structures']), 2)  # OCC and CCO named once
+		self.assertEqual([info['iupac'] for info in infos], ["ethanol", "propane", "ethanol", "x"])
+		self.assertEqual(jchem_mock.call_count, 1)
+
+	def test_check_for_carbon(self):
+		"""
+		Testing the local carbon check, with jchem's elemental
+		analysis only for SMILES RDKit can't parse.
+		"""
+		print(">>> Running smilesfilter local check_for_carbon unit test..")
+		self.assertTrue(local_chem.has_element("[13CH4]", "C"))
+		self.assertFalse(local_chem.has_element("Cl[Cl]", "C"))
+		self.assertIsNone(local_chem.has_element("not a smiles", "C"))
+		filter_obj = SMILESFilter()
+		filter_obj.local_carbon_check = True
+		with patch.object(ElementalAnalysis, 'make_data_request') as service_mock, \
+				patch.object(ElementalAnalysis, 'get_elemental_analysis', return_value=["C (100.00%)"]):
+			self.assertTrue(filter_obj.check_for_carbon("CCO"))
+			self.assertFalse(filter_obj.check_for_carbon("O"))
+			self.assertEqual(service_mock.call_count, 0)
+			self.assertTrue(filter_obj.check_for_carbon("not a smiles"))
+			self.assertEqual(service_mock.call_count, 1)
+
+	def test_get_mass(self):
+		"""
+		Testing local masses, with jchem ws for SMILES RDKit can't parse.
+		"""
+		print(">>> Running calculator local get_mass unit test..")
+		self.calc_obj.local_mass = True
+		provider = local_chem.MassProvider()
+		self.assertEqual(provider.get_masses(["CCO", "C", "CCO", "not a smiles"]), [46.069, 16.043, 46.069, None])
+		self.assertEqual(provider.memo.get_stats()['size'], 2)
+		with patch.object(Calculator, 'getMass', return_value={'data': [{'mass': 123.4}], 'valid': True}) as service_mock:
+			self.assertEqual(self.calc_obj.get_masses(["CCO", "not a smiles"]), [46.069, 123.4])
+		self.assertEqual(service_mock.call_count, 1)
+
+	def test_standardize(self):
+		"""
+		Testing local standardization and filterSMILES' standardizer modes.
+		"""
+		print(">>> Running smilesfilter local standardization unit test..")
+		self.assertEqual(local_chem.standardize("[H]OC([H])([H])C"), "CCO")  # explicit H removed
+		self.assertEqual(local_chem.standardize("CN(=O)=O"), "C[N+](=O)[O-]")  # nitro transform
+		self.assertEqual(local_chem.standardize("OC1=CC=CC=N1"), "O=c1cccc[nH]1")  # canonical tautomer
+		self.assertEqual(local_chem.standardize("CC(=O)[O-]"), "CC(=O)O")  # neutralized
+		filter_obj = SMILESFilter()
+		with patch.object(SMILESFilter, 'remote_standardize', return_value="OCC") as remote_mock:
+			filter_obj.standardizer_mode = "local"
+			self.assertEqual(filter_obj.standardize("OCC"), "CCO")
+			self.assertEqual(remote_mock.call_count, 0)
+			self.assertEqual(filter_obj.standardize("not a smiles"), "OCC")  # remote fallback
+			filter_obj.standardizer_mode = "verify"
+			self.assertEqual(filter_obj.standardize("OCC"), "OCC")  # remote result, local agrees
+			self.assertFalse(filter_obj.verify_standardization("CC(=O)[O-]", "CC(=O)[O-]"))
+
+	def test_compare_standardizers(self):
+		"""
+		Testing the local vs remote standardization report.
+		"""
+		print(">>> Running standardizer comparison unit test..")
+		remote = {"OCC": "OCC", "CN(=O)=O": "CN", "not a smiles": "X"}
+		with patch.object(SMILESFilter, 'remote_standardize', side_effect=lambda smiles: remote[smiles]):
+			report = compare_standardizers(["OCC", "CN(=O)=O", "not a smiles", "CCC"])
+		self.assertEqual((report['compared'], report['agree'], report['differ']), (2, 1, 1))
+		self.assertEqual((report['local_failed'], report['remote_failed']), (1, 1))
+		self.assertEqual(report['differences'][0]['smiles'], "CN(=O)=O")
+		self.assertEqual(report['agreement'], 0.5)
+
+	def test_get_identifier_type(self):
+		"""
+		Testing local classification of obvious identifiers.
+		"""
+		print(">>> Running local_chem get_identifier_type unit test..")
+		self.assertEqual(local_chem.get_identifier_type("50-78-2"), "CAS#")
+		self.assertIsNone(local_chem.get_identifier_type("50-78-3"))  # bad check digit
+		self.assertEqual(local_chem.get_identifier_type("DTXSID5020108"), "dtxsid")
+		self.assertEqual(local_chem.get_identifier_type("DTXCID10108"), "dtxcid")
+		self.assertEqual(local_chem.get_identifier_type(" c1ccccc1O "), "smiles")
+		self.assertEqual(local_chem.get_identifier_type('<?xml version="1.0"?><cml><MDocument></MDocument></cml>'), "mrv")
+		for chemical in ["ccc", "aspirin", "PFOS", "methyl ether", "C1CC", ""]:
+			self.assertIsNone(local_chem.get_identifier_type(chemical))
@@ -0,0 +1,86 @@
+import unittest
+import os
+import datetime
+import sys
+import time
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.memory_cache import LRUCache, jchem_cache
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.memory_cache import LRUCache, jchem_cache
+	from qed.cts_app.cts_calcs.calculator import Calculator
+
+
+
+class TestMemoryCache(unittest.TestCase):
+	"""
+	Unit test class for the in-process LRU/TTL caches.
+	"""
+
+	print("cts memory_cache unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for memory cache unit tests.
+		"""
+		self.cache = LRUCache("test", max_size=2, ttl=60)
+		jchem_cache.clear()
+
+	def test_lru_eviction(self):
+		"""
+		Testing that the least recently used entry is evicted.
+		"""
+		print(">>> Running memory_cache LRU eviction unit test..")
+		self.cache.set("a", 1)
+		self.cache.set("b", 2)
+		self.cache.get("a")
+		self.cache.set("c", 3)
+		self.assertIsNone(self.cache.get("b"))
+		self.assertEqual(self.cache.get("a"), 1)
+		self.assertEqual(self.cache.get_stats()['evictions'], 1)
+
+	def test_ttl(self):
+		"""
+		Testing that expired entries miss.
+		"""
+		print(">>> Running memory_cache TTL unit test..")
+		cache = LRUCache("test", max_size=2, ttl=0.01)
+		cache.set("a", 1)
+		time.sleep(0.02)
+		self.assertIsNone(cache.get("a"))
+		self.assertEqual(cache.get_stats()['misses'], 1)
+
+	def test_copies_values(self):
+		"""
+		Testing that callers can't modify cached values.
+		"""
+		print(">>> Running memory_cache copy unit test..")
+		self.cache.set("a", {'data': [1]})
+		self.cache.get("a")['data'].append(2)
+		self.assertEqual(self.cache.get("a"), {'data': [1]})
+
+	def test_cached_web_call(self):
+		"""
+		Testing that valid jchem results are cached and errors aren't.
+		"""
+		print(">>> Running calculator cached_web_call unit test..")
+		calc_obj = Calculator()
+		with patch.object(Calculator, 'web_call') as web_call_mock:
+			web_call_mock.return_value = {'data': [{'mass': 180.16}], 'valid': True}
+			calc_obj.getMass({'chemical': "CC(=O)OC1=C(C=CC=C1)C(O)=O"})
+			response = calc_obj.getMass({'chemical': "CC(=O)OC1=C(C=CC=C1)C(O)=O"})
+			self.assertEqual(web_call_mock.call_count, 1)
+			self.assertEqual(response['data'][0]['mass'], 180.16)
+
+			web_call_mock.return_value = {'error': "bad chemical", 'valid': False}
+			calc_obj.getMass({'chemical': "X"})
+			calc_obj.getMass({'chemical': "X"})
+			self.assertEqual(web_call_mock.call_count, 3)
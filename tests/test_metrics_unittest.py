@@ -0,0 +1,117 @@
+import unittest
+import requests
+import os
+import datetime
+import sys
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.metrics import MetricsRegistry, Histogram, metrics
+	from qed.cts_celery.cts_calcs.http_transport import HTTPTransport
+	from qed.cts_celery.cts_calcs.retry_policy import RetryPolicy
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.metrics import MetricsRegistry, Histogram, metrics
+	from qed.cts_app.cts_calcs.http_transport import HTTPTransport
+	from qed.cts_app.cts_calcs.retry_policy import RetryPolicy
+
+
+
+class TestMetrics(unittest.TestCase):
+	"""
+	Unit test class for the upstream metrics registry.
+	"""
+
+	print("cts metrics unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for metrics unit tests.
+		"""
+		self.metrics = MetricsRegistry()
+		self.metrics.enabled = True
+		self.upstream = "http://localhost:8080"
+		self.url = self.upstream + "/episuiteapi/rest/episuite/estimated"
+
+	def test_histogram_quantile(self):
+		"""
+		Testing latency quantile estimates from histogram buckets.
+		"""
+		print(">>> Running metrics histogram quantile unit test..")
+		histogram = Histogram()
+		for i in range(99):
+			histogram.observe(0.02)
+		histogram.observe(20)
+		self.assertLessEqual(histogram.get_quantile(0.5), 0.025)
+		self.assertGreater(histogram.get_quantile(0.999), 10)
+		self.assertIsNone(Histogram().get_quantile(0.99))
+
+	def test_endpoint_labels(self):
+		"""
+		Testing endpoint templates and the per-upstream endpoint cap.
+		"""
+		print(">>> Running metrics endpoint label unit test..")
+		self.metrics.register_endpoint("chemical/search/equal/{}")
+		self.assertEqual(self.metrics.get_endpoint(self.upstream, self.upstream + "/chemical/search/equal/C/C=C/C"), "/chemical/search/equal/{}")
+		self.assertEqual(self.metrics.get_endpoint(self.upstream, self.url + "?smiles=CCO"), "/episuiteapi/rest/episuite/estimated")
+		self.metrics.register_endpoint("https://cactus.nci.nih.gov/chemical/structure/{}/cas")
+		self.assertEqual(self.metrics.get_endpoint("https://cactus.nci.nih.gov", "https://cactus.nci.nih.gov/chemical/structure/C/C%3DC/C/cas"), "/chemical/structure/{}/cas")
+		self.metrics.max_endpoints = 1
+		self.assertEqual(self.metrics.get_endpoint(self.upstream, self.upstream + "/another"), "other")
+
+	def test_transport_records(self):
+		"""
+		Testing that transport requests record status, latency, bytes and timeouts.
+		"""
+		print(">>> Running metrics transport unit test..")
+		transport = HTTPTransport()
+		session = transport.get_session(self.url)
+		with patch.object(metrics, 'enabled', True), patch.object(metrics, 'reset_after_fork'):
+			metrics.reset()
+			with patch.object(session, 'request') as request_mock:
+				request_mock.return_value = Mock(status_code=200, content=b'{"data": []}')
+				transport.post(self.url, data='{"structure": "CCO"}', timeout=5)
+				request_mock.side_effect = requests.exceptions.Timeout()
+				with self.assertRaises(requests.exceptions.Timeout):
+					transport.post(self.url, data='{"structure": "CCO"}', timeout=5)
+			endpoint = "/episuiteapi/rest/episuite/estimated"
+			self.assertEqual(metrics.requests[(self.upstream, endpoint, "POST", "200")], 1)
+			self.assertEqual(metrics.timeouts[(self.upstream, endpoint)], 1)
+			self.assertEqual(metrics.bytes_sent[(self.upstream, endpoint)], 40)
+			self.assertEqual(metrics.bytes_received[(self.upstream, endpoint)], 12)
+			self.assertEqual(metrics.latency[(self.upstream, endpoint, "POST")].count, 2)
+			metrics.reset()
+		transport.close()
+
+	def test_retries_recorded(self):
+		"""
+		Testing that retry_policy retries are counted per upstream.
+		"""
+		print(">>> Running metrics retry unit test..")
+		policy = RetryPolicy(base_delay=0, max_delay=0)
+		send_request = Mock(return_value=Mock(status_code=503))
+		with patch.object(metrics, 'enabled', True):
+			metrics.reset()
+			policy.execute(self.url, send_request, lambda response: response.status_code == 200, max_attempts=3)
+			self.assertEqual(metrics.get_summary()[self.upstream]['retries'], 2)
+			metrics.reset()
+
+	def test_export_prometheus(self):
+		"""
+		Testing Prometheus text format export.
+		"""
+		print(">>> Running metrics export_prometheus unit test..")
+		self.metrics.record_request(self.upstream, "post", self.url, 0.3, response=Mock(status_code=200, content=b"{}"))
+		self.metrics.record_retry(self.upstream, self.url, "status 503")
+		text = self.metrics.export_prometheus()
+		self.assertIn("# TYPE cts_upstream_request_duration_seconds histogram", text)
+		self.assertIn('cts_upstream_request_duration_seconds_bucket{upstream="http://localhost:8080",endpoint="/episuiteapi/rest/episuite/estimated",method="POST",le="0.5"} 1', text)
+		self.assertIn('cts_upstream_request_duration_seconds_bucket{upstream="http://localhost:8080",endpoint="/episuiteapi/rest/episuite/estimated",method="POST",le="0.25"} 0', text)
+		self.assertIn('cts_upstream_requests_total{upstream="http://localhost:8080",endpoint="/episuiteapi/rest/episuite/estimated",method="POST",status="200"} 1', text)
+		self.assertIn('cts_upstream_retries_total{upstream="http://localhost:8080",endpoint="/episuiteapi/rest/episuite/estimated",reason="status 503"} 1', text)
+		self.assertIn('cts_upstream_received_bytes_total{upstream="http://localhost:8080",endpoint="/episuiteapi/rest/episuite/estimated"} 2', text)
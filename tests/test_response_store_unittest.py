@@ -0,0 +1,90 @@
+import unittest
+import tempfile
+import shutil
+import os
+import datetime
+import sys
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.response_store import ResponseStore
+	from qed.cts_celery.cts_calcs.calculator import Calculator
+	from qed.cts_celery.cts_calcs import calculator
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.response_store import ResponseStore
+	from qed.cts_app.cts_calcs.calculator import Calculator
+	from qed.cts_app.cts_calcs import calculator
+
+
+
+class TestResponseStore(unittest.TestCase):
+	"""
+	Unit test class for the persistent response store.
+	"""
+
+	print("cts response_store unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for response store unit tests.
+		"""
+		self.tmp_dir = tempfile.mkdtemp()
+		self.store = ResponseStore(path=os.path.join(self.tmp_dir, "responses.sqlite3"))
+		self.url = "http://localhost:8080/episuiteapi/rest/episuite/estimated"
+
+	def tearDown(self):
+		"""
+		Teardown routine for response store unit tests.
+		"""
+		shutil.rmtree(self.tmp_dir)
+
+	def test_get_set(self):
+		"""
+		Testing stored responses by namespace and canonical payload.
+		"""
+		print(">>> Running response_store get/set unit test..")
+		self.store.set("epi:1", self.url, {'structure': "CCO", 'melting_point': None}, b'{"data": []}')
+		self.assertEqual(self.store.get("epi:1", self.url, '{"melting_point": null, "structure": "CCO"}'), (200, b'{"data": []}'))
+		self.assertIsNone(self.store.get("epi:2", self.url, {'structure': "CCO", 'melting_point': None}))  # new model version
+		self.assertIsNone(self.store.get("epi:1", self.url, {'structure': "CCC"}))
+
+	def test_eviction(self):
+		"""
+		Testing that least recently used responses are evicted over the size cap.
+		"""
+		print(">>> Running response_store eviction unit test..")
+		store = ResponseStore(path=os.path.join(self.tmp_dir, "small.sqlite3"), max_bytes=25)
+		for smiles in ["C", "CC", "CCC"]:
+			store.set("epi:1", self.url, {'structure': smiles}, b"0123456789")
+		store.evict()
+		self.assertIsNone(store.get("epi:1", self.url, {'structure': "C"}))
+		self.assertIsNotNone(store.get("epi:1", self.url, {'structure': "CCC"}))
+
+	def test_disabled(self):
+		"""
+		Testing that the store does nothing without a path.
+		"""
+		print(">>> Running response_store disabled unit test..")
+		store = ResponseStore(path=None)
+		store.set("epi:1", self.url, {}, b"{}")
+		self.assertIsNone(store.get("epi:1", self.url, {}))
+
+	def test_request_with_retries(self):
+		"""
+		Testing that calcs reuse stored responses instead of requesting again.
+		"""
+		print(">>> Running calculator response store unit test..")
+		calc_obj = Calculator()
+		calc_obj.name = "epi"
+		with patch.object(calculator, 'response_store', self.store), patch.object(calculator.transport, 'post') as post_mock:
+			post_mock.return_value = Mock(status_code=200, content=b'{"data": []}', from_store=False)
+			calc_obj.request_with_retries(self.url, {'structure': "CCO"})
+			response = calc_obj.request_with_retries(self.url, {'structure': "CCO"})
+		self.assertEqual(post_mock.call_count, 1)
+		self.assertEqual(response.content, b'{"data": []}')
@@ -0,0 +1,96 @@
+import unittest
+import os
+import datetime
+import sys
+import requests
+from unittest.mock import Mock, patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.retry_policy import RetryPolicy, RetryBudget
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.retry_policy import RetryPolicy, RetryBudget
+
+
+
+class TestRetryPolicy(unittest.TestCase):
+	"""
+	Unit test class for the shared retry policy module.
+	"""
+
+	print("cts retry_policy unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for retry policy unit tests.
+		"""
+		self.url = "http://localhost:8080/episuiteapi/rest/episuite/estimated"
+		self.policy = RetryPolicy(base_delay=0.0, max_delay=0.0)
+		RetryPolicy.retry_budgets = {}
+
+	def test_retries_until_valid(self):
+		"""
+		Testing that invalid 200 responses are retried until valid.
+		"""
+		print(">>> Running retry_policy execute unit test..")
+		send_mock = Mock(side_effect=[Mock(status_code=200), Mock(status_code=200)])
+		validate_mock = Mock(side_effect=[False, True])
+		response = self.policy.execute(self.url, send_mock, validate_mock, max_attempts=3)
+		self.assertEqual(send_mock.call_count, 2)
+		self.assertIsNotNone(response)
+
+	def test_non_retryable_status(self):
+		"""
+		Testing that a 400 response isn't retried.
+		"""
+		print(">>> Running retry_policy non-retryable status unit test..")
+		send_mock = Mock(return_value=Mock(status_code=400))
+		response = self.policy.execute(self.url, send_mock, lambda r: r.status_code == 200, max_attempts=3)
+		self.assertEqual(send_mock.call_count, 1)
+		self.assertIsNone(response)
+
+	def test_timeout_not_retried(self):
+		"""
+		Testing retry_on_timeout=False (e.g., OPERA).
+		"""
+		print(">>> Running retry_policy timeout unit test..")
+		policy = RetryPolicy(base_delay=0.0, max_delay=0.0, retry_on_timeout=False)
+		send_mock = Mock(side_effect=requests.exceptions.Timeout("timed out"))
+		response = policy.execute(self.url, send_mock, None, max_attempts=3)
+		self.assertEqual(send_mock.call_count, 1)
+		self.assertIsNone(response)
+
+	def test_max_attempts(self):
+		"""
+		Testing that connection errors stop at max attempts.
+		"""
+		print(">>> Running retry_policy max attempts unit test..")
+		send_mock = Mock(side_effect=requests.exceptions.ConnectionError("refused"))
+		response = self.policy.execute(self.url, send_mock, None, max_attempts=3)
+		self.assertEqual(send_mock.call_count, 3)
+		self.assertIsNone(response)
+
+	def test_backoff_delay(self):
+		"""
+		Testing exponential backoff bounds.
+		"""
+		print(">>> Running retry_policy get_delay unit test..")
+		policy = RetryPolicy(base_delay=1.0, max_delay=4.0, jitter=False)
+		self.assertEqual([policy.get_delay(n) for n in range(1, 5)], [1.0, 2.0, 4.0, 4.0])
+
+	def test_retry_budget(self):
+		"""
+		Testing per-upstream retry cap.
+		"""
+		print(">>> Running retry_policy RetryBudget unit test..")
+		budget = RetryBudget(ratio=0.5, min_retries=1, window=60)
+		for i in range(2):
+			budget.record_request()
+		self.assertTrue(budget.try_retry())
+		self.assertTrue(budget.try_retry())
+		self.assertFalse(budget.try_retry())
@@ -0,0 +1,97 @@
+import unittest
+import asyncio
+import threading
+import os
+import datetime
+import sys
+import time
+from unittest.mock import Mock
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.single_flight import SingleFlight, request_key
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.single_flight import SingleFlight, request_key
+
+
+
+class TestSingleFlight(unittest.TestCase):
+	"""
+	Unit test class for the single-flight request coalescing module.
+	"""
+
+	print("cts single_flight unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for single flight unit tests.
+		"""
+		self.single_flight = SingleFlight()
+		self.single_flight.enabled = True
+		self.url = "http://localhost:8080/webservices/rest-v0/util/detail"
+
+	def test_request_key(self):
+		"""
+		Testing that JSON payloads with different key order share a key.
+		"""
+		print(">>> Running single_flight request_key unit test..")
+		key_1 = request_key("post", self.url, '{"structure": "CCO", "display": {"include": ["image"]}}')
+		key_2 = request_key("POST", self.url, {"display": {"include": ["image"]}, "structure": "CCO"})
+		self.assertEqual(key_1, key_2)
+		self.assertNotEqual(key_1, request_key("POST", self.url, {"structure": "CCC"}))
+
+	def test_threads_share_request(self):
+		"""
+		Testing that concurrent threads with the same key make one call.
+		"""
+		print(">>> Running single_flight do unit test..")
+		release = threading.Event()
+		def slow_request():
+			release.wait(5)
+			return "response"
+		request_mock = Mock(side_effect=slow_request)
+		key = request_key("POST", self.url, {"structure": "CCO"})
+		results = []
+		threads = [threading.Thread(target=lambda: results.append(self.single_flight.do(key, request_mock))) for i in range(5)]
+		for thread in threads:
+			thread.start()
+		while self.single_flight.coalesced < 4:
+			time.sleep(0.01)
+		release.set()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(request_mock.call_count, 1)
+		self.assertEqual(results, ["response"] * 5)
+		self.assertEqual(self.single_flight.calls, {})
+
+	def test_error_shared(self):
+		"""
+		Testing that an in-flight call's error isn't cached for later calls.
+		"""
+		print(">>> Running single_flight error unit test..")
+		key = request_key("GET", self.url)
+		with self.assertRaises(ValueError):
+			self.single_flight.do(key, Mock(side_effect=ValueError("bad")))
+		self.assertEqual(self.single_flight.do(key, Mock(return_value="ok")), "ok")
+
+	def test_coroutines_share_request(self):
+		"""
+		Testing that concurrent coroutines with the same key make one call.
+		"""
+		print(">>> Running single_flight async_do unit test..")
+		calls = []
+		async def request():
+			calls.append(1)
+			await asyncio.sleep(0.01)
+			return "response"
+		async def run_requests():
+			key = request_key("POST", self.url, {"structure": "CCO"})
+			return await asyncio.gather(*[self.single_flight.async_do(key, request) for i in range(5)])
+		results = asyncio.run(run_requests())
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(results, ["response"] * 5)
@@ -5,6 +5,8 @@ import inspect
 import datetime
 import logging
 import sys
+import tempfile
+import shutil
 from tabulate import tabulate
 from unittest.mock import Mock, patch
 
@@ -15,9 +17,11 @@ sys.path.insert(
 
 # local requirements (running pytest at qed level):
 if 'cts_celery' in _path:
-	from qed.cts_celery.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_celery.cts_calcs.smilesfilter import SMILESFilter, filter_cache, prep_cache
+	from qed.cts_celery.cts_calcs.response_store import ResponseStore
 elif 'cts_app' in _path:
-	from qed.cts_app.cts_calcs.smilesfilter import SMILESFilter
+	from qed.cts_app.cts_calcs.smilesfilter import SMILESFilter, filter_cache, prep_cache
+	from qed.cts_app.cts_calcs.response_store import ResponseStore
 
 from qed.temp_config.set_environment import DeployEnv
 
@@ -93,8 +97,9 @@ class TestSmilesFilter(unittest.TestCase):
 
 		expected_result = True  # expected result from smilesfilter test function
 
-		with patch('qed.cts_app.cts_calcs.smilesfilter.requests.post') as service_mock:
+		with patch('qed.cts_app.cts_calcs.smilesfilter.transport.post') as service_mock:
 
+			service_mock.return_value.status_code = 200
 			service_mock.return_value.content = json.dumps(mock_json)  # sets expected result from ctsws request
 
 			response = self.smilesfilter_obj.is_valid_smiles(self.test_smiles)
@@ -388,4 +393,146 @@ class TestSmilesFilter(unittest.TestCase):
 			print(inspect.currentframe().f_code.co_name)
 			print(tabulate(tab, headers='keys', tablefmt='rst'))
 
-		return
\ No newline at end of file
+		return
+
+
+
+	def test_filterSMILES_memoized(self):
+		"""
+		Testing that filterSMILES results and errors are memoized
+		in memory and in the response store.
+		"""
+
+		print(">>> Running smilesfilter filterSMILES memoization unit test..")
+
+		tmp_dir = tempfile.mkdtemp()
+		store = ResponseStore(path=os.path.join(tmp_dir, "responses.sqlite3"))
+		error = {'error': "Chemical cannot be a salt or mixture"}
+
+		try:
+			with patch('qed.cts_app.cts_calcs.smilesfilter.response_store', store), \
+					patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.run_filters') as filter_mock:
+				filter_mock.side_effect = lambda smiles, is_node=False: error if "." in smiles else smiles
+				filter_cache.clear()
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CCO.[Na+]"), error)
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CCO.[Na+]"), error)
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CCCO", True), "CCCO")
+				self.assertEqual(filter_mock.call_count, 2)
+				filter_cache.clear()  # e.g., a new worker
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CCCO", True), "CCCO")
+				self.assertEqual(filter_mock.call_count, 2)
+				self.smilesfilter_obj.filterSMILES("CCCO", False)  # is_node is part of the key
+				self.assertEqual(filter_mock.call_count, 3)
+		finally:
+			filter_cache.clear()
+			shutil.rmtree(tmp_dir)
+
+		return
+
+
+
+	def test_filterSMILES_upstream_error(self):
+		"""
+		Testing that CTSWS isvalidchemical failures raise and aren't
+		memoized as the metals error, while an explicit "false" is.
+		"""
+
+		print(">>> Running smilesfilter filterSMILES upstream error unit test..")
+
+		tmp_dir = tempfile.mkdtemp()
+		store = ResponseStore(path=os.path.join(tmp_dir, "responses.sqlite3"))
+		responses = [
+			Mock(status_code=502, content=b"Bad Gateway"),
+			Mock(status_code=200, content=b"<html></html>"),
+			Mock(status_code=200, content=json.dumps({'error': "jchem down"})),
+			Mock(status_code=200, content=json.dumps({'result': "false"}))
+		]
+
+		try:
+			with patch('qed.cts_app.cts_calcs.smilesfilter.response_store', store), \
+					patch('qed.cts_app.cts_calcs.smilesfilter.transport.post', side_effect=responses) as service_mock, \
+					patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.check_for_carbon', return_value=True):
+				filter_cache.clear()
+				for i in range(3):
+					with self.assertRaises(Exception):
+						self.smilesfilter_obj.filterSMILES("CC[Hg]C")
+				self.assertEqual(filter_cache.get_stats()['size'], 0)
+				self.assertIsNone(store.get(self.smilesfilter_obj.get_store_namespace(), self.smilesfilter_obj.filter_store_url, {'smiles': "CC[Hg]C", 'is_node': False}))
+				error = {'error': "Chemical cannot contain metals"}
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CC[Hg]C"), error)
+				self.assertEqual(self.smilesfilter_obj.filterSMILES("CC[Hg]C"), error)
+				self.assertEqual(service_mock.call_count, 4)
+		finally:
+			filter_cache.clear()
+			shutil.rmtree(tmp_dir)
+
+		return
+
+
+
+	@patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.untransformSMILES')
+	@patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.clearStereos')
+	@patch('qed.cts_app.cts_calcs.smilesfilter.Calculator.get_mass')
+	def test_parseSmilesByCalculator_cached(self, mass_mock, stereo_mock, untransform_mock):
+		"""
+		Testing that calcs with the same SMILES preparation share
+		prepared smiles, and the bulk version.
+		"""
+
+		print(">>> Running smilesfilter parseSmilesByCalculator cache unit test..")
+
+		mass_mock.return_value = 180.16
+		stereo_mock.side_effect = lambda smiles: [smiles]
+		untransform_mock.side_effect = lambda smiles: [smiles]
+		prep_cache.clear()
+
+		try:
+			for calc in ['epi', 'sparc', 'measured']:
+				self.assertEqual(self.smilesfilter_obj.parseSmilesByCalculator(self.test_smiles, calc), self.test_smiles)
+			self.assertEqual((mass_mock.call_count, stereo_mock.call_count), (1, 1))
+			self.smilesfilter_obj.parseSmilesByCalculator(self.test_smiles, 'test')  # mass check only
+			self.assertEqual((mass_mock.call_count, stereo_mock.call_count), (2, 1))
+
+			with patch('qed.cts_app.cts_calcs.smilesfilter.Calculator.get_masses') as masses_mock:
+				masses_mock.return_value = [46.07, 2000.0]
+				results = self.smilesfilter_obj.parseSmilesListByCalculator(["CCO", "C[Na]", "CCO", self.test_smiles], 'epi')
+			self.assertEqual(masses_mock.call_args[0][0], ["CCO", "C[Na]"])
+			self.assertEqual(results[0], "CCO")
+			self.assertEqual(results[1].args[0], {'data': "structure too large"})
+			self.assertEqual(results[2:], ["CCO", self.test_smiles])
+		finally:
+			prep_cache.clear()
+
+		return
+
+
+
+	@patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.untransformSMILES')
+	@patch('qed.cts_app.cts_calcs.smilesfilter.SMILESFilter.clearStereos')
+	@patch('qed.cts_app.cts_calcs.smilesfilter.Calculator.get_masses')
+	def test_parseSmilesListByCalculator_errors(self, masses_mock, stereo_mock, untransform_mock):
+		"""
+		Testing that one structure's filtering error is reported for
+		that structure (and not cached) instead of raised for the list.
+		"""
+
+		print(">>> Running smilesfilter parseSmilesListByCalculator errors unit test..")
+
+		masses_mock.return_value = [46.07, 30.07]
+		stereo_mock.side_effect = lambda smiles: [smiles]
+		untransform_mock.side_effect = lambda smiles: [smiles] if smiles != "CC" else 1/0
+		prep_cache.clear()
+
+		try:
+			results = self.smilesfilter_obj.parseSmilesListByCalculator(["CCO", "CC"], 'epi')
+			self.assertEqual(results[0], "CCO")
+			self.assertEqual(results[1].args[0], {'data': "error filtering chemical"})
+			self.assertIsNone(prep_cache.get(("CC", "destereo")))
+			masses_mock.side_effect = Exception("jchem down")
+			with patch('qed.cts_app.cts_calcs.smilesfilter.Calculator.get_mass', return_value=30.07):
+				results = self.smilesfilter_obj.parseSmilesListByCalculator(["CC"], 'sparc')
+			self.assertIsInstance(results[0], Exception)
+		finally:
+			prep_cache.clear()
+
+		return
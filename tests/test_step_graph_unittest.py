@@ -0,0 +1,94 @@
+import unittest
+import os
+import datetime
+import sys
+import time
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.step_graph import run_step_graph, run_each
+	from qed.cts_celery.cts_calcs.tracing import Tracer
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.step_graph import run_step_graph, run_each
+	from qed.cts_app.cts_calcs.tracing import Tracer
+
+
+
+class TestStepGraph(unittest.TestCase):
+	"""
+	Unit test class for running workflow steps as a dependency graph.
+	"""
+
+	print("cts step_graph unittests conducted at " + str(datetime.datetime.today()))
+
+	def test_concurrent_steps(self):
+		"""
+		Testing that independent steps run concurrently and
+		dependent steps get their dependencies' results.
+		"""
+		print(">>> Running step_graph concurrency unit test..")
+		def slow(value):
+			time.sleep(0.2)
+			return value
+		start = time.time()
+		results = run_step_graph({
+			'a': (lambda: slow(1), []),
+			'b': (lambda: slow(2), []),
+			'c': (lambda: slow(3), []),
+			'sum': (lambda a, b: a + b, ['a', 'b'])
+		})
+		self.assertLess(time.time() - start, 0.5)
+		self.assertEqual(results, {'a': 1, 'b': 2, 'c': 3, 'sum': 3})
+
+	def test_step_error(self):
+		"""
+		Testing that a step's exception is raised and dependents don't run.
+		"""
+		print(">>> Running step_graph error unit test..")
+		ran = []
+		def fail():
+			raise ValueError("step failed")
+		with self.assertRaises(ValueError):
+			run_step_graph({
+				'a': (fail, []),
+				'b': (lambda a: ran.append(a), ['a'])
+			})
+		self.assertEqual(ran, [])
+		with self.assertRaises(ValueError):
+			run_step_graph({'a': (lambda missing: None, ['missing'])})
+
+	def test_trace_context(self):
+		"""
+		Testing that steps in pool threads add spans to the caller's trace.
+		"""
+		print(">>> Running step_graph trace context unit test..")
+		tracer = Tracer()
+		tracer.enabled = True
+		def step(name):
+			with tracer.span(name):
+				time.sleep(0.05)
+		with tracer.start_trace("workflow") as root:
+			run_step_graph({name: (lambda name=name: step(name), []) for name in ["a", "b", "c"]})
+		self.assertEqual(sorted(child.name for child in root.children), ["a", "b", "c"])
+
+	def test_run_each(self):
+		"""
+		Testing bounded concurrent calls, with exceptions in place of results.
+		"""
+		print(">>> Running step_graph run_each unit test..")
+		def call(value):
+			time.sleep(0.1)
+			if value == 3:
+				raise ValueError("item failed")
+			return value * 2
+		start = time.time()
+		results = run_each(call, [1, 2, 3, 4], max_workers=4)
+		self.assertLess(time.time() - start, 0.3)
+		self.assertEqual(results[:2] + results[3:], [2, 4, 8])
+		self.assertIsInstance(results[2], ValueError)
+		self.assertEqual(run_each(call, [], max_workers=4), [])
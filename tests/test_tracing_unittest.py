@@ -0,0 +1,88 @@
+import unittest
+import os
+import datetime
+import sys
+from unittest.mock import patch
+
+_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(
+    1, os.path.join(_path, "..", "..", "..", "..")
+)  # adds qed project to sys.path
+
+# local requirements (running pytest at qed level):
+if 'cts_celery' in _path:
+	from qed.cts_celery.cts_calcs.tracing import Tracer
+	from qed.cts_celery.cts_calcs.chemical_information import ChemInfo
+elif 'cts_app' in _path:
+	from qed.cts_app.cts_calcs.tracing import Tracer
+	from qed.cts_app.cts_calcs.chemical_information import ChemInfo
+
+
+
+class TestTracing(unittest.TestCase):
+	"""
+	Unit test class for the tracing spans module.
+	"""
+
+	print("cts tracing unittests conducted at " + str(datetime.datetime.today()))
+
+	def setUp(self):
+		"""
+		Setup routine for tracing unit tests.
+		"""
+		self.tracer = Tracer()
+		self.tracer.enabled = True
+
+	def test_span_tree(self):
+		"""
+		Testing that spans nest under the trace's root span.
+		"""
+		print(">>> Running tracing span tree unit test..")
+		with self.tracer.start_trace("get_cheminfo", chemical="CCO") as root:
+			with self.tracer.span("filter_smiles"):
+				with self.tracer.span("standardize", actions="neutralize") as span:
+					span.set_attribute('smiles', "CCO")
+			with self.tracer.span("chem_details"):
+				pass
+		trace = root.to_dict()
+		self.assertEqual(trace['attributes'], {'chemical': "CCO"})
+		self.assertEqual([child['name'] for child in trace['children']], ["filter_smiles", "chem_details"])
+		self.assertEqual(trace['children'][0]['children'][0]['attributes'], {'actions': "neutralize", 'smiles': "CCO"})
+		self.assertGreaterEqual(trace['duration_ms'], trace['children'][0]['duration_ms'])
+		self.assertIsNone(self.tracer.get_current_span())
+
+	def test_span_error(self):
+		"""
+		Testing that exceptions are recorded on the span and re-raised.
+		"""
+		print(">>> Running tracing span error unit test..")
+		with self.assertRaises(ValueError):
+			with self.tracer.start_trace("get_cheminfo") as root:
+				with self.tracer.span("cas_lookup"):
+					raise ValueError("cactus down")
+		self.assertEqual(root.children[0].status, "error")
+		self.assertEqual(root.children[0].error, "cactus down")
+
+	def test_no_trace(self):
+		"""
+		Testing that spans outside a trace aren't recorded.
+		"""
+		print(">>> Running tracing no-op span unit test..")
+		with self.tracer.span("filter_smiles") as span:
+			self.assertIsNone(span)
+
+	def test_cheminfo_trace(self):
+		"""
+		Testing that get_cheminfo attaches its trace with the debug flag.
+		"""
+		print(">>> Running get_cheminfo trace unit test..")
+		chem_info = ChemInfo()
+		request_post = {'chemical': "ccc", 'debug_trace': True}
+		with patch.object(ChemInfo, 'check_structure_request', return_value={'error': "structure is not valid"}):
+			response_obj = chem_info.get_cheminfo(request_post)
+			self.assertEqual(response_obj['trace']['name'], "get_cheminfo")
+			self.assertEqual(response_obj['trace']['status'], "error")
+			self.assertEqual(response_obj['trace']['children'][0]['name'], "structure_check")
+			response_obj = chem_info.get_cheminfo({'chemical': "ccc"})
+			self.assertNotIn('trace', response_obj)
+			self.assertEqual(chem_info.trace.name, "get_cheminfo")
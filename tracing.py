@@ -0,0 +1,143 @@
+"""
+Lightweight tracing spans for multi-step pipelines (e.g., get_cheminfo).
+Spans nest through a contextvar, so a trace is a per-request tree of
+step durations and outcomes. If opentelemetry is installed and
+CTS_TRACING_OTEL is set, spans are also sent to the configured
+OpenTelemetry tracer.
+"""
+
+from contextlib import contextmanager, nullcontext
+import contextvars
+import logging
+import time
+import os
+
+try:
+	from opentelemetry import trace as otel_trace
+except ImportError:
+	otel_trace = None  # built-in spans only
+
+
+
+current_span = contextvars.ContextVar("cts_current_span", default=None)
+
+
+
+class Span:
+	"""
+	A timed step in a trace.
+	  + name - step name (e.g., "filter_smiles")
+	  + attributes - details for the step (e.g., chemical type)
+	  + status - "ok" or "error" (with error message)
+	"""
+
+	def __init__(self, name, parent=None, attributes=None):
+		self.name = name
+		self.parent = parent
+		self.attributes = dict(attributes or {})
+		self.children = []
+		self.status = "ok"
+		self.error = None
+		self.start_time = time.time()
+		self.start = time.perf_counter()
+		self.duration = None  # seconds, set when the span ends
+		if parent:
+			parent.children.append(self)
+
+	def set_attribute(self, key, value):
+		self.attributes[key] = value
+
+	def set_error(self, error):
+		self.status = "error"
+		self.error = str(error)
+
+	def end(self):
+		if self.duration is None:
+			self.duration = time.perf_counter() - self.start
+
+	def to_dict(self):
+		"""
+		Returns the span and its children as a JSON-serializable tree.
+		"""
+		span_dict = {
+			'name': self.name,
+			'start': self.start_time,
+			'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+			'status': self.status,
+			'children': [child.to_dict() for child in self.children]
+		}
+		if self.error:
+			span_dict['error'] = self.error
+		if self.attributes:
+			span_dict['attributes'] = {key: val if isinstance(val, (str, int, float, bool)) or val is None else str(val)
+				for key, val in self.attributes.items()}
+		return span_dict
+
+	def format_tree(self, depth=0):
+		"""
+		Returns the trace as indented lines for logging.
+		"""
+		duration_ms = self.duration * 1000 if self.duration is not None else 0
+		line = "{}{} {:.1f}ms{}".format("  " * depth, self.name, duration_ms, " (error: {})".format(self.error) if self.error else "")
+		return "\n".join([line] + [child.format_tree(depth + 1) for child in self.children])
+
+
+
+class Tracer:
+	"""
+	Creates spans. Spans are only recorded inside a trace (see start_trace),
+	so instrumented code costs next to nothing when no trace is running.
+	"""
+
+	def __init__(self):
+		self.enabled = os.environ.get('CTS_TRACING_ENABLED', 'true').lower() == 'true'
+		self.slow_seconds = float(os.environ.get('CTS_TRACE_SLOW_SECONDS', 5))  # traces slower than this are logged
+		self.otel_tracer = None
+		if otel_trace and os.environ.get('CTS_TRACING_OTEL', 'false').lower() == 'true':
+			self.otel_tracer = otel_trace.get_tracer("cts_calcs")
+
+	@contextmanager
+	def start_trace(self, name, **attributes):
+		"""
+		Starts a trace's root span. Yields the root Span (or None when
+		tracing is disabled). Slow traces are logged as a tree.
+		"""
+		if not self.enabled:
+			yield None
+			return
+		with self.span(name, root=True, **attributes) as root:
+			yield root
+		if root.duration > self.slow_seconds:
+			logging.warning("Slow trace ({:.2f}s):\n{}".format(root.duration, root.format_tree()))
+
+	@contextmanager
+	def span(self, name, root=False, **attributes):
+		"""
+		Times a step as a child of the current span. Exceptions are
+		recorded on the span and re-raised. Yields None outside a trace.
+		"""
+		parent = current_span.get()
+		if not self.enabled or (parent is None and not root):
+			yield None
+			return
+		span = Span(name, parent, attributes)
+		token = current_span.set(span)
+		otel_context = self.otel_tracer.start_as_current_span(name, attributes=span.to_dict().get('attributes')) if self.otel_tracer else nullcontext()
+		with otel_context as otel_span:
+			try:
+				yield span
+			except Exception as e:
+				span.set_error(e)
+				raise
+			finally:
+				span.end()
+				current_span.reset(token)
+				if otel_span:
+					otel_span.set_attribute("cts.status", span.status)
+
+	def get_current_span(self):
+		return current_span.get()
+
+
+
+tracer = Tracer()